@@ -1,7 +1,42 @@
-from .compose import ComposeFile
-from .env import Env
-from .env import EnvService
-from .envfile import EnvFile
-from .envlist import EnvList
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-__all__ = ["Env", "EnvFile", "EnvService", "ComposeFile", "EnvList"]
+if TYPE_CHECKING:
+    from .compose import ComposeFile
+    from .env import Env
+    from .env import EnvService
+    from .envfile import EnvFile
+    from .environ import LayeredEnviron
+    from .envlist import EnvList
+    from .plan import Plan
+    from .resolver import EnvResolver
+
+__all__ = [
+    "Env",
+    "EnvFile",
+    "EnvService",
+    "ComposeFile",
+    "EnvList",
+    "EnvResolver",
+    "LayeredEnviron",
+    "Plan",
+]
+
+# Imported on first use so that extract_env.client can start without loading
+# click and ruamel.yaml.
+_modules = {
+    "ComposeFile": ".compose",
+    "Env": ".env",
+    "EnvService": ".env",
+    "EnvFile": ".envfile",
+    "LayeredEnviron": ".environ",
+    "EnvList": ".envlist",
+    "EnvResolver": ".resolver",
+    "Plan": ".plan",
+}
+
+
+def __getattr__(name: str):
+    if name in _modules:
+        return getattr(import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
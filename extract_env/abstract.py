@@ -1,22 +1,106 @@
 from abc import ABC
 from abc import abstractmethod
 from pathlib import Path
+from typing import Any
+from typing import Iterable
+from typing import Optional
 from typing import OrderedDict
 from typing import Self
 
 from extract_env.env import Env
+from extract_env.fingerprint import Fingerprint
+from extract_env.lock import FileLock
 
 
 class File(ABC):
+    file_lock: Optional[FileLock] = None
+    saved_fingerprint: Optional[str] = None
+    # Set for files read from a string, they are never read from or written to disk.
+    in_memory: bool = False
+
     def __init__(self) -> None:
         self.envs: OrderedDict
         self.file_read: bool
         self.file_path: Path
 
+    def lock(self, timeout: float) -> Self:
+        """Holds a cross-process lock on the file until unlock() is called."""
+        if self.file_lock is None:
+            self.file_lock = FileLock(self.file_path, timeout=timeout)
+        self.file_lock.acquire()
+        return self
+
+    def unlock(self) -> Self:
+        if self.file_lock is not None:
+            self.file_lock.release()
+        return self
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.unlock()
+
     @abstractmethod
     def read_file(self) -> Self: ...
     @abstractmethod
     def update_file(self, write: bool, display: bool) -> Self: ...
+    @abstractmethod
+    def write_file(self) -> Self: ...
+    @abstractmethod
+    def render(self) -> str: ...
+
+    @property
+    def fingerprint(self) -> Fingerprint:
+        """Content fingerprint of the entries, kept up to date as they change."""
+        return self.envs.fingerprint.combined(self.extra_digests())
+
+    def extra_digests(self) -> Iterable[tuple[Any, int]]:
+        """(key, digest) of the content besides the entries, part of the fingerprint."""
+        return ()
+
+    def current_fingerprint(self) -> Fingerprint:
+        """The fingerprint computed afresh, digesting every Env again."""
+        return Fingerprint.of(
+            [*((k, env.digest) for k, env in self.envs.items()), *self.extra_digests()]
+        )
+
+    def mark_saved(self) -> Self:
+        self.saved_fingerprint = self.current_fingerprint().value
+        return self
+
+    def mark_written(self, text: str) -> Self:
+        """Records that text was written to file_path, e.g. by a Transaction."""
+        return self.mark_saved()
+
+    @property
+    def modified(self) -> bool:
+        """Whether the content changed since the file was last read or written.
+
+        Every Env is digested again, so edits made in place that were never
+        touched are seen too. Neither the file nor the disk is read.
+        """
+        return self.current_fingerprint().value != self.saved_fingerprint
+
+    @property
+    @abstractmethod
+    def original_text(self) -> str:
+        """The text the file was read from."""
+
+    def check_on_disk(self) -> None:
+        if self.in_memory:
+            raise ValueError(
+                f"'{self.file_path}' was read from memory and has no file to write, use render()"
+            )
+
+    def has_changes(self) -> bool:
+        """Whether writing the file would change its contents on disk."""
+        if self.in_memory:
+            return self.original_text != self.render()
+        if not self.file_path.exists():
+            return True
+        with open(self.file_path, "r") as file:
+            return file.read() != self.render()
 
     @abstractmethod
     def __getitem__(self, key) -> Env: ...
@@ -0,0 +1,112 @@
+"""asyncio API, running plan() and apply() on executors so the event loop never blocks."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any
+from typing import AsyncIterator
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+
+from extract_env.plan import Plan
+from extract_env.plan import apply
+from extract_env.plan import plan
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+@dataclass(frozen=True)
+class ProjectResult:
+    project: Path
+    plan: Optional[Plan] = None
+    written: tuple[Path, ...] = ()
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def extract_async(
+    compose_folder: Path | str = "./",
+    env_folder: Optional[Path | str] = None,
+    *,
+    write: bool = True,
+    executor: Optional[Executor] = None,
+    lock_timeout: Optional[float] = None,
+    **options: Any,
+) -> ProjectResult:
+    """Extracts one project, reading and parsing in one executor call and writing in another.
+
+    Cancelling before the plan is applied writes nothing, a write that has
+    already started on the executor is completed.
+
+    Args:
+        env_folder (Optional[Path | str]): Default: compose_folder.
+        write (bool): Apply the plan, otherwise only return it.
+        executor (Optional[Executor]): Default: the loop's default executor.
+        **options: Passed on to plan(), e.g. prefix or combine.
+    """
+    loop = asyncio.get_running_loop()
+    project_plan = await loop.run_in_executor(
+        executor,
+        partial(
+            plan,
+            compose_folder=compose_folder,
+            env_folder=compose_folder if env_folder is None else env_folder,
+            **options,
+        ),
+    )
+    written: list[Path] = []
+    if write and project_plan:
+        written = await loop.run_in_executor(
+            executor, partial(apply, project_plan, lock_timeout=lock_timeout)
+        )
+    return ProjectResult(Path(compose_folder), project_plan, tuple(written))
+
+
+async def iter_extract_async(
+    projects: Iterable[Path | str | Mapping[str, Any]],
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    **options: Any,
+) -> AsyncIterator[ProjectResult]:
+    """Extracts many projects concurrently and yields each result as it completes.
+
+    Args:
+        projects (Iterable[Path | str | Mapping[str, Any]]): Compose folders, or
+            mappings of extract_async() arguments for a project.
+        max_concurrency (int): Projects processed at the same time.
+        **options: extract_async() arguments shared by every project.
+
+    Yields:
+        ProjectResult: A failed project holds its error instead of stopping the others.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(project: Path | str | Mapping[str, Any]) -> ProjectResult:
+        kwargs = {**options}
+        if isinstance(project, Mapping):
+            kwargs.update(project)
+        else:
+            kwargs["compose_folder"] = project
+        async with semaphore:
+            try:
+                return await extract_async(**kwargs)
+            except Exception as e:
+                return ProjectResult(Path(kwargs.get("compose_folder", "./")), error=e)
+
+    tasks = [asyncio.ensure_future(run(x)) for x in projects]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Closing or cancelling the iteration cancels the projects not done yet.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
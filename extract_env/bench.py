@@ -0,0 +1,94 @@
+"""Benchmarks of the bulk .env scanner against the per-line Env.from_string path.
+
+    python -m extract_env.bench --lines 20000
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable
+
+import click
+
+from extract_env.env import Env
+from extract_env.scanner import scan_envs
+
+
+def per_line_envs(text: str, prefix: str = "", postfix: str = "") -> list[Env]:
+    """The per-line path of EnvFile.read_file, for comparison."""
+    return [
+        Env.from_string(x, prefix, postfix, line=idx, source="dot_env")
+        for idx, x in enumerate(text.splitlines())
+    ]
+
+
+def benchmark_text(lines: int, seed: int = 0) -> str:
+    """A .env buffer of mostly unique entries with comments and blank lines."""
+    rng = random.Random(seed)
+    parts = []
+    for idx in range(lines):
+        roll = rng.random()
+        if roll < 0.1:
+            parts.append(f"# section {idx}\n")
+        elif roll < 0.15:
+            parts.append("\n")
+        elif roll < 0.3:
+            parts.append(f"KEY_{idx}=value-{rng.randint(0, 10**6)} # note\n")
+        else:
+            parts.append(f"KEY_{idx}=value-{rng.randint(0, 10**6)}\n")
+    return "".join(parts)
+
+
+def timed(run: Callable[[], object], repeat: int) -> float:
+    """The best of repeat runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command()
+@click.option(
+    "-n",
+    "--lines",
+    default=20000,
+    type=click.IntRange(min=1),
+    help="Lines of the generated .env buffer.  Default: 20000",
+)
+@click.option(
+    "-r",
+    "--repeat",
+    default=5,
+    type=click.IntRange(min=1),
+    help="Runs per path, the best is kept.  Default: 5",
+)
+@click.help_option("-h", "--help")
+def main(lines, repeat):
+    """Benchmark the bulk scanner against the per-line Env.from_string path."""
+    text = benchmark_text(lines)
+    size = len(text.encode())
+
+    def per_line_cold():
+        Env.clear_parse_cache()
+        per_line_envs(text)
+
+    results = {
+        "per-line (cold cache)": timed(per_line_cold, repeat),
+        "per-line (warm cache)": timed(lambda: per_line_envs(text), repeat),
+        "scanner": timed(lambda: scan_envs(text), repeat),
+    }
+    reference = results["per-line (cold cache)"]
+    print(f"# {lines} lines, {size / 1024:.1f} KiB, best of {repeat}:")
+    for name, seconds in results.items():
+        print(
+            f"-  {name:<22} {seconds * 1000:8.2f} ms {lines / seconds:12.0f} lines/s"
+            f" {size / seconds / 2**20:8.1f} MiB/s  {reference / seconds:.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+from typing import Any
+from typing import Optional
+from typing import Type
+from typing import TypeVar
+
+from extract_env.abstract import File
+from extract_env.lock import FileLock
+from extract_env.utils import file_signature
+
+F = TypeVar("F", bound=File)
+
+WARM_CACHE_SIZE = 256
+
+
+class WarmCache:
+    """Parsed ComposeFile and EnvFile objects kept between runs and re-validated by mtime.
+
+    The cached objects are never handed out, every caller gets its own deep
+    copy to combine and write, so one run cannot leak edits into the next.
+    """
+
+    def __init__(self, max_size: int = WARM_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._files: OrderedDict[tuple, tuple[tuple[int, int], File]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        cls: Type[F],
+        file_path: Path | str,
+        lock_timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> F:
+        """Returns a fresh copy of cls(file_path, **kwargs), parsing the file only when it changed.
+
+        Args:
+            cls (Type[F]): ComposeFile or EnvFile.
+            file_path (Path | str): The file to load.
+            lock_timeout (Optional[float]): When given, the file is locked before its
+                mtime is checked and the lock is handed over to the returned copy.
+        """
+        file_path = Path(file_path)
+        key = (cls.__name__, file_path.resolve(), tuple(sorted(kwargs.items())))
+        file_lock = None
+        if lock_timeout is not None:
+            file_lock = FileLock(file_path, timeout=lock_timeout).acquire()
+        try:
+            signature = file_signature(file_path)
+            with self._lock:
+                cached = self._files.get(key)
+            if cached is not None and signature is not None and cached[0] == signature:
+                self.hits += 1
+                file = cached[1]
+            else:
+                self.misses += 1
+                file = cls(file_path, **kwargs)
+                if (signature := file_signature(file_path)) is not None:
+                    with self._lock:
+                        self._files[key] = (signature, file)
+                        self._files.move_to_end(key)
+                        while len(self._files) > self.max_size:
+                            self._files.popitem(last=False)
+            copy = deepcopy(file)
+        except BaseException:
+            if file_lock is not None:
+                file_lock.release()
+            raise
+        copy.file_lock = file_lock
+        return copy
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "files": len(self._files)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
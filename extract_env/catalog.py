@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+from ruamel.yaml import YAMLError
+
+from extract_env.compose import ComposeFile
+from extract_env.compose import environment_entries
+from extract_env.env import Env
+from extract_env.utils import file_signature
+from extract_env.yaml_io import load_yaml_from_string
+
+CATALOG_ENV_VAR = "EXTRACT_ENV_CATALOG"
+
+# Folders that never hold compose projects worth indexing.
+SKIP_FOLDERS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    project TEXT NOT NULL,
+    compose_file TEXT NOT NULL,
+    source TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value_hash TEXT NOT NULL,
+    expansion INTEGER NOT NULL,
+    comment TEXT NOT NULL,
+    service TEXT,
+    line INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_key ON entries(key);
+CREATE INDEX IF NOT EXISTS entries_service ON entries(service);
+CREATE INDEX IF NOT EXISTS entries_file_id ON entries(file_id);
+"""
+
+
+# key, value hash, expansion, comment, service and line.
+EntryRow = tuple[str, str, bool, str, Optional[str], Optional[int]]
+
+
+def default_catalog_path() -> Path:
+    if path := os.environ.get(CATALOG_ENV_VAR):
+        return Path(path)
+    folder = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(folder) / "extract-env" / "catalog.sqlite"
+
+
+def value_hash(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True)
+class Row:
+    key: str
+    service: Optional[str]
+    file_path: str
+    line: Optional[int]
+    source: str
+    value_hash: str
+    comment: str = ""
+
+    def __str__(self) -> str:
+        location = f"{self.file_path}:{self.line}" if self.line else self.file_path
+        service = f" ({self.service})" if self.service else ""
+        return f"{self.key}{service}  {location}  value {self.value_hash}"
+
+
+@dataclass
+class IndexStats:
+    indexed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped: list[Path] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        text = f"Indexed {self.indexed} file/s, {self.unchanged} unchanged, {self.removed} removed"
+        if self.skipped:
+            text += f", skipped {len(self.skipped)} unparseable: " + ", ".join(
+                map(str, self.skipped)
+            )
+        return text
+
+
+def entry_line(environment: Any, i: int) -> Optional[int]:
+    """The line of the i-th entry of a round-trip loaded environment list or mapping."""
+    try:
+        if isinstance(environment, list):
+            return environment.lc.item(i)[0] + 1
+        return environment.lc.key([*environment][i])[0] + 1
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+def compose_rows(text: str) -> Iterator[EntryRow]:
+    """key, value hash, expansion, comment, service and line of every environment entry."""
+    data = load_yaml_from_string(text) or {}
+    for service, service_yaml in (data.get("services") or {}).items():
+        environment = (service_yaml or {}).get("environment")
+        for i, entry in enumerate(environment_entries(environment)):
+            line = entry_line(environment, i)
+            env = Env.from_string(entry, service_name=service, source="compose")
+            if env.key:
+                yield env_row(env, service, line)
+
+
+def dot_env_rows(text: str) -> Iterator[EntryRow]:
+    for i, line in enumerate(text.splitlines(), 1):
+        env = Env.from_string(line, line=i, source="dot_env")
+        if env.key:
+            yield env_row(env, None, i)
+
+
+def env_row(env: Env, service: Optional[str], line: Optional[int]) -> EntryRow:
+    expansion = env.value in (f"${{{env.key}}}", f"${env.key}")
+    return (env.key, value_hash(env.value), expansion, env.comment, service, line)
+
+
+class Catalog:
+    """Every entry of the compose and .env files of many projects, in SQLite.
+
+    Files are re-read only when their mtime or size changed and re-parsed only
+    when their content hash changed too, so indexing a tree again is cheap.
+    Expansions of the key itself, like KEY=${KEY} in a compose file after
+    extraction, are indexed but never count as conflicting values.
+    """
+
+    def __init__(self, path: Path | str, env_file_name: str = ".env") -> None:
+        self.path = Path(path)
+        self.env_file_name = env_file_name
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> Catalog:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def find_projects(
+        self, roots: Iterable[Path | str]
+    ) -> Iterator[tuple[Path, Path, str]]:
+        """Compose file, its .env file and source for every file to index under roots."""
+        compose_regex = ComposeFile.regex_pattern()
+        for root in roots:
+            for folder, folders, files in os.walk(root):
+                folders[:] = sorted(x for x in folders if x not in SKIP_FOLDERS)
+                for name in sorted(files):
+                    if not (match := compose_regex.fullmatch(name)):
+                        continue
+                    compose_path = Path(folder, name).resolve()
+                    yield compose_path, compose_path, "compose"
+                    env_name = self.env_file_name
+                    if compose_name := match.group("compose_name"):
+                        env_name = f"{env_name}.{compose_name}"
+                    if (env_path := compose_path.with_name(env_name)).is_file():
+                        yield env_path, compose_path, "dot_env"
+
+    def index(self, roots: Iterable[Path | str]) -> IndexStats:
+        """Brings the catalog up to date with the files under roots."""
+        roots = [Path(x).resolve() for x in roots]
+        stats = IndexStats()
+        seen: set[str] = set()
+        with self.connection:
+            for file_path, compose_path, source in self.find_projects(roots):
+                if str(file_path) in seen:
+                    continue
+                seen.add(str(file_path))
+                try:
+                    indexed = self.index_file(file_path, compose_path, source)
+                except YAMLError:
+                    # Its old entries are stale, drop them and keep indexing.
+                    self.connection.execute(
+                        "DELETE FROM files WHERE path = ?", (str(file_path),)
+                    )
+                    stats.skipped.append(file_path)
+                    continue
+                if indexed:
+                    stats.indexed += 1
+                else:
+                    stats.unchanged += 1
+
+            for file_id, path in self.connection.execute(
+                "SELECT id, path FROM files"
+            ).fetchall():
+                under_root = any(Path(path).is_relative_to(x) for x in roots)
+                if under_root and path not in seen:
+                    self.connection.execute(
+                        "DELETE FROM files WHERE id = ?", (file_id,)
+                    )
+                    stats.removed += 1
+        return stats
+
+    def index_file(self, file_path: Path, compose_path: Path, source: str) -> bool:
+        """Re-indexes a file when it changed, returns whether it was parsed.
+
+        Raises:
+            YAMLError: The compose file is not valid YAML, the catalog is unchanged.
+        """
+        signature = file_signature(file_path)
+        if signature is None:
+            return False
+        row = self.connection.execute(
+            "SELECT id, mtime_ns, size, hash FROM files WHERE path = ?",
+            (str(file_path),),
+        ).fetchone()
+        if row is not None and (row[1], row[2]) == signature:
+            return False
+
+        text = file_path.read_text()
+        digest = value_hash(text)
+        if row is not None and row[3] == digest:
+            self.connection.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                (*signature, row[0]),
+            )
+            return False
+
+        rows = [*(compose_rows(text) if source == "compose" else dot_env_rows(text))]
+        if row is not None:
+            self.connection.execute("DELETE FROM files WHERE id = ?", (row[0],))
+        file_id = self.connection.execute(
+            "INSERT INTO files (path, project, compose_file, source, mtime_ns, size, hash)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(file_path),
+                str(compose_path.parent),
+                str(compose_path),
+                source,
+                *signature,
+                digest,
+            ),
+        ).lastrowid
+        self.connection.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((file_id, *x) for x in rows),
+        )
+        return True
+
+    def select(self, where: str, params: tuple = ()) -> list[Row]:
+        return [
+            Row(*x)
+            for x in self.connection.execute(
+                "SELECT e.key, e.service, f.path, e.line, f.source, e.value_hash, e.comment"
+                f" FROM entries e JOIN files f ON f.id = e.file_id WHERE {where}"
+                " ORDER BY e.key, f.path, e.line",
+                params,
+            )
+        ]
+
+    @staticmethod
+    def match(column: str, pattern: str) -> str:
+        """Exact match, or a GLOB when the pattern has wildcards."""
+        return (
+            f"{column} GLOB ?" if any(x in pattern for x in "*?[") else f"{column} = ?"
+        )
+
+    def key(self, key: str) -> list[Row]:
+        """Where a key, or the keys matching a glob, are set."""
+        return self.select(self.match("e.key", key), (key,))
+
+    def service(self, service: str) -> list[Row]:
+        """The keys a service, or the services matching a glob, use."""
+        return self.select(self.match("e.service", service), (service,))
+
+    def conflicts(self, key: Optional[str] = None) -> dict[str, list[Row]]:
+        """Keys given different values within a project, by key."""
+        where = "" if key is None else f"AND {self.match('e.key', key)}"
+        conflicting = self.connection.execute(
+            "SELECT e.key, f.project FROM entries e JOIN files f ON f.id = e.file_id"
+            f" WHERE NOT e.expansion {where}"
+            " GROUP BY e.key, f.project HAVING COUNT(DISTINCT e.value_hash) > 1",
+            () if key is None else (key,),
+        ).fetchall()
+        ret: dict[str, list[Row]] = {}
+        for conflict_key, project in conflicting:
+            ret.setdefault(f"{conflict_key} in {project}", []).extend(
+                self.select(
+                    "e.key = ? AND f.project = ? AND NOT e.expansion",
+                    (conflict_key, project),
+                )
+            )
+        return ret
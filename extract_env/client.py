@@ -0,0 +1,54 @@
+"""Thin client forwarding extract-env invocations to a running 'extract-env serve'.
+
+Only the standard library is imported here, so a call that is answered by the
+server does not pay for loading click and ruamel.yaml. When no server is
+listening the invocation runs in-process instead.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+SOCKET_ENV_VAR = "EXTRACT_ENV_SOCKET"
+
+
+def default_socket_path() -> Path:
+    if path := os.environ.get(SOCKET_ENV_VAR):
+        return Path(path)
+    folder = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(folder) / f"extract-env-{os.getuid()}.sock"
+
+
+def send_request(socket_path: Path | str, request: dict[str, Any]) -> dict[str, Any]:
+    """Sends one JSON request line and returns the JSON response line."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as response:
+            return json.loads(response.readline())
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        response = send_request(
+            default_socket_path(), {"argv": argv, "cwd": os.getcwd()}
+        )
+    except (FileNotFoundError, ConnectionRefusedError):
+        from extract_env.main import main as run_locally
+
+        return run_locally(args=argv, prog_name="extract-env")
+
+    print(response["output"], end="")
+    return response["exit_code"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import json
 import re
+from dataclasses import dataclass
+from hashlib import blake2b
 from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
 from typing import DefaultDict
+from typing import Iterable
 from typing import Optional
 from typing import OrderedDict
 from typing import Self
@@ -10,11 +17,47 @@ from typing import Self
 from extract_env.abstract import File
 from extract_env.env import Env
 from extract_env.env import EnvService
+from extract_env.fingerprint import TrackedEnvs
 from extract_env.utils import print_file_to_terminal
 from extract_env.yaml_io import dump_yaml
+from extract_env.yaml_io import dump_yaml_to_string
 from extract_env.yaml_io import dump_yaml_to_string_lines
 from extract_env.yaml_io import get_comments
 from extract_env.yaml_io import load_yaml
+from extract_env.yaml_io import load_yaml_from_string
+
+if TYPE_CHECKING:
+    from extract_env.cache import WarmCache
+
+
+@dataclass(frozen=True)
+class EnvFileRef:
+    """An entry of a service's env_file list."""
+
+    path: Path
+    required: bool = True
+
+
+def environment_entries(environment: Any) -> list[str]:
+    """The entries of an environment in list form, KEY=value or KEY."""
+    if not environment:
+        return []
+    if isinstance(environment, dict):
+        return [k if v is None else f"{k}={v}" for k, v in environment.items()]
+    return [str(x) for x in environment]
+
+
+def entry_key(entry: str) -> str:
+    return entry.partition("=")[0].strip()
+
+
+@dataclass(frozen=True)
+class ServiceRefs:
+    """What ComposeGraph follows in a service: the service it extends and its own
+    environment entries, taken when the file is read, before they are rewritten."""
+
+    extends: Optional[str | dict] = None
+    environment: tuple[str, ...] = ()
 
 
 class ComposeFile(File):
@@ -26,6 +69,9 @@ class ComposeFile(File):
         postfix: str = "",
         compose_name: Optional[str] = None,
         env_file_name_base: str = ".env",
+        lock_timeout: Optional[float] = None,
+        *,
+        compose_text: Optional[str] = None,
     ):
         if isinstance(file_path, File):
             file_path = file_path.file_path
@@ -39,17 +85,61 @@ class ComposeFile(File):
         self.env_file_name_base = env_file_name_base
         self.env_services: set[EnvService] = set()
         self.service_envs = DefaultDict(OrderedDict)
-        self.envs = OrderedDict()
-
+        self.envs = TrackedEnvs()
+        self.env_file_refs: dict[str, list[EnvFileRef]] = {}
+        # The top level include: and the services' extends:, see ComposeGraph.
+        self.include_paths: list[Path] = []
+        self.service_refs: dict[str, ServiceRefs] = {}
+        # Service to (env_file entries, generated entries they replace), see EnvShards.
+        self.service_env_files: dict[str, tuple[list[str], set[str]]] = {}
+        self.compose_text = compose_text
+        self.in_memory = compose_text is not None
+
+        if self.in_memory:
+            self.read_file()
+            return
         if not self.file_path.exists():
             raise FileNotFoundError(f"Compose file not found: {self.file_path}")
-        self.read_file()
+        if lock_timeout is not None:
+            self.lock(lock_timeout)
+        try:
+            self.read_file()
+        except BaseException:
+            self.unlock()
+            raise
+
+    @classmethod
+    def from_string(
+        cls, compose_text: str, file_path: Path | str = "-", **kwargs
+    ) -> ComposeFile:
+        """Reads compose YAML from a string, nothing is read from or written to disk.
+
+        Args:
+            file_path (Path | str): Only used to name the file, e.g. in previews.
+        """
+        return cls(file_path, compose_text=compose_text, **kwargs)
+
+    @property
+    def original_text(self) -> str:
+        if self.compose_text is not None:
+            return self.compose_text
+        return self.file_path.read_text()
 
     def read_file(self):
-        self.compose_yaml = data = load_yaml(self.file_path)
+        if self.compose_text is not None:
+            self.compose_yaml = data = load_yaml_from_string(self.compose_text)
+        else:
+            self.compose_yaml = data = load_yaml(self.file_path)
         self.compose_file_read = True
+        self.read_references(data)
 
-        service_dict: dict[str, dict] = data["services"]
+        # Files that only include others have no services.
+        service_dict: dict[str, dict] = data.get("services") or {}
+        self.env_file_refs = {
+            x: self.parse_env_file_refs(service_dict[x]["env_file"])
+            for x in self.services
+            if "env_file" in service_dict[x].keys()
+        }
 
         env_dict_list: dict[str, list[str]] = {
             x: service_dict[x]["environment"]
@@ -58,9 +148,9 @@ class ComposeFile(File):
         }
 
         self.comments = {
-            k: get_comments(data["services"][k]["environment"])
+            k: get_comments(service_dict[k]["environment"])
             for k in self.services
-            if "environment" in data["services"][k].keys()
+            if "environment" in service_dict[k].keys()
         }
 
         for service, env_list in env_dict_list.items():
@@ -78,8 +168,53 @@ class ComposeFile(File):
                     env.comment = self.comments[service][line]
                 self.service_envs[service][env.key] = env
         self.update_envs_from_service_env()
+        self.mark_saved()
+        return self
+
+    def read_references(self, data: Any) -> Self:
+        """Keeps what ComposeGraph follows, as plain values copied out of the YAML."""
+        self.include_paths = []
+        for entry in data.get("include") or []:
+            entry_paths = entry.get("path") if isinstance(entry, dict) else entry
+            if isinstance(entry_paths, str):
+                entry_paths = [entry_paths]
+            self.include_paths.extend(
+                self.file_path.parent / x for x in entry_paths or []
+            )
+        self.service_refs = {}
+        for name, service in (data.get("services") or {}).items():
+            extends = (service or {}).get("extends")
+            self.service_refs[name] = ServiceRefs(
+                dict(extends) if isinstance(extends, dict) else extends,
+                tuple(environment_entries((service or {}).get("environment"))),
+            )
         return self
 
+    def parse_env_file_refs(self, env_file: str | list) -> list[EnvFileRef]:
+        """Parses the short (a path or list of paths) and long ({path, required})
+        forms of env_file, paths are relative to the compose file."""
+        if isinstance(env_file, str):
+            env_file = [env_file]
+        refs = []
+        for entry in env_file:
+            if isinstance(entry, dict):
+                path, required = entry.get("path"), entry.get("required", True)
+            else:
+                path, required = entry, True
+            if path:
+                refs.append(EnvFileRef(self.file_path.parent / path, bool(required)))
+        return refs
+
+    @property
+    def referenced_env_files(self) -> list[EnvFileRef]:
+        """Every env_file referenced by the services, each path once."""
+        refs: dict[Path, EnvFileRef] = {}
+        for service_refs in self.env_file_refs.values():
+            for ref in service_refs:
+                if ref.path not in refs or ref.required:
+                    refs[ref.path] = ref
+        return [*refs.values()]
+
     def __str__(self) -> str:
         return f"{self.file_path}"
 
@@ -103,6 +238,7 @@ class ComposeFile(File):
                     if env.key in self.envs:
                         self.envs[env.key].services.extend(env.services)
                         env.services = self.envs[env.key].services
+                        self.envs.touch(self.envs[env.key])
                     else:
                         self.envs[env.key] = env
 
@@ -114,6 +250,35 @@ class ComposeFile(File):
                     self.envs[key] = env
         return self
 
+    def add_inherited_envs(self, service: str, entries: list[str]) -> Self:
+        """Adds entries a service inherits through extends: to the extraction.
+
+        They are combined like the service's own entries but, as they live in
+        another file or service, their lines are never rewritten.
+        """
+        for entry in entries:
+            env = Env.from_string(
+                entry,
+                source="compose",
+                service_name=service,
+                prefix=self.prefix,
+                postfix=self.postfix,
+            )
+            if env.key in self.service_envs[service]:
+                continue
+            self.service_envs[service][env.key] = env
+            if not self.combine:
+                env.key = self.split_key(service, env)
+                self.envs[env.key] = env
+            elif env.key in self.envs:
+                services = [*self.envs[env.key].services, *env.services]
+                self.envs[env.key].services = services
+                env.services = services
+                self.envs.touch(self.envs[env.key])
+            else:
+                self.envs[env.key] = env
+        return self
+
     def split_key(self, service: str, env: Env) -> str:
         key = env.key
 
@@ -135,7 +300,17 @@ class ComposeFile(File):
         """
         List of services in the compose file.
         """
-        return [*self.compose_yaml["services"].keys()]
+        return [*(self.compose_yaml.get("services") or {}).keys()]
+
+    def extra_digests(self) -> Iterable[tuple[Any, int]]:
+        """The environment and env_file entries of every service in the YAML, so
+        rewrites by update_yaml are part of the fingerprint."""
+        for service, service_yaml in (self.compose_yaml.get("services") or {}).items():
+            for field in ("environment", "env_file"):
+                if isinstance(service_yaml, dict) and field in service_yaml:
+                    data = json.dumps(service_yaml[field], default=str)
+                    digest = blake2b(data.encode(), digest_size=8).digest()
+                    yield (service, field), int.from_bytes(digest)
 
     def update_yaml(self) -> Self:
         for env_service in self.env_services:
@@ -145,6 +320,32 @@ class ComposeFile(File):
             self.compose_yaml["services"][env_service.service]["environment"][
                 env_service.line
             ] = (env_service.key + "=" + env.to_compose_string())
+
+        for service, (entries, generated) in self.service_env_files.items():
+            self.update_env_file_entries(service, entries, generated)
+        return self
+
+    def update_env_file_entries(
+        self, service: str, entries: list[str], generated: set[str]
+    ) -> Self:
+        """Sets the generated entries of a service's env_file, keeping the ones added by hand."""
+        service_yaml = self.compose_yaml["services"][service]
+        current = service_yaml.get("env_file", [])
+        if isinstance(current, str):
+            current = [current]
+
+        def entry_path(entry) -> str:
+            # Long syntax: {path: ..., required: false}
+            return entry.get("path", "") if isinstance(entry, dict) else entry
+
+        kept = [x for x in current if entry_path(x) not in generated]
+        updated = [*kept, *entries]
+        if [entry_path(x) for x in updated] == [entry_path(x) for x in current]:
+            return self
+        if updated:
+            service_yaml["env_file"] = updated
+        else:
+            del service_yaml["env_file"]
         return self
 
     def update_file(self, display: bool = False, write: bool = True) -> Self:
@@ -153,10 +354,19 @@ class ComposeFile(File):
             self.preview()
 
         if write:
-            dump_yaml(self.compose_yaml, self.file_path)
+            self.write_file()
+
+        return self
 
+    def write_file(self) -> Self:
+        self.check_on_disk()
+        dump_yaml(self.compose_yaml, self.file_path)
+        self.mark_saved()
         return self
 
+    def render(self) -> str:
+        return dump_yaml_to_string(self.compose_yaml)
+
     def preview(self) -> Self:
         compose_lines = dump_yaml_to_string_lines(self.compose_yaml)
         print_file_to_terminal(self.file_path, compose_lines, display_line_num=True)
@@ -196,6 +406,27 @@ class ComposeFile(File):
         if match := self.regex_pattern().match(self.file_path.name):
             return match.group("compose_path")
 
+    @classmethod
+    def find_paths(cls, compose_folder) -> dict[str, tuple[Path, Optional[str]]]:
+        """Finds the compose files in a folder without reading them.
+
+        Raises:
+            FileNotFoundError: The folder has no compose files.
+
+        Returns:
+            dict[str, tuple[Path, Optional[str]]]: File name to the path and compose name.
+        """
+        paths = {}
+        compose_regex = cls.regex_pattern()
+        folder = Path(compose_folder)
+        for file in folder.iterdir():
+            match = compose_regex.match(file.name)
+            if match:
+                paths[file.name] = (file, match.groupdict().get("compose_name"))
+        if len(paths) == 0:
+            raise FileNotFoundError(f"No compose files found in: {folder.absolute()}")
+        return paths
+
     @classmethod
     def find_files(
         cls,
@@ -204,24 +435,45 @@ class ComposeFile(File):
         prefix: str = "",
         postfix: str = "",
         env_file_name_base: str = ".env",
+        lock_timeout: Optional[float] = None,
+        cache: Optional[WarmCache] = None,
+        select: Optional[Callable[[Path, Optional[str]], bool]] = None,
     ) -> dict[str, ComposeFile]:
+        """Finds and reads the compose files in a folder.
+
+        Args:
+            select (Optional[Callable[[Path, Optional[str]], bool]]): Called with the path
+                and compose name of each compose file before it is read, files it
+                returns False for are skipped.
+
+        Raises:
+            FileNotFoundError: The folder has no compose files at all.
+        """
         dict_compose_files = {}
-        compose_regex = cls.regex_pattern()
-        folder = Path(compose_folder)
-        for file in folder.iterdir():
-            match = compose_regex.match(file.name)
-            if match:
-                compose_name = match.groupdict().get("compose_name")
-                dict_compose_files[file.name] = cls(
-                    file,
+        try:
+            for name, (file, compose_name) in cls.find_paths(compose_folder).items():
+                if select is not None and not select(file, compose_name):
+                    continue
+                kwargs = dict(
                     combine=combine,
                     prefix=prefix,
                     postfix=postfix,
                     compose_name=compose_name,
                     env_file_name_base=env_file_name_base,
                 )
-        if len(dict_compose_files) == 0:
-            raise FileNotFoundError(f"No compose files found in: {folder.absolute()}")
+                if cache is not None:
+                    dict_compose_files[name] = cache.get(
+                        cls, file, lock_timeout=lock_timeout, **kwargs
+                    )
+                else:
+                    dict_compose_files[name] = cls(
+                        file, lock_timeout=lock_timeout, **kwargs
+                    )
+        except BaseException:
+            # The files read so far are never handed out, so nobody else unlocks them.
+            for compose_file in dict_compose_files.values():
+                compose_file.unlock()
+            raise
         return dict_compose_files
 
 
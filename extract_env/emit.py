@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import re
+import shlex
+from abc import ABC
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+from typing import Self
+
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.utils import write_atomic
+
+
+class EmitCollisionError(ValueError):
+    pass
+
+
+class Format(ABC):
+    """Renders the entries of a .env file in another format, one entry at a time.
+
+    Attributes:
+        name (str): Given to --emit.
+        suffix (str): Appended to the name of the .env file for the output path,
+            an empty suffix writes to the .env file itself.
+    """
+
+    name: str = ""
+    suffix: str = ""
+
+    def __init__(self, env_file: EnvFile) -> None:
+        self.env_file = env_file
+        self.parts: list[str] = []
+
+    def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def add(self, env: Env) -> None: ...
+
+    def end(self) -> None:
+        pass
+
+    def render(self) -> str:
+        return "".join(self.parts)
+
+
+FORMATS: dict[str, type[Format]] = {}
+
+
+def emitter(name: str, suffix: str) -> Callable[[type[Format]], type[Format]]:
+    """Registers a Format under name."""
+
+    def decorator(cls: type[Format]) -> type[Format]:
+        cls.name = name
+        cls.suffix = suffix
+        FORMATS[name] = cls
+        return cls
+
+    return decorator
+
+
+def unquote(value: str) -> str:
+    """The value without one pair of surrounding quotes, as docker compose reads it."""
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+@emitter("env", "")
+class DotEnv(Format):
+    def add(self, env: Env) -> None:
+        self.parts.append(str(env))
+
+
+@emitter("example", ".example")
+class DotEnvExample(Format):
+    """The .env file with every value blanked, comments are kept."""
+
+    def add(self, env: Env) -> None:
+        self.parts.append(str(Env(key=env.key, value="", com=env.comment)))
+
+
+@emitter("export", ".sh")
+class ShellExport(Format):
+    def add(self, env: Env) -> None:
+        if env.key:
+            self.parts.append(f"export {env.key}={shlex.quote(unquote(env.value))}\n")
+        elif env.comment:
+            self.parts.append(f"# {env.comment}\n")
+
+
+@emitter("json", ".json")
+class Json(Format):
+    def start(self) -> None:
+        self.parts.append("{")
+
+    def add(self, env: Env) -> None:
+        if env.key:
+            separator = "," if len(self.parts) > 1 else ""
+            self.parts.append(
+                f"{separator}\n  {json.dumps(env.key)}: {json.dumps(unquote(env.value))}"
+            )
+
+    def end(self) -> None:
+        self.parts.append("\n}\n" if len(self.parts) > 1 else "}\n")
+
+
+@emitter("configmap", ".configmap.yaml")
+class ConfigMap(Format):
+    """A Kubernetes ConfigMap named after the .env file, e.g. env-production."""
+
+    @property
+    def config_map_name(self) -> str:
+        name = re.sub(r"[^a-z0-9.-]+", "-", self.env_file.file_path.name.lower())
+        return name.strip("-.") or "env"
+
+    def start(self) -> None:
+        self.parts.append(
+            "apiVersion: v1\n"
+            "kind: ConfigMap\n"
+            "metadata:\n"
+            f"  name: {self.config_map_name}\n"
+            "data:"
+        )
+        self.empty = True
+
+    def add(self, env: Env) -> None:
+        # JSON strings are valid double quoted YAML scalars.
+        if env.key:
+            self.parts.append(f"\n  {env.key}: {json.dumps(unquote(env.value))}")
+            self.empty = False
+
+    def end(self) -> None:
+        self.parts.append(" {}\n" if self.empty else "\n")
+
+
+class Output:
+    """One rendered output, written as a whole and only when its contents change."""
+
+    def __init__(self, file_path: Path, text: str) -> None:
+        self.file_path = file_path
+        self.text = text
+
+    def render(self) -> str:
+        return self.text
+
+    def has_changes(self) -> bool:
+        if not self.file_path.exists():
+            return True
+        with open(self.file_path, "r") as file:
+            return file.read() != self.text
+
+    def write_file(self) -> Self:
+        write_atomic(self.file_path, self.text)
+        return self
+
+    def __repr__(self) -> str:
+        return f"Output('{self.file_path}')"
+
+
+class Emitter:
+    """Renders a .env file in several formats with a single pass over its entries.
+
+    Every format receives each entry in turn, so adding a format adds neither
+    a parse nor another traversal of the entries.
+    """
+
+    def __init__(
+        self,
+        env_file: EnvFile,
+        formats: Iterable[str],
+        reserved: Iterable[Path] = (),
+    ) -> None:
+        """Renders env_file in every format of formats.
+
+        Args:
+            reserved (Iterable[Path]): Paths no output may be written to, such as
+                the .env.<compose name> files of the compose files, e.g.
+                .env.example for compose.example.yaml.
+        """
+        unknown = [x for x in formats if x not in FORMATS]
+        if unknown:
+            raise ValueError(
+                f"Unknown format/s: {', '.join(unknown)}, choose from {', '.join(FORMATS)}"
+            )
+        self.env_file = env_file
+        self.formats = [FORMATS[x](env_file) for x in dict.fromkeys(formats)]
+        self.reserved = {Path(x).resolve() for x in reserved}
+
+    def path(self, fmt: Format) -> Path:
+        file_path = self.env_file.file_path
+        return file_path.parent / f"{file_path.name}{fmt.suffix}"
+
+    def render(self) -> dict[str, str]:
+        """The text of every format, by format name."""
+        for fmt in self.formats:
+            fmt.parts.clear()
+            fmt.start()
+        for env in self.env_file.envs.values():
+            for fmt in self.formats:
+                fmt.add(env)
+        for fmt in self.formats:
+            fmt.end()
+        return {fmt.name: fmt.render() for fmt in self.formats}
+
+    def outputs(self) -> list[Output]:
+        """The output of every format, next to the .env file.
+
+        Raises:
+            EmitCollisionError: An output would overwrite a reserved path.
+        """
+        for fmt in self.formats:
+            if fmt.suffix and self.path(fmt).resolve() in self.reserved:
+                raise EmitCollisionError(
+                    f"--emit {fmt.name} would overwrite {self.path(fmt)}, which is the .env file of another compose file. Rename that compose file or leave out {fmt.name}."
+                )
+        texts = self.render()
+        return [Output(self.path(x), texts[x.name]) for x in self.formats]
+
+    def write(self, workers: Optional[int] = None) -> list[Path]:
+        """Writes the outputs that changed in parallel and returns their paths."""
+        changed = [x for x in self.outputs() if x.has_changes()]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            [*pool.map(Output.write_file, changed)]
+        return [x.file_path for x in changed]
@@ -4,12 +4,16 @@ import re
 from dataclasses import InitVar
 from dataclasses import dataclass
 from dataclasses import field
+from functools import lru_cache
+from hashlib import blake2b
 from typing import Any
 from typing import Optional
 from typing import Self
 
 from extract_env.utils import Source
 
+ENV_PARSE_CACHE_SIZE = 4096
+
 
 @dataclass
 class EnvService:
@@ -95,6 +99,13 @@ class Env:
             return NotImplemented
         return self.key == other.key and self.value == other.value
 
+    @property
+    def digest(self) -> int:
+        """Stable 64 bit hash of the key, value, comment and services."""
+        services = sorted(f"{x.service}\x1f{x.key}" for x in self.services)
+        data = "\x00".join([self.key, self.value, self._comment, *services])
+        return int.from_bytes(blake2b(data.encode(), digest_size=8).digest())
+
     def __gt__(self, other: Any) -> bool:
         if not isinstance(other, Env):
             return NotImplemented
@@ -191,43 +202,18 @@ class Env:
         if not isinstance(string, str):
             raise TypeError(f"Expected string, got {type(string)}")
 
-        string.strip(" \n")
-        if string.startswith("# ") or string == "":
-            return cls(
-                key="",
-                value="",
-                com=string,
-                line=line,
-                services=[],
-                source=source,
+        service_key, key, value, comment = _parse_env_string(string, prefix, postfix)
+        if service_key is not None and service_name and source == "compose":
+            service = EnvService(
+                service=service_name, key=service_key, line=line, source=source
             )
-        k, _, v = string.partition("=")
-        k = k.strip(" \n")
-        if service_name and source == "compose":
-            service = EnvService(service=service_name, key=k, line=line, source=source)
         else:
             service = None
 
-        key = value = comment = ""
-        if prefix != "":
-            prefix = f"{prefix}_"
-        if postfix != "":
-            postfix = f"_{postfix}"
-        if k:
-            key = f"{prefix}{k}{postfix}"
-        v = v.strip(" \n")
-        if v:
-            value, _, comment = v.partition(" #")
-            value = value.strip(" \n")
-            comment = comment.strip(" \n")
-        if not comment:
-            comment = ""
-        if not key:
-            key = ""
-        ret_cls = cls(
+        ret_cls = cls._from_parsed(
             key=key,
             value=value,
-            com=comment,
+            comment=comment,
             line=line,
             services=[service] if service else [],
             source=source,
@@ -237,10 +223,83 @@ class Env:
 
         return ret_cls
 
+    @classmethod
+    def _from_parsed(
+        cls,
+        key: str,
+        value: str,
+        comment: str,
+        line: Optional[int],
+        services: list[EnvService],
+        source: Optional[Source],
+    ) -> Env:
+        """Builds an Env from already normalised parts without re-running __post_init__."""
+        env = cls.__new__(cls)
+        env.key = key
+        env.value = value
+        env._comment = comment
+        env.line = line if line or line == 0 else None
+        env.services = services
+        env.source = source
+        return env
+
+    @staticmethod
+    def parse_cache_stats() -> dict[str, int | float]:
+        """Hit/miss counters of the cache used by Env.from_string."""
+        info = _parse_env_string.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize or 0,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def clear_parse_cache() -> None:
+        _parse_env_string.cache_clear()
+
     def to_compose_string(self) -> str:
         return f"${{{self.key}}}"
 
 
+@lru_cache(maxsize=ENV_PARSE_CACHE_SIZE)
+def _parse_env_string(
+    string: str, prefix: str = "", postfix: str = ""
+) -> tuple[Optional[str], str, str, str]:
+    """Parses a raw 'KEY=value # comment' string into its normalised parts.
+
+    The result only depends on the string, prefix and postfix, so it is cached
+    and shared between every Env built from the same raw entry.
+
+    Returns:
+        tuple[Optional[str], str, str, str]: (service_key, key, value, comment),
+            service_key is None when the string is a comment or blank line.
+    """
+    if string.startswith("# ") or string == "":
+        env = Env(key="", value="", com=string)
+        return None, env.key, env.value, env.comment
+
+    k, _, v = string.partition("=")
+    k = k.strip(" \n")
+
+    key = value = comment = ""
+    if prefix != "":
+        prefix = f"{prefix}_"
+    if postfix != "":
+        postfix = f"_{postfix}"
+    if k:
+        key = f"{prefix}{k}{postfix}"
+    v = v.strip(" \n")
+    if v:
+        value, _, comment = v.partition(" #")
+        value = value.strip(" \n")
+        comment = comment.strip(" \n")
+    env = Env(key=key, value=value, com=comment)
+    return k, env.key, env.value, env.comment
+
+
 if __name__ == "__main__":
     from extract_env.main import main
 
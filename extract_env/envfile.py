@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from collections import OrderedDict
 from pathlib import Path
 from typing import Any
@@ -9,8 +10,16 @@ from typing import Self
 
 from extract_env.abstract import File
 from extract_env.env import Env
+from extract_env.environ import LayeredEnviron
+from extract_env.fingerprint import TrackedEnvs
+from extract_env.resolver import EnvResolver
+from extract_env.scanner import scan_envs
+from extract_env.sorted_envs import SortedEnvs
+from extract_env.utils import SortBy
 from extract_env.utils import Source
+from extract_env.utils import file_signature
 from extract_env.utils import print_file_to_terminal
+from extract_env.utils import write_atomic
 
 
 class EnvFile(File):
@@ -24,6 +33,10 @@ class EnvFile(File):
         file_text: str = "",
         *,
         envs: Optional[list[Env]] = None,
+        lock_timeout: Optional[float] = None,
+        sort_by: Optional[SortBy] = None,
+        in_memory: bool = False,
+        dotenv_grammar: bool = False,
     ) -> None:
         if isinstance(file_path, File):
             file_path = file_path.file_path
@@ -33,33 +46,87 @@ class EnvFile(File):
         self.postfix = postfix
         self.use_current_env = use_current_env
         self.env_file_text = file_text
+        self.sorted_envs: Optional[SortedEnvs] = None
+        self._environ: Optional[LayeredEnviron] = None
+        self.disk_signature: Optional[tuple[int, int]] = None
+        self.in_memory = in_memory
+        self.dotenv_grammar = dotenv_grammar
+
+        if lock_timeout is not None and not self.in_memory:
+            self.lock(lock_timeout)
+        try:
+            if not self.file_path.exists() and not self.in_memory:
+                self.file_path.touch()
+            if envs is None:
+                envs = []
+            if not isinstance(envs, list):
+                raise TypeError(f"Expected list, got {type(envs)}")
+            if len(envs) > 0:
+                self.envs = OrderedDict({idx: x for idx, x in enumerate(envs)})
+                self.update_keys()
+            else:
+                self.envs = OrderedDict()
+
+            self.read_file()
+            if sort_by is not None:
+                self.keep_sorted(sort_by)
+        except BaseException:
+            self.unlock()
+            raise
 
-        if not self.file_path.exists():
-            self.file_path.touch()
-        if envs is None:
-            envs = []
-        if not isinstance(envs, list):
-            raise TypeError(f"Expected list, got {type(envs)}")
-        if len(envs) > 0:
-            self.envs = OrderedDict({idx: x for idx, x in enumerate(envs)})
-            self.update_keys()
+    @property
+    def envs(self) -> TrackedEnvs:
+        return self._envs
+
+    @envs.setter
+    def envs(self, envs: OrderedDict[int, Env]) -> None:
+        # Re-indexing keeps the same Envs, so the fingerprint is carried over.
+        if "_envs" in self.__dict__:
+            self._envs.reset(envs.items())
         else:
-            self.envs = OrderedDict()
+            self._envs = TrackedEnvs(envs)
+
+    @classmethod
+    def from_string(
+        cls, file_text: str, file_path: Path | str = "-", **kwargs
+    ) -> EnvFile:
+        """Reads .env entries from a string, nothing is read from or written to disk.
 
-        self.read_file()
+        Args:
+            file_path (Path | str): Only used to name the file, e.g. in previews.
+        """
+        return cls(file_path, file_text=file_text, in_memory=True, **kwargs)
+
+    @property
+    def original_text(self) -> str:
+        return self.env_file_text
 
     @property
     def next_key(self) -> int:
         return len(self.envs)
 
     def update_keys(
-        self, remove_duplicates: bool = True, check_param_expansion: bool = True
+        self,
+        remove_duplicates: bool = True,
+        check_param_expansion: bool = True,
+        sync: bool = True,
     ) -> Self:
+        """Renumbers the envs, in sorted order while keep_sorted is on.
+
+        Args:
+            sync (bool): Bring the sorted order in line with every env. Edits of
+                a single env update it themselves and skip this.
+        """
         if check_param_expansion:
             self.check_and_remove_parameter_expansion()
-        current_dict = [(k, v) for k, v in enumerate(self.envs.values())]
+        envs = self.envs.values()
+        if self.sorted_envs is not None:
+            envs = self.sorted_envs.sync(envs) if sync else self.sorted_envs
+        current_dict = [(k, v) for k, v in enumerate(envs)]
 
         self.envs = OrderedDict({k: v for k, v in current_dict})
+        if self._environ is not None:
+            self._environ.invalidate()
         if remove_duplicates:
             self.remove_duplicates()
         return self
@@ -67,6 +134,35 @@ class EnvFile(File):
     def keys(self):
         return [x.key for x in self.envs.values() if x.key is not None]
 
+    def is_duplicate(self, key: str) -> bool:
+        return bool(key) and sum(x.key == key for x in self.envs.values()) > 1
+
+    def add_sorted(self, env: Env, position: Optional[int] = None) -> None:
+        """Adds one env to sorted_envs, a comment line is attached to the entry
+        that follows position, or to the end without one."""
+        if env in self.sorted_envs:
+            return
+        if SortedEnvs.is_entry(env):
+            self.sorted_envs.add(env)
+            return
+        following = None
+        if position is not None:
+            following = next(
+                (
+                    x
+                    for k, x in self.envs.items()
+                    if k > position and SortedEnvs.is_entry(x)
+                ),
+                None,
+            )
+        self.sorted_envs.attach([env], following)
+
+    def refresh_sorted(self, env: Env) -> None:
+        """Moves an entry whose services changed while sorting by service."""
+        if self.sorted_envs is not None and self.sorted_envs.by == "service":
+            if env in self.sorted_envs and SortedEnvs.is_entry(env):
+                self.sorted_envs.resort(env)
+
     def __getitem__(self, key: str | int) -> Env:
         if isinstance(key, int):
             return self.envs[key]
@@ -83,12 +179,20 @@ class EnvFile(File):
 
     def __setitem__(self, key: str | int, value: str | Env, update_keys: bool = True):
 
+        # Only kept in sorted order here when the edit is finished by update_keys,
+        # remove_duplicates moves envs around in several steps and syncs after.
+        track = update_keys and self.sorted_envs is not None
         if isinstance(key, int):
             if not isinstance(value, Env):
                 raise TypeError(
                     f"Expected 'Env' when given a key if type int, got {type(value)}"
                 )
+            old = self.envs.get(key)
             self.envs[key] = value
+            if track:
+                if old is not None and old is not value:
+                    self.sorted_envs.discard(old)
+                self.add_sorted(value, key)
         elif isinstance(key, str):
             if isinstance(value, Env):
                 raise TypeError(
@@ -99,28 +203,41 @@ class EnvFile(File):
                     if env.key == key:
                         env = value
             else:
-                self.envs[len(self)] = Env(key, value)
+                value = Env(key, value)
+                self.envs[len(self)] = value
+                if track:
+                    self.add_sorted(value)
         else:
             raise NotImplementedError(
                 f"Expected str or int for the key, got {type(key)}"
             )
         if update_keys:
-            self.update_keys(check_param_expansion=False)
+            self.update_keys(
+                remove_duplicates=isinstance(value, Env)
+                and self.is_duplicate(value.key),
+                check_param_expansion=False,
+                sync=not track,
+            )
 
     def __delitem__(self, key: str | int, update_keys: bool = True):
+        track = update_keys and self.sorted_envs is not None
         if isinstance(key, int):
-            del self.envs[key]
+            positions = [key]
         elif isinstance(key, str):
-            if key in self.keys():
-                for k, v in self.envs.items():
-                    if v.key == key:
-                        del self.envs[k]
+            positions = [k for k, v in self.envs.items() if v.key == key]
         else:
             raise NotImplementedError(
                 f"Expected str or int for the key, got {type(key)}"
             )
+        for position in positions:
+            env = self.envs.pop(position)
+            if track:
+                self.sorted_envs.discard(env)
         if update_keys:
-            self.update_keys(check_param_expansion=False)
+            # Removing an env never adds a duplicate.
+            self.update_keys(
+                remove_duplicates=False, check_param_expansion=False, sync=not track
+            )
 
     def find_duplicates(self) -> dict[str, int]:
         keys = [k for k in self.keys() if k is not None and k != ""]
@@ -166,6 +283,7 @@ class EnvFile(File):
                             f"Duplicate keys ({k}) with different values: {value} != {env.value}"
                         )
                     elif value == env.value:
+                        # Re-set below, which updates the fingerprint.
                         first.append_services(env.services)
 
                 for ke in [*best_of_the_dups[k].keys()]:
@@ -190,9 +308,13 @@ class EnvFile(File):
         raise KeyError(f"Key '{key}' not found")
 
     def check_and_remove_parameter_expansion(self) -> Self:
+        """Removes entries that only expand to themselves, e.g. 'KEY=${KEY}'.
+
+        Values referencing other keys are kept, see EnvFile.resolve.
+        """
         pos_list = []
         for k, v in self.envs.items():
-            if v.value and "${" in v.value:
+            if v.value and "${" in v.value and v.param_expansion_key == v.key:
                 pos_list.append(k)
         for k in pos_list:
             del self[k]
@@ -205,14 +327,22 @@ class EnvFile(File):
         line: Optional[int] = None,
         update_keys: bool = True,
     ) -> Self:
+        start = len(self)
         if isinstance(env, str):
             env = Env.from_string(
                 env, self.prefix, self.postfix, line=line, source=source
             )
-            if env.is_param_expansion:
+            # A .env entry referencing another key is a value in its own right,
+            # only self references such as 'KEY=${KEY}' are dropped.
+            if env.is_param_expansion and (
+                source != "dot_env" or env.param_expansion_key == env.key
+            ):
                 if self.env_file_read:
                     env_key = env.param_expansion_key
-                    self[env_key].append_services(env.services)
+                    if env_key in self.keys():
+                        self[env_key].append_services(env.services)
+                        self.envs.touch(self[env_key])
+                        self.refresh_sorted(self[env_key])
                 return self
 
             self.envs.update({len(self): env})
@@ -231,6 +361,8 @@ class EnvFile(File):
                     env_key = env.param_expansion_key
                     if env_key in self.keys():
                         self[env_key].append_services(env.services)
+                        self.envs.touch(self[env_key])
+                        self.refresh_sorted(self[env_key])
                     elif env_key not in self.keys():
                         env.value = ""
                         env.comment = "Need to add a value for this parameter."
@@ -242,10 +374,22 @@ class EnvFile(File):
             for e in self.envs.values():
                 if e.key == env.key:
                     e.append_services(env.services)
+                    self.envs.touch(e)
+                    self.refresh_sorted(e)
                     break
 
         if update_keys:
-            self.update_keys()
+            if self.sorted_envs is None:
+                self.update_keys()
+                return self
+            # Appended envs are added one by one instead of syncing every env.
+            added = [self.envs[x] for x in range(start, len(self)) if x in self.envs]
+            for added_env in added:
+                self.add_sorted(added_env)
+            self.update_keys(
+                remove_duplicates=any(self.is_duplicate(x.key) for x in added),
+                sync=False,
+            )
         return self
 
     def __iter__(self):
@@ -265,18 +409,38 @@ class EnvFile(File):
     ) -> Self:
         self.env_file_read = True
 
-        if not self.file_path.exists():
-            self.file_path.touch()
-            self.env_file_text = ""
-            return self
-
-        with open(self.file_path, "r") as file:
-            self.env_file_text = file.read()
-        for idx, line in enumerate(self.env_file_text.splitlines()):
-            self.append(line, line=idx, source="dot_env", update_keys=False)
+        if not self.in_memory:
+            if not self.file_path.exists():
+                self.file_path.touch()
+                self.env_file_text = ""
+            else:
+                with open(self.file_path, "r") as file:
+                    self.env_file_text = file.read()
+            self.disk_signature = file_signature(self.file_path)
+
+        if self.dotenv_grammar:
+            for env in self.read_envs():
+                # The same self references the per line path drops.
+                if env.is_param_expansion and env.param_expansion_key == env.key:
+                    continue
+                self.envs[len(self)] = env
+        else:
+            for idx, line in enumerate(self.env_file_text.splitlines()):
+                self.append(line, line=idx, source="dot_env", update_keys=False)
         self.update_keys()
+        self.mark_saved()
         return self
 
+    def read_envs(self) -> list[Env]:
+        """Every line of the file text as an Env, duplicates and self references
+        included, parsed the way read_file parses them."""
+        if self.dotenv_grammar:
+            return scan_envs(self.env_file_text, self.prefix, self.postfix)
+        return [
+            Env.from_string(line, self.prefix, self.postfix, idx, source="dot_env")
+            for idx, line in enumerate(self.env_file_text.splitlines())
+        ]
+
     @staticmethod
     def flatten_list_with_service(
         input_list: dict[str, list[Any]]
@@ -300,17 +464,46 @@ class EnvFile(File):
 
     def insert(self, key: int, value: Env) -> Self:
         self.append(value)
-        start = key
-        end = len(self.envs) - 1
-        step = 1
+        if self.sorted_envs is not None:
+            return self
 
-        for k in range(start, end, step):
-            self.envs.move_to_end(k)
+        envs = [*self.envs.values()]
+        envs = [*envs[:key], *envs[-1:], *envs[key:-1]]
+        self.envs = OrderedDict(enumerate(envs))
         self.update_keys()
         return self
 
-    def sort(self) -> Self:
-        self.envs = OrderedDict(sorted(self.envs.items(), key=lambda x: x[1].key))
+    def sort(self, by: Optional[SortBy] = None) -> Self:
+        if self.sorted_envs is not None:
+            if by is not None and by != self.sorted_envs.by:
+                self.keep_sorted(by)
+            return self
+
+        if by is None or by == "key":
+            envs = sorted(self.envs.values(), key=lambda x: x.key)
+        else:
+            sort_key = SortedEnvs(by).primary
+            envs = sorted(self.envs.values(), key=lambda x: (sort_key(x), x.key))
+        # Keys are line positions, the fingerprint sees the new order.
+        self.envs = OrderedDict(enumerate(envs))
+        return self
+
+    def keep_sorted(self, by: SortBy = "key") -> Self:
+        """Keeps the envs sorted across every later edit instead of re-sorting on each call.
+
+        Comment and blank lines stay attached to the entry they precede. An edit
+        moves only the env it touches, though the envs are still renumbered
+        afterwards, as their positions are the keys of self.envs.
+
+        Args:
+            by (SortBy): Sort entries by their 'key', 'service' or 'source'.
+        """
+        self.sorted_envs = SortedEnvs(by, self.envs.values())
+        self.update_keys(remove_duplicates=False, check_param_expansion=False)
+        return self
+
+    def stop_sorting(self) -> Self:
+        self.sorted_envs = None
         return self
 
     def __sorted__(self):
@@ -346,11 +539,44 @@ class EnvFile(File):
             )
 
         if write:
-            with open(self.file_path, "wt") as file:
-                for line, env in self.envs.items():
-                    file.write(str(env))
+            self.write_file()
         return self
 
+    def write_file(self) -> Self:
+        """Appends only the new lines when the file on disk is still the text
+        that was read and the rendered text just extends it, otherwise the
+        whole file is rewritten atomically."""
+        self.check_on_disk()
+        text = self.render()
+        tail = self.appended_text(text)
+        if tail is None:
+            write_atomic(self.file_path, text)
+        elif tail:
+            with open(self.file_path, "at") as file:
+                file.write(tail)
+        return self.mark_written(text)
+
+    def mark_written(self, text: str) -> Self:
+        self.env_file_text = text
+        self.disk_signature = file_signature(self.file_path)
+        return self.mark_saved()
+
+    def appended_text(self, text: str) -> Optional[str]:
+        """The part of text following the text read from disk, None when earlier
+        lines changed or the file was modified since it was read."""
+        if not text.startswith(self.env_file_text):
+            return None
+        signature = file_signature(self.file_path)
+        if signature is None or signature != self.disk_signature:
+            return None
+        # Newline translation on read makes the text differ from the bytes on disk.
+        if signature[1] != len(self.env_file_text.encode()):
+            return None
+        return text[len(self.env_file_text) :]
+
+    def render(self) -> str:
+        return "".join(str(env) for env in self.envs.values())
+
     @property
     def env_services_dict(self) -> dict[str, dict[str, Env]]:
         ret_dict = DefaultDict(dict)
@@ -388,6 +614,36 @@ class EnvFile(File):
                 f"No environment variable found for service '{service_name}' with key '{service_key}'"
             )
 
+    @property
+    def environ(self) -> LayeredEnviron:
+        """Read-through view of the entries, layered over os.environ when use_current_env is set.
+
+        The view is kept and its index of the entries is rebuilt after update_keys.
+        """
+        if self._environ is None or self.use_current_env != (
+            self._environ.environ is os.environ
+        ):
+            self._environ = LayeredEnviron(self, None if self.use_current_env else {})
+        return self._environ
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.environ.get(key, default)
+
+    def resolve(self, key: Optional[str] = None) -> str | dict[str, str]:
+        """Resolves ${X} references between values, falling back on the current
+        environment when use_current_env is set.
+
+        Args:
+            key (Optional[str]): Only resolve this key and the keys it depends on.
+
+        Returns:
+            str | dict[str, str]: The resolved value of key, or of every key when key is None.
+        """
+        resolver = EnvResolver(self)
+        if key is None:
+            return resolver.resolve_all()
+        return resolver.resolve(key)
+
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, EnvFile):
             return NotImplemented
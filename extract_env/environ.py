@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
+
+from extract_env.env import Env
+
+if TYPE_CHECKING:
+    from extract_env.envfile import EnvFile
+
+
+class LayeredEnviron(Mapping[str, str]):
+    """Read-through view of an EnvFile layered over the process environment.
+
+    Lookups check the .env entries first and then fall through to the process
+    environment. Nothing is copied out of os.environ and an Env is only built
+    for an environment variable when it is asked for with env().
+    """
+
+    def __init__(
+        self, env_file: EnvFile, environ: Optional[Mapping[str, str]] = None
+    ) -> None:
+        self.env_file = env_file
+        self.environ: Mapping[str, str] = os.environ if environ is None else environ
+        self._file_envs: Optional[dict[str, Env]] = None
+        self._environ_envs: dict[str, Env] = {}
+
+    @property
+    def file_envs(self) -> dict[str, Env]:
+        """The first Env for each key of the file, indexed on first use."""
+        if self._file_envs is None:
+            self._file_envs = {}
+            for env in self.env_file.envs.values():
+                if env.key and env.key not in self._file_envs:
+                    self._file_envs[env.key] = env
+        return self._file_envs
+
+    def invalidate(self) -> None:
+        """Drops the index of the file's entries, called when they change."""
+        self._file_envs = None
+
+    def env(self, key: str) -> Env:
+        if key in self.file_envs:
+            return self.file_envs[key]
+        cached = self._environ_envs.get(key)
+        if cached is None or cached.value != self.environ[key]:
+            self._environ_envs[key] = Env._from_parsed(
+                key=key,
+                value=self.environ[key],
+                comment="",
+                line=None,
+                services=[],
+                source="environ",
+            )
+        return self._environ_envs[key]
+
+    def __getitem__(self, key: str) -> str:
+        if key in self.file_envs:
+            return self.file_envs[key].value
+        return self.environ[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.file_envs or key in self.environ
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.file_envs
+        yield from (x for x in self.environ if x not in self.file_envs)
+
+    def __len__(self) -> int:
+        return len(self.file_envs) + sum(
+            1 for x in self.environ if x not in self.file_envs
+        )
+
+    def __repr__(self) -> str:
+        return f"LayeredEnviron(env_file='{self.env_file.file_path}', file_keys={len(self.file_envs)})"
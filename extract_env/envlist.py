@@ -1,13 +1,41 @@
 from __future__ import annotations
 
 from collections import OrderedDict
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Any
+from typing import Callable
 from typing import Optional
 from typing import Self
 
 from extract_env.abstract import File
+from extract_env.cache import WarmCache
 from extract_env.compose import ComposeFile
+from extract_env.emit import Emitter
+from extract_env.emit import Output
+from extract_env.env import Env
 from extract_env.envfile import EnvFile
+from extract_env.git import changed_files
+from extract_env.graph import ComposeGraph
+from extract_env.overlay import ComposeOverlay
+from extract_env.shard import EnvShards
+from extract_env.shard import Shard
+from extract_env.transaction import Transaction
+from extract_env.utils import SortBy
+from extract_env.utils import peak_rss_bytes
+
+
+def current_text(file: File | Shard | Output | Path) -> Optional[str]:
+    """The text of a file as it was read, None when there is no file on disk."""
+    file_path = file if isinstance(file, Path) else file.file_path
+    if not file_path.is_file():
+        return None
+    if isinstance(file, File):
+        return file.original_text
+    return file_path.read_text()
 
 
 class EnvList:
@@ -26,6 +54,21 @@ class EnvList:
         update_compose: bool = True,
         use_current_env: bool = True,
         write: bool = True,
+        stats: bool = False,
+        workers: Optional[int] = None,
+        lock_timeout: Optional[float] = None,
+        sort_by: Optional[SortBy] = None,
+        overlay: bool = False,
+        check: bool = False,
+        cache: Optional[WarmCache] = None,
+        since: Optional[str] = None,
+        stream: bool = False,
+        read_ahead: int = 1,
+        shard: bool = False,
+        shard_common: bool = False,
+        emit: tuple[str, ...] = (),
+        dotenv_grammar: bool = False,
+        quiet: bool = False,
     ) -> None:
         self.compose_file: list[Path]
         if compose_file is not None:
@@ -47,17 +90,56 @@ class EnvList:
         self.prefix = prefix
         self.use_current_env = use_current_env
         self.preview_files = display
+        self.show_stats = stats
+        self.workers = workers
+        self.lock_timeout = lock_timeout
+        self.sort_by = sort_by
+        self.overlay = overlay
+        self.overlays: dict[str, ComposeOverlay] = {}
+        self.check = check
+        self.changed: list[Path] = []
+        self.cache = cache
+        self.since = since
+        self.changed_paths: Optional[set[Path]] = None
+        self.stream = stream
+        self.read_ahead = read_ahead
+        self.shard = shard
+        # Files pulled in through include: and extends: are parsed once per run.
+        self.graph = ComposeGraph()
+        # Files referenced by the env_file of services, key to value, None when missing.
+        self.referenced_env_files: dict[Path, Optional[dict[str, str]]] = {}
+        self.shard_common = shard_common
+        self.emit = emit
+        self.dotenv_grammar = dotenv_grammar
+        # Nothing is printed, e.g. for plan(), which runs from worker threads.
+        self.quiet = quiet
+        # In check mode, the current and new text of every file that would be
+        # written, None for a file that does not exist or would be removed.
+        self.renders: dict[Path, tuple[Optional[str], Optional[str]]] = {}
+        if self.stream and self.overlay:
+            raise ValueError("Overlay mode needs every compose file, it can't stream.")
         self.write_files = {
             "compose": update_compose,
             ".env": write,
         }
-        self.find_compose_files()
-        self.find_env_files()
         self.envs: dict[str, dict[str, File]]
-        self.init_envs()
+        # Locks taken while reading are held until every file has been written.
+        try:
+            if self.stream:
+                self.stream_files()
+            else:
+                self.find_compose_files()
+                self.find_env_files()
+                if self.overlay:
+                    self.find_overlays()
+                self.init_envs()
 
-        self.combine_files()
-        self.update_files()
+                self.combine_files()
+                self.update_files()
+        finally:
+            self.release_locks()
+        if self.show_stats:
+            self.print_stats()
 
     def init_envs(self) -> Self:
         self.envs: dict[str, dict[str, File]] = {}
@@ -68,92 +150,568 @@ class EnvList:
     def find_env_files(self) -> Self:
         self.env_files = {}
         env_file_names = [x.env_file_name for x in self.compose_files.values()]
-        print(env_file_names)
-        for env_file_name in env_file_names:
-            self.env_files[env_file_name] = EnvFile(self.env_folder / env_file_name)
+        self.print(env_file_names)
+        for env_file_name in dict.fromkeys(env_file_names):
+            self.env_files[env_file_name] = self.load_env_file(env_file_name)
         return self
 
-    def find_compose_files(self) -> Self:
+    def load_env_file(self, env_file_name: str) -> EnvFile:
+        kwargs = dict(
+            use_current_env=self.use_current_env,
+            sort_by=self.sort_by,
+            dotenv_grammar=self.dotenv_grammar,
+        )
+        file_path = self.env_folder / env_file_name
+        if self.check:
+            # A check never creates a missing .env file.
+            text = file_path.read_text() if file_path.is_file() else ""
+            return EnvFile.from_string(text, file_path, **kwargs)
+        return self.load_file(EnvFile, file_path, **kwargs)
+
+    def print(self, *args: Any, **kwargs: Any) -> None:
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def load_file(self, cls: type[File], file_path: Path, **kwargs) -> File:
+        """Loads a compose or .env file, through the warm cache when there is one."""
+        if self.cache is not None:
+            return self.cache.get(
+                cls, file_path, lock_timeout=self.lock_timeout, **kwargs
+            )
+        return cls(file_path, lock_timeout=self.lock_timeout, **kwargs)
+
+    def find_overlays(self) -> Self:
+        """Pairs every named compose file (compose.<name>.yaml) with the base compose file.
+
+        The .env file of an overlay then only receives the entries that differ
+        from the base, and docker compose is expected to load both .env files.
+        """
+        bases = [x for x in self.compose_files.values() if not x.compose_name]
+        if not bases:
+            raise ValueError(
+                f"Overlay mode needs a base compose file without a compose name (e.g. compose.yaml), got: {[*self.compose_files]}"
+            )
+        if len(bases) > 1:
+            raise ValueError(
+                f"Overlay mode needs exactly one base compose file, got: {sorted(x.file_path.name for x in bases)}"
+            )
+        base = bases[0]
+        base_env_keys = self.env_files[base.env_file_name].keys()
+        self.overlays = {}
+        self.overlay_envs: dict[str, OrderedDict[str, Env]] = {}
+        for compose_name, compose_file in self.compose_files.items():
+            if compose_file.compose_name:
+                overlay = ComposeOverlay(base, compose_file, base_env_keys)
+                self.overlays[compose_name] = overlay
+                # Taken before combining, which edits the base compose Envs.
+                self.overlay_envs[compose_name] = overlay.delta()
+        return self
+
+    def release_locks(self) -> Self:
+        files: list[File] = [
+            *getattr(self, "compose_files", {}).values(),
+            *getattr(self, "env_files", {}).values(),
+        ]
+        for file in files:
+            file.unlock()
+        return self
+
+    def compose_paths(self) -> dict[str, tuple[Path, Optional[str]]]:
+        """The compose files to process, found without reading them.
+
+        Returns:
+            dict[str, tuple[Path, Optional[str]]]: File name to the path and compose name.
+        """
+        if self.since is not None and self.changed_paths is None:
+            self.changed_paths = changed_files(self.since, cwd=self.compose_folder)
+
         if self.compose_file:
-            self.compose_files = {}
+            paths = {}
             for file in self.compose_file:
-                self.compose_files[file.name] = ComposeFile(
-                    file,
-                    combine=self.combine,
-                    prefix=self.prefix,
-                    postfix=self.postfix,
-                    env_file_name_base=self.env_file_name,
-                )
-            return self
-
+                compose_name = None
+                if match := ComposeFile.regex_pattern().match(file.name):
+                    compose_name = match.group("compose_name")
+                paths[file.name] = (file, compose_name)
         elif self.all_files:
             try:
-                self.compose_files = ComposeFile.find_files(
-                    compose_folder=self.compose_folder,
-                    combine=self.combine,
-                    prefix=self.prefix,
-                    postfix=self.postfix,
-                    env_file_name_base=self.env_file_name,
-                )
+                paths = ComposeFile.find_paths(self.compose_folder)
             except FileNotFoundError as e:
+                if self.quiet:
+                    raise
                 print(e)
                 raise SystemExit(1)
         else:
             raise ValueError(
                 f"Compose files not specified nor all_files=True. Values are: {self.all_files=} {self.compose_file=}"
             )
+
+        base_changed = self.overlay and any(
+            self.is_changed(path, compose_name)
+            for path, compose_name in paths.values()
+            if not compose_name
+        )
+        paths = {
+            name: (path, compose_name)
+            for name, (path, compose_name) in paths.items()
+            if self.select_compose_file(path, compose_name, base_changed)
+        }
+        if self.since is not None and not paths:
+            self.print(f"No compose files or .env files changed since {self.since}")
+        return paths
+
+    def find_compose_files(self) -> Self:
+        self.compose_files = self.load_group(self.compose_paths())
         return self
 
+    def load_compose_file(
+        self, file_path: Path, compose_name: Optional[str] = None
+    ) -> ComposeFile:
+        compose_file = self.load_file(
+            ComposeFile,
+            file_path,
+            combine=self.combine,
+            prefix=self.prefix,
+            postfix=self.postfix,
+            compose_name=compose_name,
+            env_file_name_base=self.env_file_name,
+        )
+        return compose_file
+
+    def env_file_name_for(self, compose_name: Optional[str]) -> str:
+        if not compose_name:
+            return self.env_file_name
+        return f"{self.env_file_name}.{compose_name}"
+
+    def is_changed(self, file_path: Path, compose_name: Optional[str] = None) -> bool:
+        """Whether a compose file or its .env file changed since the --since ref."""
+        if self.changed_paths is None:
+            return True
+        env_file_path = self.env_folder / self.env_file_name_for(compose_name)
+        return (
+            file_path.resolve() in self.changed_paths
+            or env_file_path.resolve() in self.changed_paths
+        )
+
+    def select_compose_file(
+        self,
+        file_path: Path,
+        compose_name: Optional[str] = None,
+        base_changed: bool = False,
+    ) -> bool:
+        """Whether a compose file should be processed, with --since only those
+        that changed or whose .env file changed are. Note that git does not see
+        changes to ignored .env files.
+
+        Args:
+            base_changed (bool): The base of the overlays changed, which changes
+                every overlay's delta too.
+        """
+        if self.changed_paths is None:
+            return True
+        if self.overlay and (not compose_name or base_changed):
+            # Overlays are computed against the base, so it is always read.
+            return True
+        return self.is_changed(file_path, compose_name)
+
+    def stream_files(self) -> Self:
+        """Processes one .env target and its compose files at a time.
+
+        Each group is loaded, combined, written and released before the next
+        one is processed, while up to read_ahead groups of compose files are
+        read in the background, so memory stays flat however many files there are.
+        """
+        groups: dict[str, dict[str, tuple[Path, Optional[str]]]] = OrderedDict()
+        for name, (path, compose_name) in self.compose_paths().items():
+            groups.setdefault(self.env_file_name_for(compose_name), {})[name] = (
+                path,
+                compose_name,
+            )
+
+        pending: deque[tuple[str, Future[dict[str, ComposeFile]]]] = deque()
+        remaining = iter(groups.items())
+        with ThreadPoolExecutor(max_workers=max(1, self.read_ahead)) as pool:
+
+            def read_next() -> bool:
+                if group := next(remaining, None):
+                    env_file_name, paths = group
+                    pending.append((env_file_name, pool.submit(self.load_group, paths)))
+                return group is not None
+
+            def read_ahead() -> None:
+                while len(pending) < self.read_ahead and read_next():
+                    pass
+
+            read_ahead()
+            try:
+                while pending or read_next():
+                    env_file_name, future = pending.popleft()
+                    self.compose_files = future.result()
+                    # At most read_ahead groups are read while this one is processed.
+                    read_ahead()
+                    self.env_files = {}
+                    self.env_files[env_file_name] = self.load_env_file(env_file_name)
+                    self.init_envs()
+                    self.combine_files()
+                    self.update_files(summary=False)
+                    self.release_locks()
+                    self.compose_files, self.env_files, self.envs = {}, {}, {}
+            finally:
+                # Groups read ahead but never processed still hold their locks.
+                # A group that failed to load released its own, and nothing is
+                # raised from here so the error that stopped the loop is kept.
+                for _, future in pending:
+                    future.cancel()
+                for _, future in pending:
+                    if future.cancelled():
+                        continue
+                    try:
+                        compose_files = future.result()
+                    except Exception:
+                        continue
+                    for compose_file in compose_files.values():
+                        compose_file.unlock()
+
+        self.print_summary()
+        return self
+
+    def load_group(
+        self, paths: dict[str, tuple[Path, Optional[str]]]
+    ) -> dict[str, ComposeFile]:
+        compose_files = {}
+        try:
+            for name, (path, compose_name) in paths.items():
+                compose_files[name] = self.load_compose_file(path, compose_name)
+            # Added first, so files of the group that include each other are
+            # not read a second time by the graph.
+            for compose_file in compose_files.values():
+                self.graph.add(compose_file)
+            for compose_file in compose_files.values():
+                self.graph.apply(compose_file)
+        except BaseException:
+            for compose_file in compose_files.values():
+                compose_file.unlock()
+            raise
+        return compose_files
+
     def update_env_files(self) -> Self:
 
         return self
 
+    def target_groups(self) -> dict[str, list[str]]:
+        """Groups the compose file names by the .env file they are combined into.
+
+        Returns:
+            dict[str, list[str]]: env_file_name to compose names, both in discovery order.
+        """
+        groups: dict[str, list[str]] = OrderedDict()
+        for compose_name, compose_file in self.compose_files.items():
+            groups.setdefault(compose_file.env_file_name, []).append(compose_name)
+        return groups
+
+    def run_parallel(self, tasks: list[Callable[[], Any]]) -> list[Any]:
+        """Runs the tasks on a thread pool and returns their results in order."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(task) for task in tasks]
+            return [future.result() for future in futures]
+
+    def is_generated_env_file(self, file_path: Path) -> bool:
+        """Whether a file is one of the .env files or shards written by this run."""
+        file_path = file_path.resolve()
+        for env_file in self.env_files.values():
+            catalog = env_file.file_path.resolve()
+            if file_path == catalog or file_path.parent == catalog.with_name(
+                f"{catalog.name}.d"
+            ):
+                return True
+        return False
+
+    def load_referenced_env_files(self) -> Self:
+        """Reads the files referenced by the env_file of every service, each once
+        however many services share it and all of them concurrently."""
+        refs = {}
+        for compose_file in self.compose_files.values():
+            for ref in compose_file.referenced_env_files:
+                path = ref.path.resolve()
+                if path not in self.referenced_env_files and path not in refs:
+                    if not self.is_generated_env_file(path):
+                        refs[path] = ref
+
+        def load(path: Path) -> Optional[dict[str, str]]:
+            if not path.is_file():
+                return None
+            # Read as docker compose reads it, --prefix and --postfix only name
+            # the entries extracted into the .env file.
+            env_file = EnvFile.from_string(
+                path.read_text(), path, use_current_env=False
+            )
+            return {x.key: x.value for x in env_file.envs.values() if x.key}
+
+        for path, keys in zip(
+            refs, self.run_parallel([partial(load, x) for x in refs])
+        ):
+            self.referenced_env_files[path] = keys
+            if keys is None and refs[path].required:
+                self.print(f"\nenv_file not found: {refs[path].path}\n")
+        return self
+
+    def service_env_file_keys(
+        self, compose_file: ComposeFile
+    ) -> dict[str, dict[str, str]]:
+        """Per service, the keys and values supplied by its env_file, later files win.
+
+        The keys are the names the service sees, as written in its environment list.
+        """
+        supplied: dict[str, dict[str, str]] = {}
+        for service, refs in compose_file.env_file_refs.items():
+            supplied[service] = {}
+            for ref in refs:
+                supplied[service].update(
+                    self.referenced_env_files.get(ref.path.resolve()) or {}
+                )
+        return supplied
+
+    def supplied_by_env_file(
+        self, env: Env, supplied: dict[str, dict[str, str]]
+    ) -> bool:
+        """Whether every service of a compose entry already gets it from its env_file,
+        either as the same value or because the entry only references itself.
+
+        Matched on the key each service uses in compose, not the .env key.
+        """
+        if not env.services:
+            return False
+        for env_service in env.services:
+            keys = supplied.get(env_service.service, {})
+            if env_service.key not in keys:
+                return False
+            self_reference = env.is_param_expansion and env.param_expansion_key in (
+                env.key,
+                env_service.key,
+            )
+            if env.value and not self_reference and env.value != keys[env_service.key]:
+                return False
+        return True
+
     def combine_files(
         self,
     ) -> Self:
+        self.load_referenced_env_files()
         for compose_name, compose_file in self.compose_files.items():
             self.envs[compose_name] = {
                 "compose": compose_file,
                 ".env": self.env_files[compose_file.env_file_name],
             }
-            self.env_files[compose_file.env_file_name].append(
-                env=compose_file.envs, source="compose"
-            )
-            if orphan_keys := self.keys_not_in_compose(compose_name):
 
-                print(
+        # Compose files sharing a .env target are combined in order by the same
+        # task, so each target is only ever touched by one thread.
+        orphans: dict[str, list[str]] = {}
+        for group_orphans in self.run_parallel(
+            [
+                partial(self.combine_target, compose_names)
+                for compose_names in self.target_groups().values()
+            ]
+        ):
+            orphans.update(group_orphans)
+
+        for compose_name, compose_file in self.compose_files.items():
+            if orphan_keys := orphans[compose_name]:
+
+                self.print(
                     f"\nFound {len(orphan_keys)} environment variable/s with no docker services in '{compose_file.file_path}':"
                 )
 
                 for key in orphan_keys:
-                    print("- ", key)
-                print()
+                    self.print("- ", key)
+                self.print()
 
         return self
 
+    def combine_target(self, compose_names: list[str]) -> dict[str, list[str]]:
+        orphans = {}
+        for compose_name in compose_names:
+            compose_file = self.compose_files[compose_name]
+            envs = compose_file.envs
+            if compose_name in self.overlays:
+                envs = self.overlay_envs[compose_name]
+            if compose_file.env_file_refs:
+                envs = self.without_env_file_keys(compose_file, envs)
+            self.env_files[compose_file.env_file_name].append(
+                env=envs, source="compose"
+            )
+            orphans[compose_name] = self.keys_not_in_compose(compose_name)
+        return orphans
+
+    def without_env_file_keys(
+        self, compose_file: ComposeFile, envs: OrderedDict[str, Env]
+    ) -> OrderedDict[str, Env]:
+        """Drops the entries supplied by env_file, their compose lines are left as they are."""
+        supplied = self.service_env_file_keys(compose_file)
+        kept = OrderedDict()
+        for key, env in envs.items():
+            if self.supplied_by_env_file(env, supplied):
+                compose_file.env_services.difference_update(env.services)
+            else:
+                kept[key] = env
+        return kept
+
+    def env_file_env_keys(self, compose_file: ComposeFile) -> set[str]:
+        """The .env keys that the keys supplied by env_file are extracted as."""
+        env_keys = set()
+        for service, keys in self.service_env_file_keys(compose_file).items():
+            for key in keys:
+                env = Env.from_string(f"{key}=", self.prefix, self.postfix)
+                if not self.combine:
+                    env.key = compose_file.split_key(service, env)
+                env_keys.add(env.key)
+        return env_keys
+
     def keys_not_in_compose(self, compose_name: str) -> list[str]:
+        compose_file = self.envs[compose_name]["compose"]
+        env_file_keys = self.env_file_env_keys(compose_file)
         return [
             key
             for key in self.envs[compose_name][".env"].keys()
-            if key not in self.envs[compose_name]["compose"].keys()
+            if key not in compose_file.keys() and key not in env_file_keys
         ]
 
-    def update_files(self) -> Self:
+    def shard_env_files(self) -> tuple[list[Shard], list[Path]]:
+        """Splits every .env file into per service shards and points the
+        env_file of each service at its shards.
+
+        Returns:
+            tuple[list[Shard], list[Path]]: The shards and the orphaned shard
+                files of services that no longer exist.
+        """
+        shards = []
+        orphans = []
+        for env_file_name, env_file in self.env_files.items():
+            env_shards = EnvShards(env_file, common=self.shard_common)
+            shards.extend(env_shards)
+            orphans.extend(env_shards.orphans())
+            for compose_file in self.compose_files.values():
+                if compose_file.env_file_name != env_file_name:
+                    continue
+                for service in compose_file.services:
+                    compose_file.service_env_files[service] = (
+                        env_shards.env_file_entries(
+                            service, compose_file.file_path.parent
+                        )
+                    )
+        return shards, orphans
+
+    def emit_outputs(self) -> list[Output]:
+        """Every .env file rendered in the formats given to emit."""
+        if not self.emit:
+            return []
+        env_files = {x[".env"].file_path: x[".env"] for x in self.envs.values()}
+        reserved = self.env_file_paths()
+        return [
+            output
+            for env_file in env_files.values()
+            for output in Emitter(env_file, self.emit, reserved).outputs()
+        ]
+
+    def env_file_paths(self) -> set[Path]:
+        """The .env files of this run and of every compose file in compose_folder."""
+        paths = {x.file_path for x in self.env_files.values()}
+        try:
+            found = ComposeFile.find_paths(self.compose_folder).values()
+        except FileNotFoundError:
+            found = []
+        paths.update(
+            self.env_folder / self.env_file_name_for(compose_name)
+            for _, compose_name in found
+        )
+        return paths
+
+    def update_files(self, summary: bool = True) -> Self:
+        writers: dict[Path, File | Shard | Output] = {}
+        # Shards and outputs are only added when they have changes.
+        changed: set[Path] = set()
+        shards, orphans = self.shard_env_files() if self.shard else ([], [])
         for file in self.envs.values():
 
             if self.preview_files:
                 print("########   " + file["compose"].file_path.name + "   ########")
 
-            file[".env"].update_file(
-                write=self.write_files[".env"], display=self.preview_files
-            )
+            if not self.quiet:
+                # Only reports and previews, the files are written below.
+                file[".env"].update_file(write=False, display=self.preview_files)
+            if self.write_files[".env"]:
+                writers[file[".env"].file_path] = file[".env"]
             self.updated.append(file[".env"].file_path)
-            file["compose"].update_file(
-                write=self.write_files["compose"], display=self.preview_files
-            )
+            file["compose"].update_file(write=False, display=self.preview_files)
+            if self.write_files["compose"]:
+                writers[file["compose"].file_path] = file["compose"]
             self.updated.append(file["compose"].file_path.name)
-        print("# Files updated:", *self.updated, sep="\n-  ", end="\n\n")
 
+        if self.write_files[".env"]:
+            # Unchanged shards are skipped, a change to one key only rewrites its shards.
+            for shard in shards:
+                if shard.has_changes():
+                    writers[shard.file_path] = shard
+                    changed.add(shard.file_path)
+                    self.updated.append(shard.file_path)
+            for output in self.emit_outputs():
+                # The .env file itself is already written by its EnvFile.
+                if output.file_path not in writers and output.has_changes():
+                    writers[output.file_path] = output
+                    changed.add(output.file_path)
+                    self.updated.append(output.file_path)
+        else:
+            orphans = []
+        self.updated.extend(orphans)
+
+        if self.check:
+            for path, file in writers.items():
+                old_text, new_text = current_text(file), file.render()
+                self.renders[path] = (old_text, new_text)
+                if path in changed or old_text != new_text:
+                    self.changed.append(path)
+            for orphan in orphans:
+                self.renders[orphan] = (current_text(orphan), None)
+            self.changed.extend(orphans)
+        else:
+            # Staged concurrently, then committed all or nothing.
+            transaction = Transaction(workers=self.workers)
+            for file in writers.values():
+                transaction.add_file(file)
+            for orphan in orphans:
+                transaction.remove(orphan)
+            transaction.run()
+
+        if summary:
+            self.print_summary()
+        return self
+
+    def print_summary(self) -> Self:
+        if self.check:
+            self.print(
+                "# Files that would change:", *self.changed, sep="\n-  ", end="\n\n"
+            )
+        else:
+            self.print("# Files updated:", *self.updated, sep="\n-  ", end="\n\n")
+        return self
+
+    @property
+    def stats(self) -> dict[str, str]:
+        parse_cache = Env.parse_cache_stats()
+        stats = {
+            "parse cache hits": f"{parse_cache['hits']}",
+            "parse cache misses": f"{parse_cache['misses']}",
+            "parse cache hit rate": f"{parse_cache['hit_rate']:.1%}",
+        }
+        if self.cache is not None:
+            stats["warm cache hits"] = f"{self.cache.hits}"
+            stats["warm cache misses"] = f"{self.cache.misses}"
+        stats["compose graph files"] = f"{len(self.graph.memo)}"
+        if (peak_rss := peak_rss_bytes()) is not None:
+            stats["peak RSS"] = f"{peak_rss / 2**20:.1f} MiB"
+        return stats
+
+    def print_stats(self) -> Self:
+        print("# Stats:", *[f"{k}: {v}" for k, v in self.stats.items()], sep="\n-  ")
+        print()
         return self
 
 
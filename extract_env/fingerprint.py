@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Iterable
+from typing import Self
+
+if TYPE_CHECKING:
+    from extract_env.env import Env
+
+FINGERPRINT_MASK = 2**64 - 1
+
+
+def entry_digest(key: Any, digest: int) -> int:
+    """Digest of an entry at key, so the same Env under another key differs."""
+    data = f"{key!r}\x00{digest:016x}"
+    return int.from_bytes(blake2b(data.encode(), digest_size=8).digest())
+
+
+class Fingerprint:
+    """Hash of the entries of a collection, kept up to date in O(1) per edit.
+
+    The fingerprint is the sum of the digests of its entries, each the digest
+    of an Env mixed with the key it is held under. Adding, removing or
+    replacing an entry adds or subtracts its digest, so nothing is ever
+    re-serialized. EnvFile keys entries by line position, so moving an entry
+    changes the fingerprint, while ComposeFile keys them by name.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.count = 0
+        # Key of each entry to the digest it was added with.
+        self.digests: dict[Any, int] = {}
+
+    @classmethod
+    def of(cls, entries: Iterable[tuple[Any, int]]) -> Fingerprint:
+        """Fingerprint of (key, digest) pairs, e.g. computed afresh from Env.digest."""
+        fingerprint = cls()
+        for key, digest in entries:
+            fingerprint.set(key, digest)
+        return fingerprint
+
+    def set(self, key: Any, digest: int) -> Self:
+        if key in self.digests:
+            self.discard(key)
+        self.digests[key] = entry_digest(key, digest)
+        self.total = (self.total + self.digests[key]) & FINGERPRINT_MASK
+        self.count += 1
+        return self
+
+    def discard(self, key: Any) -> Self:
+        self.total = (self.total - self.digests.pop(key)) & FINGERPRINT_MASK
+        self.count -= 1
+        return self
+
+    def combined(self, entries: Iterable[tuple[Any, int]]) -> Fingerprint:
+        """A fingerprint of these entries and more, without copying the digests."""
+        extra = Fingerprint.of(entries)
+        fingerprint = Fingerprint()
+        fingerprint.total = (self.total + extra.total) & FINGERPRINT_MASK
+        fingerprint.count = self.count + extra.count
+        return fingerprint
+
+    @property
+    def value(self) -> str:
+        return f"{self.total:016x}-{self.count}"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Fingerprint):
+            return NotImplemented
+        return self.total == other.total and self.count == other.count
+
+    def __hash__(self) -> int:
+        return hash((self.total, self.count))
+
+    def __str__(self) -> str:
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"Fingerprint('{self.value}')"
+
+
+class TrackedEnvs(OrderedDict):
+    """OrderedDict of Envs that keeps a Fingerprint of its entries.
+
+    Envs edited in place are only seen once touch() is called, as EnvFile and
+    ComposeFile do after their own edits.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.fingerprint = Fingerprint()
+        # id of each Env held to the keys it is held under.
+        self.holders: dict[int, set[Any]] = {}
+        super().__init__(*args, **kwargs)
+
+    def hold(self, key: Any, env: Env) -> None:
+        self.fingerprint.set(key, env.digest)
+        self.holders.setdefault(id(env), set()).add(key)
+
+    def release(self, key: Any) -> None:
+        self.fingerprint.discard(key)
+        keys = self.holders[id(self[key])]
+        keys.discard(key)
+        if not keys:
+            del self.holders[id(self[key])]
+
+    def __setitem__(self, key: Any, env: Env) -> None:
+        if key in self:
+            self.release(key)
+        super().__setitem__(key, env)
+        self.hold(key, env)
+
+    def __delitem__(self, key: Any) -> None:
+        self.release(key)
+        super().__delitem__(key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        env = self[key]
+        del self[key]
+        return env
+
+    def popitem(self, last: bool = True) -> tuple[Any, Env]:
+        if not self:
+            raise KeyError("dictionary is empty")
+        key = next(reversed(self)) if last else next(iter(self))
+        return key, self.pop(key)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self) -> None:
+        super().clear()
+        self.fingerprint = Fingerprint()
+        self.holders = {}
+
+    def touch(self, env: Env) -> Self:
+        """Updates the fingerprint after env was edited in place."""
+        for key in self.holders.get(id(env), ()):
+            self.fingerprint.set(key, env.digest)
+        return self
+
+    def reset(self, items: Iterable[tuple[Any, Env]]) -> Self:
+        """Replaces the contents, only entries whose key or Env changed touch the
+        fingerprint."""
+        items = [*items]
+        new = dict(items)
+        for key, env in [*self.items()]:
+            if new.get(key) is not env:
+                self.release(key)
+        old = dict(self.items())
+        super().clear()
+        for key, env in items:
+            super().__setitem__(key, env)
+            if old.get(key) is not env:
+                self.hold(key, env)
+        return self
+
+    def __reduce__(self):
+        # Copies rebuild their own fingerprint from the copied Envs.
+        return (self.__class__, (), None, None, iter(self.items()))
@@ -0,0 +1,478 @@
+"""Differential fuzzing of the optimized extraction paths against a reference path.
+
+Random compose and .env inputs, with comments, duplicate keys, prefixes and
+postfixes, combine on and off, parameter expansions, env_file:, extends: and
+include:, are extracted by every path in PATHS. Each path must leave
+byte-identical files behind, or fail with the same error, as the reference
+path, which runs the original uncached parser, plain rebuilds for removing
+duplicates and rewriting the YAML, one thread and full rewrites. The time every path takes on
+the same corpus is recorded so speedups can be compared.
+
+    python -m extract_env.fuzz --cases 200 --seed 1
+"""
+
+from __future__ import annotations
+
+import io
+import random
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+
+import click
+
+from extract_env.cache import WarmCache
+from extract_env.compose import ComposeFile
+from extract_env.env import Env
+from extract_env.env import EnvService
+from extract_env.envfile import EnvFile
+from extract_env.envlist import EnvList
+from extract_env.lock import DEFAULT_LOCK_TIMEOUT
+from extract_env.plan import apply
+from extract_env.plan import plan
+from extract_env.utils import Source
+
+KEYS = ["A", "B", "DB_HOST", "DB_PORT", "MODE", "TOKEN"]
+SERVICES = ["web", "db", "worker", "cache-1"]
+WORDS = ["x", "1", "10001", "pgsql", "on", "a/b", "v1.2"]
+
+Outcome = dict[str, bytes] | tuple[str, str]
+
+
+@dataclass
+class Case:
+    seed: int
+    files: dict[str, str]
+    combine: bool = True
+    prefix: str = ""
+    postfix: str = ""
+
+    @property
+    def size(self) -> int:
+        return sum(len(x.encode()) for x in self.files.values())
+
+    def lines(self) -> Iterator[str]:
+        for name, text in self.files.items():
+            if name.startswith(".env") or name.endswith(".env"):
+                yield from text.splitlines()
+            else:
+                for line in text.splitlines():
+                    if line.startswith("      - "):
+                        yield line.removeprefix("      - ").partition("  #")[0]
+
+
+def random_value(rng: random.Random, key: str) -> str:
+    roll = rng.random()
+    if roll < 0.2:
+        return f"${{{key}}}"
+    elif roll < 0.3:
+        return f"${{{rng.choice(KEYS)}}}"
+    elif roll < 0.4:
+        return ""
+    return rng.choice(WORDS)
+
+
+def environment_lines(rng: random.Random) -> list[str]:
+    lines = ["    environment:"]
+    for key in rng.sample(KEYS, rng.randint(1, 4)):
+        entry = f"{key}={random_value(rng, key)}"
+        if rng.random() < 0.2:
+            entry += f"  # note {rng.randint(0, 9)}"
+        lines.append(f"      - {entry}")
+    return lines
+
+
+def env_lines(rng: random.Random) -> list[str]:
+    lines = []
+    for _ in range(rng.randint(0, 6)):
+        roll = rng.random()
+        if roll < 0.15:
+            lines.append(f"# comment {rng.randint(0, 9)}")
+        elif roll < 0.25:
+            lines.append("")
+        else:
+            key = rng.choice(KEYS)
+            line = f"{key}={random_value(rng, key)}"
+            if rng.random() < 0.2:
+                line += " # kept"
+            lines.append(line)
+    return lines
+
+
+def generate_case(seed: int) -> Case:
+    rng = random.Random(seed)
+    files = {}
+    # Referenced through env_file:, extends: and include:, never extracted themselves.
+    files["web.env"] = "".join(f"{x}\n" for x in env_lines(rng))
+    files["base.yaml"] = (
+        "\n".join(["services:", "  app:", "    image: x", *environment_lines(rng)])
+        + "\n"
+    )
+    files["common.yaml"] = (
+        "\n".join(["services:", "  queue:", "    image: x", *environment_lines(rng)])
+        + "\n"
+    )
+    for compose_name in rng.sample(["", "dev", "prod"], rng.randint(1, 2)):
+        lines = ["services:"]
+        if rng.random() < 0.15:
+            lines = ["include:", "  - common.yaml", *lines]
+        for service in rng.sample(SERVICES, rng.randint(1, 3)):
+            lines += [f"  {service}:", "    image: x"]
+            if rng.random() < 0.2:
+                lines += ["    extends:", "      file: base.yaml", "      service: app"]
+            if rng.random() < 0.2:
+                lines.append("    env_file: web.env")
+            lines += environment_lines(rng)
+        if rng.random() < 0.03:
+            # Broken YAML, every path has to fail the same way.
+            lines.append("    - [")
+        name = f"compose.{compose_name}.yaml" if compose_name else "compose.yaml"
+        files[name] = "\n".join(lines) + "\n"
+
+        if rng.random() < 0.7:
+            env_name = f".env.{compose_name}" if compose_name else ".env"
+            files[env_name] = "".join(f"{x}\n" for x in env_lines(rng))
+
+    return Case(
+        seed=seed,
+        files=files,
+        combine=rng.random() < 0.7,
+        prefix=rng.choice(["", "", "APP"]),
+        postfix=rng.choice(["", "", "X"]),
+    )
+
+
+def reference_from_string(
+    cls,
+    string: str,
+    prefix: str = "",
+    postfix: str = "",
+    line: Optional[int] = None,
+    service_name: Optional[str] = None,
+    source: Optional[Source] = None,
+) -> Env:
+    """Env.from_string as it was before parsing was cached, kept as the reference."""
+    if not isinstance(string, str):
+        raise TypeError(f"Expected string, got {type(string)}")
+
+    if string.startswith("# ") or string == "":
+        return cls(key="", value="", com=string, line=line, services=[], source=source)
+    k, _, v = string.partition("=")
+    k = k.strip(" \n")
+    if service_name and source == "compose":
+        service = EnvService(service=service_name, key=k, line=line, source=source)
+    else:
+        service = None
+
+    key = value = comment = ""
+    if prefix != "":
+        prefix = f"{prefix}_"
+    if postfix != "":
+        postfix = f"_{postfix}"
+    if k:
+        key = f"{prefix}{k}{postfix}"
+    v = v.strip(" \n")
+    if v:
+        value, _, comment = v.partition(" #")
+        value = value.strip(" \n")
+        comment = comment.strip(" \n")
+    ret_cls = cls(
+        key=key,
+        value=value,
+        com=comment,
+        line=line,
+        services=[service] if service else [],
+        source=source,
+    )
+    if service:
+        service.parent_env = ret_cls
+    return ret_cls
+
+
+def reference_remove_duplicates(self: EnvFile) -> EnvFile:
+    """EnvFile.remove_duplicates as a rebuild of the entries, kept as the reference.
+
+    Of the entries sharing a key, the one that wins the comparison of Envs
+    takes the place and comment of the first, later compose entries that tie
+    with it must have its value and give it their services.
+    """
+    envs = [*self.envs.values()]
+    best: dict[str, list[Env]] = {}
+    for env in envs:
+        if not env.key:
+            continue
+        if env.key not in best or best[env.key][0] < env:
+            best[env.key] = [env]
+        elif env.source == "compose":
+            best[env.key].append(env)
+
+    kept: list[Env] = []
+    seen: set[str] = set()
+    for env in envs:
+        if env.key in seen:
+            continue
+        if env.key:
+            seen.add(env.key)
+        if not env.key or sum(x.key == env.key for x in envs) == 1:
+            kept.append(env)
+            continue
+        first, *ties = best[env.key]
+        for tie in ties:
+            if tie.value != first.value:
+                raise ValueError(
+                    f"Duplicate keys ({env.key}) with different values: {first.value} != {tie.value}"
+                )
+            first.append_services(tie.services)
+        first.comment = env.comment
+        kept.append(first)
+    if len(kept) == len(envs):
+        return self
+    self.envs = OrderedDict(enumerate(kept))
+    return self.update_keys(remove_duplicates=False)
+
+
+def reference_update_yaml(self: ComposeFile) -> ComposeFile:
+    """ComposeFile.update_yaml as a walk over every environment line of the YAML,
+    kept as the reference."""
+    for service, service_yaml in (self.compose_yaml.get("services") or {}).items():
+        environment = (service_yaml or {}).get("environment")
+        if not isinstance(environment, list):
+            continue
+        for line in range(len(environment)):
+            for env_service in self.env_services:
+                if (env_service.service, env_service.line) != (service, line):
+                    continue
+                if env_service.parent_env is None:
+                    raise ValueError("EnvService has no parent Env")
+                environment[line] = (
+                    env_service.key + "=" + env_service.parent_env.to_compose_string()
+                )
+    for service, (entries, generated) in self.service_env_files.items():
+        self.update_env_file_entries(service, entries, generated)
+    return self
+
+
+@contextmanager
+def reference_mode() -> Iterator[None]:
+    """Swaps in the uncached parser and the plain rebuilds of remove_duplicates
+    and update_yaml, and disables the append-only write path."""
+    from_string = Env.__dict__["from_string"]
+    appended_text = EnvFile.appended_text
+    remove_duplicates = EnvFile.remove_duplicates
+    update_yaml = ComposeFile.update_yaml
+    Env.from_string = classmethod(reference_from_string)
+    EnvFile.appended_text = lambda self, text: None
+    EnvFile.remove_duplicates = reference_remove_duplicates
+    ComposeFile.update_yaml = reference_update_yaml
+    try:
+        yield
+    finally:
+        Env.from_string = from_string
+        EnvFile.appended_text = appended_text
+        EnvFile.remove_duplicates = remove_duplicates
+        ComposeFile.update_yaml = update_yaml
+
+
+def run_envlist(folder: Path, case: Case, **kwargs) -> None:
+    EnvList(
+        compose_folder=folder,
+        env_folder=folder,
+        combine=case.combine,
+        prefix=case.prefix,
+        postfix=case.postfix,
+        use_current_env=False,
+        lock_timeout=DEFAULT_LOCK_TIMEOUT,
+        **kwargs,
+    )
+
+
+def run_reference(folder: Path, case: Case) -> None:
+    with reference_mode():
+        run_envlist(folder, case, workers=1)
+
+
+def run_warm_cache(folder: Path, case: Case) -> None:
+    cache = WarmCache()
+    run_envlist(folder, case, write=False, update_compose=False, cache=cache)
+    run_envlist(folder, case, cache=cache)
+
+
+def run_plan(folder: Path, case: Case) -> None:
+    apply(
+        plan(
+            folder,
+            folder,
+            combine=case.combine,
+            prefix=case.prefix,
+            postfix=case.postfix,
+            use_current_env=False,
+        )
+    )
+
+
+PATHS: dict[str, Callable[[Path, Case], None]] = {
+    "reference": run_reference,
+    "optimized": lambda folder, case: run_envlist(folder, case),
+    "stream": lambda folder, case: run_envlist(folder, case, stream=True, read_ahead=2),
+    "warm-cache": run_warm_cache,
+    "dotenv-grammar": lambda folder, case: run_envlist(
+        folder, case, dotenv_grammar=True
+    ),
+    "plan": run_plan,
+}
+
+
+def run_path(path: Callable[[Path, Case], None], case: Case) -> tuple[Outcome, float]:
+    """Runs a path on a fresh copy of the case and returns the files it left behind."""
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        for name, text in case.files.items():
+            (folder / name).write_text(text)
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(io.StringIO()):
+                path(folder, case)
+        except Exception as e:
+            return (type(e).__name__, str(e).replace(tmp, "<tmp>")), (
+                time.perf_counter() - start
+            )
+        elapsed = time.perf_counter() - start
+        return {
+            x.name: x.read_bytes() for x in sorted(folder.iterdir()) if x.is_file()
+        }, elapsed
+
+
+def parse_mismatches(case: Case, timings: dict[str, float]) -> list[str]:
+    """Compares Env.from_string with the reference parser on every line of a case."""
+    mismatches = []
+    for line in case.lines():
+        for source, service in (("dot_env", None), ("compose", "web")):
+            args = (line, case.prefix, case.postfix, 0, service, source)
+            start = time.perf_counter()
+            expected = reference_from_string(Env, *args)
+            timings["parse-reference"] += time.perf_counter() - start
+            start = time.perf_counter()
+            actual = Env.from_string(*args)
+            timings["parse-optimized"] += time.perf_counter() - start
+            if (str(expected), expected.comment, expected.services) != (
+                str(actual),
+                actual.comment,
+                actual.services,
+            ):
+                mismatches.append(f"parse {line!r} ({source})")
+    return mismatches
+
+
+@dataclass
+class Report:
+    cases: int = 0
+    size: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+    mismatches: list[str] = field(default_factory=list)
+
+    def throughput(self) -> list[str]:
+        lines = []
+        for name, seconds in self.timings.items():
+            # Parser timings are compared with the reference parser, the rest with
+            # the reference path.
+            reference = self.timings.get(
+                "parse-reference" if name.startswith("parse-") else "reference"
+            )
+            speedup = f"  {reference / seconds:.2f}x" if reference and seconds else ""
+            lines.append(
+                f"{name:<16} {self.cases / seconds:8.1f} cases/s {self.size / seconds / 1024:8.1f} KiB/s{speedup}"
+            )
+        return lines
+
+
+def fuzz(cases: int = 100, seed: int = 0, paths: Optional[list[str]] = None) -> Report:
+    """Runs cases generated from seed through every path and compares them to the reference."""
+    names = ["reference", *[x for x in paths or PATHS if x != "reference"]]
+    report = Report(
+        timings={x: 0.0 for x in [*names, "parse-reference", "parse-optimized"]}
+    )
+    for case_seed in range(seed, seed + cases):
+        case = generate_case(case_seed)
+        report.cases += 1
+        report.size += case.size
+
+        report.mismatches.extend(
+            f"case {case_seed}: {x}" for x in parse_mismatches(case, report.timings)
+        )
+
+        expected, elapsed = run_path(PATHS["reference"], case)
+        report.timings["reference"] += elapsed
+        for name in names[1:]:
+            outcome, elapsed = run_path(PATHS[name], case)
+            report.timings[name] += elapsed
+            if outcome != expected:
+                report.mismatches.append(f"case {case_seed}: {name} differs")
+    return report
+
+
+def save_case(case: Case, folder: Path) -> Path:
+    case_folder = folder / f"case-{case.seed}"
+    shutil.rmtree(case_folder, ignore_errors=True)
+    case_folder.mkdir(parents=True)
+    for name, text in case.files.items():
+        (case_folder / name).write_text(text)
+    (case_folder / "options.txt").write_text(
+        f"combine={case.combine} prefix={case.prefix!r} postfix={case.postfix!r}\n"
+    )
+    return case_folder
+
+
+@click.command()
+@click.option(
+    "-n",
+    "--cases",
+    default=100,
+    type=click.IntRange(min=1),
+    help="Number of generated cases.  Default: 100",
+)
+@click.option(
+    "-s", "--seed", default=0, type=int, help="Seed of the first case.  Default: 0"
+)
+@click.option(
+    "-p",
+    "--path",
+    "paths",
+    multiple=True,
+    type=click.Choice([*PATHS]),
+    help="Only compare these paths with the reference.  Default: every path",
+)
+@click.option(
+    "--keep",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Save the inputs of failing cases to this folder.  Default: None",
+)
+@click.help_option("-h", "--help")
+def main(cases, seed, paths, keep):
+    """Differential fuzzing of the optimized extraction paths."""
+    report = fuzz(cases, seed, [*paths] or None)
+    print("# Throughput:", *report.throughput(), sep="\n-  ")
+    print()
+    if not report.mismatches:
+        print(f"All {report.cases} cases match the reference")
+        return 0
+
+    print("# Mismatches:", *report.mismatches, sep="\n-  ")
+    if keep:
+        seeds = {int(x.split(":")[0].removeprefix("case ")) for x in report.mismatches}
+        for case_seed in sorted(seeds):
+            print("Saved", save_case(generate_case(case_seed), Path(keep)))
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
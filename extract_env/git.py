@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+
+class GitError(RuntimeError):
+    pass
+
+
+def git(*args: str, cwd: Path | str = ".") -> str:
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError:
+        raise GitError("git was not found, it is needed for --since")
+    except subprocess.CalledProcessError as e:
+        raise GitError(f"'git {' '.join(args)}' failed: {e.stderr.strip()}")
+    return result.stdout
+
+
+def changed_files(since: str, cwd: Path | str = ".") -> set[Path]:
+    """Files changed since a git ref, including staged, unstaged and untracked files.
+
+    Args:
+        since (str): Any git ref, e.g. 'HEAD~1', 'origin/main' or a commit hash.
+        cwd (Path | str): A folder inside the git repository.
+
+    Raises:
+        GitError: git is missing, cwd is not in a repository or the ref is unknown.
+
+    Returns:
+        set[Path]: The resolved paths of the changed files.
+    """
+    root = Path(git("rev-parse", "--show-toplevel", cwd=cwd).strip())
+    changed = {
+        root / x
+        for x in git("diff", "--name-only", "-z", since, "--", cwd=cwd).split("\0")
+        if x
+    }
+
+    # Porcelain entries are 'XY path', renames and copies are followed by the old path.
+    entries = iter(
+        git("status", "--porcelain=v1", "-z", "--untracked-files=all", cwd=cwd).split(
+            "\0"
+        )
+    )
+    for entry in entries:
+        if not entry:
+            continue
+        changed.add(root / entry[3:])
+        if entry[0] in "RC":
+            changed.add(root / next(entries, ""))
+    return {x.resolve() for x in changed}
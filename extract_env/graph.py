@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+from extract_env.compose import ComposeFile
+from extract_env.compose import ServiceRefs
+from extract_env.compose import entry_key
+
+
+class ComposeGraphError(ValueError):
+    pass
+
+
+class ComposeCycleError(ComposeGraphError):
+    def __init__(self, cycle: list[str]) -> None:
+        self.cycle = cycle
+        super().__init__(f"Found a cyclic compose reference: {' -> '.join(cycle)}")
+
+
+@dataclass(frozen=True)
+class GraphNode:
+    """What the graph keeps of a compose file: its include: paths and the
+    ServiceRefs of its services, never the parsed YAML."""
+
+    include_paths: tuple[Path, ...]
+    service_refs: Mapping[str, ServiceRefs]
+
+    @classmethod
+    def of(cls, compose_file: ComposeFile) -> GraphNode:
+        return cls(
+            tuple(compose_file.include_paths),
+            MappingProxyType(dict(compose_file.service_refs)),
+        )
+
+
+class ComposeGraph:
+    """Follows the top level include: and the service level extends: of compose files.
+
+    The graph is built from GraphNodes memoized by resolved path: the compose
+    files of the run are added as they are read, and files only reached
+    through include: or extends: are read once, in memory, and shared by every
+    compose file that references them. Only the references are kept, so a
+    streamed run does not hold on to the files it has processed. Cycles in
+    either kind of reference raise ComposeCycleError.
+    """
+
+    def __init__(self) -> None:
+        self.memo: dict[Path, GraphNode] = {}
+        self._lock = threading.RLock()
+
+    def add(self, compose_file: ComposeFile) -> GraphNode:
+        """Makes an already read compose file part of the graph."""
+        with self._lock:
+            file_path = compose_file.file_path.resolve()
+            if file_path not in self.memo:
+                self.memo[file_path] = GraphNode.of(compose_file)
+            return self.memo[file_path]
+
+    def load(self, file_path: Path) -> GraphNode:
+        file_path = file_path.resolve()
+        with self._lock:
+            if file_path not in self.memo:
+                if not file_path.is_file():
+                    raise ComposeGraphError(f"Compose file not found: {file_path}")
+                self.memo[file_path] = GraphNode.of(
+                    ComposeFile.from_string(file_path.read_text(), file_path)
+                )
+            return self.memo[file_path]
+
+    def walk(self, file_path: Path) -> list[Path]:
+        """Every file reachable through include:, each once, in depth first order."""
+        order: list[Path] = []
+        done: set[Path] = set()
+        stack: list[Path] = []
+
+        def visit(path: Path) -> None:
+            path = path.resolve()
+            if path in stack:
+                raise ComposeCycleError(
+                    [x.name for x in stack[stack.index(path) :]] + [path.name]
+                )
+            if path in done:
+                return
+            stack.append(path)
+            for included in self.load(path).include_paths:
+                visit(included)
+            stack.pop()
+            done.add(path)
+            order.append(path)
+
+        visit(file_path)
+        return order
+
+    def service(self, file_path: Path, service: str) -> ServiceRefs:
+        service_refs = self.load(file_path).service_refs
+        if service not in service_refs:
+            raise ComposeGraphError(
+                f"Service '{service}' not found in {file_path.resolve()}"
+            )
+        return service_refs[service]
+
+    def environment(
+        self, file_path: Path, service: str, stack: tuple = ()
+    ) -> OrderedDict[str, str]:
+        """The environment of a service merged over the services it extends, by key."""
+        node = (file_path.resolve(), service)
+        if node in stack:
+            cycle = [*stack[stack.index(node) :], node]
+            raise ComposeCycleError([f"{x.name}:{s}" for x, s in cycle])
+
+        service_refs = self.service(file_path, service)
+        merged: OrderedDict[str, str] = OrderedDict()
+        if service_refs.extends:
+            base_path, base_service = self.extends(file_path, service_refs.extends)
+            merged.update(self.environment(base_path, base_service, (*stack, node)))
+        for entry in service_refs.environment:
+            merged[entry_key(entry)] = entry
+        return merged
+
+    @staticmethod
+    def extends(file_path: Path, extends: str | dict) -> tuple[Path, str]:
+        if isinstance(extends, str):
+            return file_path, extends
+        if base_file := extends.get("file"):
+            return file_path.parent / base_file, extends["service"]
+        return file_path, extends["service"]
+
+    def inherited_environment(self, file_path: Path, service: str) -> list[str]:
+        """The entries a service gets from the services it extends and does not override."""
+        service_refs = self.service(file_path, service)
+        if not service_refs.extends:
+            return []
+        own = {entry_key(x) for x in service_refs.environment}
+        base_path, base_service = self.extends(file_path, service_refs.extends)
+        node = (file_path.resolve(), service)
+        inherited = self.environment(base_path, base_service, (node,))
+        return [entry for key, entry in inherited.items() if key not in own]
+
+    def included_environment(self, file_path: Path) -> OrderedDict[str, list[str]]:
+        """The environment of every service of the files file_path includes,
+        directly or not, which docker compose makes part of the same project."""
+        included: OrderedDict[str, list[str]] = OrderedDict()
+        for path in self.walk(file_path)[:-1]:
+            for service in self.load(path).service_refs:
+                included[service] = [*self.environment(path, service).values()]
+        return included
+
+    def apply(self, compose_file: ComposeFile) -> ComposeFile:
+        """Checks the include: graph of a compose file and adds the environment
+        its services inherit through extends:, and that the services of the
+        files it includes have, to the extraction."""
+        if compose_file.in_memory:
+            return compose_file
+        self.add(compose_file)
+        for service in compose_file.services:
+            if inherited := self.inherited_environment(compose_file.file_path, service):
+                compose_file.add_inherited_envs(service, inherited)
+        for service, entries in self.included_environment(
+            compose_file.file_path
+        ).items():
+            compose_file.add_inherited_envs(service, entries)
+        return compose_file
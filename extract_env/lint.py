@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Literal
+from typing import Mapping
+from typing import Optional
+
+from extract_env.compose import ComposeFile
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.resolver import REFERENCE_PATTERN
+
+Severity = Literal["error"] | Literal["warning"]
+
+NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass
+class Finding:
+    rule: str
+    severity: Severity
+    message: str
+    file_path: Path
+    line: Optional[int] = None
+    service: Optional[str] = None
+
+    @property
+    def location(self) -> str:
+        if self.line is not None:
+            return f"{self.file_path}:{self.line}"
+        if self.service is not None:
+            return f"{self.file_path} (service '{self.service}')"
+        return f"{self.file_path}"
+
+    def __str__(self) -> str:
+        return f"{self.location}: {self.severity}: {self.message} [{self.rule}]"
+
+
+@dataclass
+class Occurrence:
+    """A key/value entry of a .env file line or a compose service environment."""
+
+    env: Env
+    file_path: Path
+    line: Optional[int] = None
+    service: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.env.key
+
+    @property
+    def from_compose(self) -> bool:
+        return self.service is not None
+
+
+@dataclass
+class Reference:
+    occurrence: Occurrence
+    name: str
+    has_default: bool
+
+
+class LintContext:
+    """Indexes shared by every rule, built in a single pass over a .env file and
+    the compose files combined into it.
+
+    The .env file is indexed from its raw text rather than from its entries,
+    as reading an EnvFile already drops duplicate keys.
+    """
+
+    def __init__(
+        self,
+        env_file: EnvFile,
+        compose_files: Iterable[ComposeFile],
+        environ: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        if environ is None:
+            environ = os.environ if env_file.use_current_env else {}
+        self.env_file = env_file
+        self.compose_files = [*compose_files]
+        self.environ = environ
+        self.env_entries: dict[str, list[Occurrence]] = {}
+        self.compose_entries: dict[str, list[Occurrence]] = {}
+        self.references: list[Reference] = []
+        self.referenced: set[str] = set()
+        self.occurrences: list[Occurrence] = []
+
+        for env in env_file.read_envs():
+            if env.key:
+                occurrence = Occurrence(env, env_file.file_path, env.line + 1)
+                self.add(self.env_entries, occurrence)
+        for compose_file in self.compose_files:
+            for service, envs in compose_file.service_envs.items():
+                for env in envs.values():
+                    occurrence = Occurrence(
+                        env, compose_file.file_path, service=service
+                    )
+                    self.add(self.compose_entries, occurrence)
+
+    def add(self, index: dict[str, list[Occurrence]], occurrence: Occurrence) -> None:
+        index.setdefault(occurrence.key, []).append(occurrence)
+        self.occurrences.append(occurrence)
+        for match in REFERENCE_PATTERN.finditer(occurrence.env.value):
+            if name := match.group("braced") or match.group("named"):
+                op = match.group("op") or ""
+                self.references.append(
+                    Reference(occurrence, name, "?" not in op and op != "")
+                )
+                self.referenced.add(name)
+
+    def is_defined(self, key: str) -> bool:
+        return key in self.env_entries or key in self.environ
+
+
+@dataclass(frozen=True)
+class LintRule:
+    name: str
+    severity: Severity
+    description: str
+    check: Callable[[LintContext, LintRule], Iterator[Finding]]
+
+    def finding(
+        self,
+        message: str,
+        occurrence: Occurrence,
+        severity: Optional[Severity] = None,
+    ) -> Finding:
+        return Finding(
+            rule=self.name,
+            severity=severity or self.severity,
+            message=message,
+            file_path=occurrence.file_path,
+            line=occurrence.line,
+            service=occurrence.service,
+        )
+
+
+RULES: dict[str, LintRule] = {}
+
+
+def rule(name: str, severity: Severity, description: str):
+    """Registers a check under name, run by lint() unless a subset of rules is asked for."""
+
+    def register(check: Callable[[LintContext, LintRule], Iterator[Finding]]):
+        RULES[name] = LintRule(name, severity, description, check)
+        return check
+
+    return register
+
+
+@rule("conflicts", "error", "The same key is given different values.")
+def check_conflicts(ctx: LintContext, lint_rule: LintRule) -> Iterator[Finding]:
+    for key, occurrences in ctx.env_entries.items():
+        first = occurrences[0]
+        for occurrence in occurrences[1:]:
+            if occurrence.env.value != first.env.value:
+                yield lint_rule.finding(
+                    f"'{key}' is '{occurrence.env.value}' here but '{first.env.value}' on line {first.line}",
+                    occurrence,
+                )
+
+    for key, occurrences in ctx.compose_entries.items():
+        literals = [x for x in occurrences if x.env.value and "$" not in x.env.value]
+        if not literals:
+            continue
+        first = literals[0]
+        for occurrence in literals[1:]:
+            if occurrence.env.value != first.env.value:
+                yield lint_rule.finding(
+                    f"'{key}' is '{occurrence.env.value}' here but '{first.env.value}' in service '{first.service}'",
+                    occurrence,
+                )
+        if key in ctx.env_entries:
+            env_value = ctx.env_entries[key][0].env.value
+            if env_value != first.env.value:
+                yield lint_rule.finding(
+                    f"'{key}' is '{first.env.value}' here but '{env_value}' in {ctx.env_file.file_path}, extracting would overwrite it",
+                    first,
+                    severity="warning",
+                )
+
+
+@rule(
+    "missing-value",
+    "warning",
+    "A key has no value in the .env file or the environment.",
+)
+def check_missing_values(ctx: LintContext, lint_rule: LintRule) -> Iterator[Finding]:
+    for occurrence in ctx.occurrences:
+        if occurrence.env.value:
+            continue
+        if occurrence.from_compose:
+            if not ctx.is_defined(occurrence.key):
+                yield lint_rule.finding(
+                    f"'{occurrence.key}' has no value", occurrence, "error"
+                )
+        elif occurrence.key not in ctx.environ:
+            yield lint_rule.finding(
+                f"'{occurrence.key}' has an empty value", occurrence
+            )
+
+    for reference in ctx.references:
+        if reference.name == reference.occurrence.key and not reference.has_default:
+            if not ctx.is_defined(reference.name):
+                yield lint_rule.finding(
+                    f"'{reference.name}' has no value", reference.occurrence, "error"
+                )
+
+
+@rule(
+    "unused-key",
+    "warning",
+    "A .env key is neither used by a compose service nor referenced.",
+)
+def check_unused_keys(ctx: LintContext, lint_rule: LintRule) -> Iterator[Finding]:
+    for key, occurrences in ctx.env_entries.items():
+        if key not in ctx.compose_entries and key not in ctx.referenced:
+            yield lint_rule.finding(
+                f"'{key}' is not used by any service", occurrences[0]
+            )
+
+
+@rule("invalid-name", "error", "A key is not a valid environment variable name.")
+def check_invalid_names(ctx: LintContext, lint_rule: LintRule) -> Iterator[Finding]:
+    for occurrence in ctx.occurrences:
+        if not NAME_PATTERN.match(occurrence.key):
+            yield lint_rule.finding(
+                f"'{occurrence.key}' is not a valid variable name", occurrence
+            )
+
+
+@rule("unresolved-reference", "error", "A value references a name that is set nowhere.")
+def check_unresolved_references(
+    ctx: LintContext, lint_rule: LintRule
+) -> Iterator[Finding]:
+    for reference in ctx.references:
+        if reference.has_default or reference.name == reference.occurrence.key:
+            continue
+        if not ctx.is_defined(reference.name):
+            yield lint_rule.finding(
+                f"'{reference.occurrence.key}' references '{reference.name}', which is not set",
+                reference.occurrence,
+            )
+
+
+@rule(
+    "shadowed-key",
+    "warning",
+    "A .env entry is overridden by a later line or the environment.",
+)
+def check_shadowed_keys(ctx: LintContext, lint_rule: LintRule) -> Iterator[Finding]:
+    for key, occurrences in ctx.env_entries.items():
+        first = occurrences[0]
+        for occurrence in occurrences[1:]:
+            if occurrence.env.value == first.env.value:
+                yield lint_rule.finding(
+                    f"'{key}' repeats line {first.line}", occurrence
+                )
+        if key in ctx.environ and ctx.environ[key] != first.env.value:
+            yield lint_rule.finding(
+                f"'{key}' is overridden by the current environment", first
+            )
+
+
+def lint(
+    env_file: EnvFile,
+    compose_files: Iterable[ComposeFile],
+    rules: Optional[Iterable[str]] = None,
+    environ: Optional[Mapping[str, str]] = None,
+) -> list[Finding]:
+    """Runs the lint rules over a .env file and the compose files combined into it.
+
+    Args:
+        rules (Optional[Iterable[str]]): Names of the rules to run. Default: every rule in RULES.
+        environ (Optional[Mapping[str, str]]): The environment used for lookups.
+            Default: os.environ when the EnvFile has use_current_env set.
+
+    Raises:
+        KeyError: An unknown rule name.
+
+    Returns:
+        list[Finding]: Every finding of every rule, errors first.
+    """
+    selected = [RULES[x] for x in rules] if rules else [*RULES.values()]
+    ctx = LintContext(env_file, compose_files, environ)
+    findings = [x for lint_rule in selected for x in lint_rule.check(ctx, lint_rule)]
+    return sorted(findings, key=lambda x: x.severity != "error")
+
+
+def lint_folder(
+    compose_folder: Path | str = "./",
+    env_folder: Path | str = "./",
+    compose_file: Iterable[Path | str] = (),
+    combine: bool = True,
+    prefix: str = "",
+    postfix: str = "",
+    env_file_name: str = ".env",
+    use_current_env: bool = True,
+    rules: Optional[Iterable[str]] = None,
+    dotenv_grammar: bool = False,
+) -> dict[Path, list[Finding]]:
+    """Lints every .env file together with the compose files that target it.
+
+    Args:
+        dotenv_grammar (bool): Read the .env files with the full dotenv grammar,
+            as the extraction does with the same option.
+
+    Returns:
+        dict[Path, list[Finding]]: The findings for each .env file.
+    """
+    compose_kwargs = dict(
+        combine=combine,
+        prefix=prefix,
+        postfix=postfix,
+        env_file_name_base=env_file_name,
+    )
+    if compose_file:
+        compose_files = [ComposeFile(x, **compose_kwargs) for x in compose_file]
+    else:
+        compose_files = [
+            ComposeFile(path, compose_name=compose_name, **compose_kwargs)
+            for path, compose_name in ComposeFile.find_paths(compose_folder).values()
+        ]
+
+    targets: dict[str, list[ComposeFile]] = {}
+    for x in compose_files:
+        targets.setdefault(x.env_file_name, []).append(x)
+
+    findings = {}
+    for name, target_compose_files in targets.items():
+        # Read without EnvFile's file handling, linting never creates a missing .env.
+        env_path = Path(env_folder) / name
+        env_file = EnvFile.from_string(
+            env_path.read_text() if env_path.is_file() else "",
+            env_path,
+            use_current_env=use_current_env,
+            dotenv_grammar=dotenv_grammar,
+        )
+        findings[env_file.file_path] = lint(env_file, target_compose_files, rules)
+    return findings
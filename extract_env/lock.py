@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from typing import Self
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+DEFAULT_LOCK_TIMEOUT = 10.0
+
+
+class LockTimeoutError(TimeoutError):
+    pass
+
+
+class FileLock:
+    """Advisory, cross-process lock for a file being read, merged and written.
+
+    The lock is held on a sidecar file next to the target (e.g.
+    '..env.extract-env.lock' for '.env') so it survives the target being
+    truncated or replaced. The name keeps the target's own name whole, so no
+    two targets, nor a target and another's sidecar, share a lock. The sidecar
+    is removed again on release, so a run leaves no files behind. On platforms
+    without fcntl the lock is a no-op.
+    """
+
+    def __init__(
+        self,
+        file_path: Path | str,
+        timeout: float = DEFAULT_LOCK_TIMEOUT,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.file_path = Path(file_path)
+        self.lock_path = self.lock_path_for(self.file_path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    @staticmethod
+    def lock_path_for(file_path: Path) -> Path:
+        return file_path.with_name(f".{file_path.name}.extract-env.lock")
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> Self:
+        if self.locked or fcntl is None:
+            return self
+
+        deadline = time.monotonic() + self.timeout
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockTimeoutError(
+                        f"Timed out after {self.timeout}s waiting for the lock on '{self.file_path}' ({self.lock_path}), another extract-env run is using it."
+                    )
+                time.sleep(self.poll_interval)
+                continue
+            if self.is_current(fd):
+                break
+            # The holder removed the sidecar while this run waited for it, so the
+            # lock is on a file nobody else will see. Lock the new sidecar instead.
+            os.close(fd)
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = fd
+        return self
+
+    def is_current(self, fd: int) -> bool:
+        """Whether fd is still the sidecar at lock_path."""
+        try:
+            return os.fstat(fd).st_ino == os.stat(self.lock_path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def release(self) -> Self:
+        if self._fd is None:
+            return self
+        # Removed while still locked, runs waiting on it notice and retry.
+        self.lock_path.unlink(missing_ok=True)
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        return self
+
+    def __enter__(self) -> Self:
+        return self.acquire()
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    def __repr__(self) -> str:
+        return f"FileLock('{self.file_path}', timeout={self.timeout}, locked={self.locked})"
@@ -1,7 +1,31 @@
 #!/usr/bin/python3
+import signal
+import sys
+from pathlib import Path
+
 import click
 
 from extract_env import EnvList
+from extract_env.catalog import Catalog
+from extract_env.catalog import default_catalog_path
+from extract_env.client import default_socket_path
+from extract_env.emit import FORMATS
+from extract_env.emit import EmitCollisionError
+from extract_env.git import GitError
+from extract_env.graph import ComposeGraphError
+from extract_env.lint import RULES
+from extract_env.lint import lint_folder
+from extract_env.lock import DEFAULT_LOCK_TIMEOUT
+from extract_env.lock import LockTimeoutError
+from extract_env.pipe import FD_PREFIX
+from extract_env.pipe import STDIO
+from extract_env.pipe import run_pipe
+from extract_env.plan import StalePlanError
+from extract_env.plan import apply
+from extract_env.rename import plan_rename
+from extract_env.rename import read_mapping
+from extract_env.server import ExtractServer
+from extract_env.transaction import TransactionError
 
 DEFAULTS = {
     "env_folder": "./",
@@ -17,10 +41,39 @@ DEFAULTS = {
     "compose_file": None,
     "all_files": True,
     "test": False,
+    "stats": False,
+    "jobs": None,
+    "lock": True,
+    "lock_timeout": DEFAULT_LOCK_TIMEOUT,
+    "sort_by": None,
+    "overlay": False,
+    "check": False,
+    "since": None,
+    "stream": False,
+    "read_ahead": 1,
+    "shard": False,
+    "shard_common": False,
+    "emit": (),
+    "dotenv_grammar": False,
+    "env_out": None,
+    "compose_out": None,
 }
 
 
-@click.command()
+class ComposeFileType(click.Path):
+    """A compose file path, or fd:N to read it from an open file descriptor in pipe mode."""
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, str) and value.startswith(FD_PREFIX):
+            if not value.removeprefix(FD_PREFIX).isdigit():
+                self.fail(
+                    f"'{value}' is not a file descriptor, expected fd:N", param, ctx
+                )
+            return value
+        return super().convert(value, param, ctx)
+
+
+@click.group(invoke_without_command=True)
 @click.option(
     "-e",
     "--env_folder",
@@ -37,7 +90,7 @@ DEFAULTS = {
 @click.option(
     "--use-current-env/--no-use-current-env",
     default=DEFAULTS["use_current_env"],
-    help=f'Use the current env files. Default: {DEFAULTS["use_current_env"]}',
+    help=f'Fall back on the current process environment when looking up variables. Default: {DEFAULTS["use_current_env"]}',
 )
 @click.option(
     "-c",
@@ -90,11 +143,16 @@ DEFAULTS = {
     "-f",
     "--compose_file",
     multiple=True,
-    type=click.Path(
-        exists=True, file_okay=True, dir_okay=False, readable=True, writable=True
+    type=ComposeFileType(
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+        writable=True,
+        allow_dash=True,
     ),
     default=DEFAULTS["compose_file"],
-    help=f'Update this/these docker compose file/s with the new environment variable names. Used for specifying the paths of each file. When paths are specified it is assumed that --selected-files has been given.  Default: {DEFAULTS["compose_file"]}',
+    help=f'Update this/these docker compose file/s with the new environment variable names. Used for specifying the paths of each file. When paths are specified it is assumed that --selected-files has been given. Use - to read a single compose file from stdin or fd:N from an open file descriptor, see --env-out.  Default: {DEFAULTS["compose_file"]}',
 )
 @click.option(
     "-t",
@@ -103,8 +161,101 @@ DEFAULTS = {
     is_flag=True,
     help=f'Test the program using files in the example folder.  Default: {DEFAULTS["test"]}',
 )
+@click.option(
+    "--stats/--no-stats",
+    default=DEFAULTS["stats"],
+    help=f'Display run statistics such as parse cache hit rates.  Default: {DEFAULTS["stats"]}',
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=DEFAULTS["jobs"],
+    type=click.IntRange(min=1),
+    help=f'Number of threads used to combine and write files.  Default: {DEFAULTS["jobs"]}',
+)
+@click.option(
+    "--lock/--no-lock",
+    default=DEFAULTS["lock"],
+    help=f'Lock each compose and .env file from reading until writing, so parallel runs do not overwrite each other.  Default: {DEFAULTS["lock"]}',
+)
+@click.option(
+    "--lock-timeout",
+    default=DEFAULTS["lock_timeout"],
+    type=click.FloatRange(min=0),
+    help=f'Seconds to wait for a file locked by another run.  Default: {DEFAULTS["lock_timeout"]}',
+)
+@click.option(
+    "--sort-by",
+    default=DEFAULTS["sort_by"],
+    type=click.Choice(["key", "service", "source"]),
+    help=f'Keep the .env file/s sorted by key, service or source, comments stay with the entry below them.  Default: {DEFAULTS["sort_by"]}',
+)
+@click.option(
+    "--overlay/--no-overlay",
+    default=DEFAULTS["overlay"],
+    help=f'Treat compose.<name>.yaml files as overlays of compose.yaml, writing only their differences to .env.<name>.  Default: {DEFAULTS["overlay"]}',
+)
+@click.option(
+    "--check",
+    default=DEFAULTS["check"],
+    is_flag=True,
+    help=f'Write nothing and exit with 1 if any file would change.  Default: {DEFAULTS["check"]}',
+)
+@click.option(
+    "--since",
+    default=DEFAULTS["since"],
+    metavar="GIT_REF",
+    help=f'Only process compose files that changed, or whose .env file changed, since this git ref.  Default: {DEFAULTS["since"]}',
+)
+@click.option(
+    "--stream/--no-stream",
+    default=DEFAULTS["stream"],
+    help=f'Load, combine and write one .env file and its compose file/s at a time to keep memory flat.  Default: {DEFAULTS["stream"]}',
+)
+@click.option(
+    "--read-ahead",
+    default=DEFAULTS["read_ahead"],
+    type=click.IntRange(min=0),
+    help=f'With --stream, how many .env files worth of compose files to read ahead.  Default: {DEFAULTS["read_ahead"]}',
+)
+@click.option(
+    "--shard/--no-shard",
+    default=DEFAULTS["shard"],
+    help=f'Also write one env_file per service to <.env file>.d/<service>.env and set the env_file of each service to it.  Default: {DEFAULTS["shard"]}',
+)
+@click.option(
+    "--shard-common/--no-shard-common",
+    default=DEFAULTS["shard_common"],
+    help=f'With --shard, write entries shared by several services once to <.env file>.d/_common.env.  Default: {DEFAULTS["shard_common"]}',
+)
+@click.option(
+    "--emit",
+    default=DEFAULTS["emit"],
+    multiple=True,
+    type=click.Choice([*FORMATS]),
+    help=f'Also write each .env file in this format, next to it: example (.env.example, values blanked), export (.env.sh), json (.env.json) or configmap (.env.configmap.yaml, a Kubernetes ConfigMap). Can be given several times, every format is rendered in one pass.  Default: {DEFAULTS["emit"]}',
+)
+@click.option(
+    "--dotenv-grammar/--no-dotenv-grammar",
+    default=DEFAULTS["dotenv_grammar"],
+    help=f'Read .env files with the full dotenv grammar: export KEY=..., quoted values containing " #" or spanning lines and escapes in double quotes.  Default: {DEFAULTS["dotenv_grammar"]}',
+)
+@click.option(
+    "--env-out",
+    default=DEFAULTS["env_out"],
+    metavar="PATH|-|fd:N",
+    help=f'Pipe mode: write the .env entries of a single compose file here instead of to the .env file, - is stdout. Nothing is written to disk. Default: {DEFAULTS["env_out"]}, or - when reading the compose file from stdin',
+)
+@click.option(
+    "--compose-out",
+    default=DEFAULTS["compose_out"],
+    metavar="PATH|-|fd:N",
+    help=f'Pipe mode: also write the rewritten compose file here.  Default: {DEFAULTS["compose_out"]}',
+)
 @click.help_option("-h", "--help")
+@click.pass_context
 def main(
+    ctx,
     all_files,
     combine,
     compose_file,
@@ -118,7 +269,46 @@ def main(
     use_current_env,
     write,
     test,
+    stats,
+    jobs,
+    lock,
+    lock_timeout,
+    sort_by,
+    overlay,
+    check,
+    since,
+    stream,
+    read_ahead,
+    shard,
+    shard_common,
+    emit,
+    dotenv_grammar,
+    env_out,
+    compose_out,
 ):
+    if ctx.invoked_subcommand is not None:
+        return 0
+    piped = [x for x in compose_file if x == STDIO or x.startswith(FD_PREFIX)]
+    if piped or env_out is not None or compose_out is not None:
+        if len(compose_file) != 1:
+            raise click.UsageError(
+                "Pipe mode needs exactly one compose file, given with -f PATH or -f -"
+            )
+        if env_out in (None, STDIO) and compose_out == STDIO:
+            raise click.UsageError("Only one of --env-out and --compose-out can be -")
+        return run_pipe(
+            compose_file[0],
+            env_out=env_out or STDIO,
+            compose_out=compose_out,
+            env_folder=env_folder,
+            env_file_name=env_file_name,
+            combine=combine,
+            prefix=prefix,
+            postfix=postfix,
+            use_current_env=use_current_env,
+            sort_by=sort_by,
+            dotenv_grammar=dotenv_grammar,
+        )
     if test:
         env_folder = "./testing"
         compose_folder = "./testing"
@@ -127,21 +317,257 @@ def main(
     if compose_file:
         all_files = False
 
-    EnvList(
-        all_files=all_files,
-        combine=combine,
-        compose_file=compose_file,
-        compose_folder=compose_folder,
-        display=display,
-        env_file_name=env_file_name,
-        env_folder=env_folder,
-        postfix=postfix,
-        prefix=prefix,
-        update_compose=update_compose,
-        use_current_env=use_current_env,
-        write=write,
-    )
+    # Set by 'extract-env serve' to reuse files parsed by earlier requests.
+    cache = ctx.obj.get("cache") if isinstance(ctx.obj, dict) else None
+    try:
+        env_list = EnvList(
+            all_files=all_files,
+            combine=combine,
+            compose_file=compose_file,
+            compose_folder=compose_folder,
+            display=display,
+            env_file_name=env_file_name,
+            env_folder=env_folder,
+            postfix=postfix,
+            prefix=prefix,
+            update_compose=update_compose,
+            use_current_env=use_current_env,
+            write=write,
+            stats=stats,
+            workers=jobs,
+            lock_timeout=lock_timeout if lock else None,
+            sort_by=sort_by,
+            overlay=overlay,
+            check=check,
+            cache=cache,
+            since=since,
+            stream=stream,
+            read_ahead=read_ahead,
+            shard=shard,
+            shard_common=shard_common,
+            emit=emit,
+            dotenv_grammar=dotenv_grammar,
+        )
+    except (
+        LockTimeoutError,
+        GitError,
+        ComposeGraphError,
+        TransactionError,
+        EmitCollisionError,
+    ) as e:
+        print(e)
+        raise SystemExit(1)
+
+    if check and env_list.changed:
+        raise SystemExit(1)
+    return 0
+
+
+@main.command()
+@click.option(
+    "-s",
+    "--socket",
+    "socket_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Unix socket to listen on.  Default: $EXTRACT_ENV_SOCKET or a per-user socket in the runtime folder",
+)
+@click.help_option("-h", "--help")
+def serve(socket_path):
+    """Keep compose and .env files parsed between runs and answer
+    extract-env-client requests over a Unix socket."""
+    server = ExtractServer(socket_path or default_socket_path())
+    print(f"Listening on {server.socket_path}")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+@main.command()
+@click.option(
+    "-r",
+    "--rule",
+    "rules",
+    multiple=True,
+    type=click.Choice([*RULES]),
+    help="Only run this/these rule/s.  Default: every rule",
+)
+@click.help_option("-h", "--help")
+@click.pass_context
+def lint(ctx, rules):
+    """Report conflicting values, missing values, unused keys, invalid names,
+    unresolved references and shadowed keys without changing any file.
+
+    Uses the folder, file and naming options given before 'lint' and exits
+    with 1 when any error is found."""
+    params = ctx.parent.params
+    compose_file = params["compose_file"]
+    if params["test"]:
+        params = {**params, "env_folder": "./testing", "compose_folder": "./testing"}
+        compose_file = ("testing/compose.yaml", "testing/compose.production.yaml")
+    try:
+        findings = lint_folder(
+            compose_folder=params["compose_folder"],
+            env_folder=params["env_folder"],
+            compose_file=compose_file or (),
+            combine=params["combine"],
+            prefix=params["prefix"],
+            postfix=params["postfix"],
+            env_file_name=params["env_file_name"],
+            use_current_env=params["use_current_env"],
+            rules=rules,
+            dotenv_grammar=params["dotenv_grammar"],
+        )
+    except FileNotFoundError as e:
+        print(e)
+        raise SystemExit(1)
+
+    errors = warnings = 0
+    for file_path, file_findings in findings.items():
+        if not file_findings:
+            continue
+        print(f"# {file_path}")
+        for finding in file_findings:
+            print(finding)
+        print()
+        errors += len([x for x in file_findings if x.severity == "error"])
+        warnings += len([x for x in file_findings if x.severity == "warning"])
+    print(f"Found {errors} error/s and {warnings} warning/s")
+
+    if errors:
+        raise SystemExit(1)
+    return 0
+
+
+catalog_option = click.option(
+    "-k",
+    "--catalog",
+    "catalog_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="SQLite catalog file.  Default: $EXTRACT_ENV_CATALOG or extract-env/catalog.sqlite in the cache folder",
+)
+
+
+@main.command()
+@click.argument("roots", nargs=-1, type=click.Path(exists=True, file_okay=False))
+@catalog_option
+@click.help_option("-h", "--help")
+@click.pass_context
+def index(ctx, roots, catalog_path):
+    """Record every entry of the compose and .env files found under ROOTS,
+    default the compose folder, in the catalog for 'extract-env query'.
+
+    Only files whose mtime, size and content changed are parsed again, and
+    files that disappeared from ROOTS are dropped."""
+    params = ctx.parent.params
+    with Catalog(
+        catalog_path or default_catalog_path(), env_file_name=params["env_file_name"]
+    ) as catalog:
+        print(catalog.index(roots or (params["compose_folder"],)))
+    return 0
+
+
+@main.command()
+@click.argument("kind", type=click.Choice(["key", "service", "conflicts"]))
+@click.argument("name", required=False)
+@catalog_option
+@click.help_option("-h", "--help")
+def query(kind, name, catalog_path):
+    """Look up the catalog built by 'extract-env index'.
+
+    \b
+    key NAME        where a key is set
+    service NAME    the keys a service uses
+    conflicts       keys with different values within a project, NAME limits the keys
+    NAME can be a glob, e.g. 'DB_*'."""
+    if kind != "conflicts" and name is None:
+        raise click.UsageError(f"'query {kind}' needs a NAME")
+    catalog_path = Path(catalog_path or default_catalog_path())
+    if not catalog_path.is_file():
+        print(f"No catalog at {catalog_path}, run 'extract-env index' first")
+        raise SystemExit(1)
+    with Catalog(catalog_path) as catalog:
+        if kind == "conflicts":
+            conflicts = catalog.conflicts(name)
+            for conflict, rows in conflicts.items():
+                print(f"# {conflict}", *rows, sep="\n-  ", end="\n\n")
+            print(f"Found {len(conflicts)} conflict/s")
+            if conflicts:
+                raise SystemExit(1)
+        else:
+            rows = catalog.key(name) if kind == "key" else catalog.service(name)
+            print(*rows, sep="\n")
+            print(f"Found {len(rows)} entr{'y' if len(rows) == 1 else 'ies'}")
+    return 0
+
+
+@main.command()
+@click.argument("old", required=False)
+@click.argument("new", required=False)
+@click.option(
+    "-m",
+    "--mapping",
+    "mapping_file",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="File of 'OLD NEW' lines, renamed together with OLD NEW.  Default: None",
+)
+@click.option(
+    "-d",
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Print the changes as a diff without writing.  Default: False",
+)
+@click.help_option("-h", "--help")
+@click.pass_context
+def rename(ctx, old, new, mapping_file, dry_run):
+    """Rename key OLD to NEW, or every key of a mapping file, in the .env files
+    and in the ${OLD} references of the compose files.
+
+    Only the affected lines are rewritten and all files are written together.
+    Collisions with names already in use are reported and nothing is written."""
+    if (old is None) != (new is None) or (old is None and mapping_file is None):
+        raise click.UsageError("Give OLD and NEW, --mapping FILE or both")
+    params = ctx.parent.params
+    compose_file = params["compose_file"]
+    if params["test"]:
+        params = {**params, "env_folder": "./testing", "compose_folder": "./testing"}
+        compose_file = ("testing/compose.yaml", "testing/compose.production.yaml")
+    try:
+        mapping = read_mapping(mapping_file) if mapping_file else {}
+        if old is not None:
+            mapping[old] = new
+        rename_plan = plan_rename(
+            mapping,
+            compose_folder=params["compose_folder"],
+            env_folder=params["env_folder"],
+            compose_file=compose_file or (),
+            env_file_name=params["env_file_name"],
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        raise SystemExit(1)
 
+    if rename_plan.conflicts:
+        print("# Collisions, nothing was written:", *rename_plan.conflicts, sep="\n-  ")
+        raise SystemExit(1)
+    if dry_run:
+        print(rename_plan.diff(), end="")
+        return 0
+    try:
+        lock_timeout = params["lock_timeout"] if params["lock"] else None
+        written = apply(rename_plan, params["jobs"], lock_timeout)
+    except (LockTimeoutError, StalePlanError, TransactionError) as e:
+        print(e)
+        raise SystemExit(1)
+    print("# Files updated:", *written, sep="\n-  ", end="\n\n")
     return 0
 
 
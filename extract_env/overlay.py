@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable
+
+from extract_env.compose import ComposeFile
+from extract_env.env import Env
+
+
+class ComposeOverlay:
+    """An overlay compose file, e.g. compose.production.yaml, merged onto its base compose.yaml.
+
+    Follows the docker compose merge semantics for services.*.environment: an
+    overlay entry replaces the base entry with the same key and every other
+    base entry is kept. The base ComposeFile is parsed once and shared by all
+    of its overlays.
+    """
+
+    def __init__(
+        self,
+        base: ComposeFile,
+        overlay: ComposeFile,
+        base_env_keys: Iterable[str] = (),
+    ) -> None:
+        self.base = base
+        self.overlay = overlay
+        self.base_env_keys = {*base_env_keys}
+
+    @property
+    def merged_service_envs(self) -> dict[str, OrderedDict[str, Env]]:
+        """The environment of every service once the overlay is merged onto the
+        base, computed on demand so the base is never copied up front."""
+        merged = {
+            service: OrderedDict(envs)
+            for service, envs in self.base.service_envs.items()
+        }
+        for service, envs in self.overlay.service_envs.items():
+            merged.setdefault(service, OrderedDict()).update(envs)
+        return merged
+
+    @property
+    def merged_envs(self) -> OrderedDict[str, Env]:
+        """The base entries with the overlay's entries replacing those of the same key."""
+        merged = OrderedDict(self.base.envs)
+        merged.update(self.overlay.envs)
+        return merged
+
+    def is_supplied_by_base(self, env: Env) -> bool:
+        base_env = self.base.envs.get(env.key)
+        if base_env is not None and base_env.value == env.value:
+            return True
+        if env.is_param_expansion:
+            key = env.param_expansion_key
+            return key in self.base.envs or key in self.base_env_keys
+        return False
+
+    def delta(self) -> OrderedDict[str, Env]:
+        """The overlay entries that the base .env file does not already supply."""
+        return OrderedDict(
+            (key, env)
+            for key, env in self.overlay.envs.items()
+            if not self.is_supplied_by_base(env)
+        )
+
+    def __repr__(self) -> str:
+        return f"ComposeOverlay(base='{self.base.file_path}', overlay='{self.overlay.file_path}')"
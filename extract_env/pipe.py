@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from typing import Optional
+from typing import TextIO
+
+from extract_env.compose import ComposeFile
+from extract_env.envfile import EnvFile
+from extract_env.utils import SortBy
+
+STDIO = "-"
+FD_PREFIX = "fd:"
+
+
+def read_input(source: str) -> str:
+    """Reads '-' (stdin), 'fd:N' (an open file descriptor) or a path."""
+    if source == STDIO:
+        return sys.stdin.read()
+    if source.startswith(FD_PREFIX):
+        with open(int(source.removeprefix(FD_PREFIX)), "r", closefd=False) as file:
+            return file.read()
+    return Path(source).read_text()
+
+
+@contextmanager
+def open_output(target: str) -> Iterator[TextIO]:
+    """Opens '-' (stdout), 'fd:N' (an open file descriptor) or a path for writing."""
+    if target == STDIO:
+        yield sys.stdout
+        sys.stdout.flush()
+    elif target.startswith(FD_PREFIX):
+        with open(int(target.removeprefix(FD_PREFIX)), "w", closefd=False) as file:
+            yield file
+    else:
+        with open(target, "w") as file:
+            yield file
+
+
+def extract_text(
+    compose_text: str,
+    env_text: str = "",
+    combine: bool = True,
+    prefix: str = "",
+    postfix: str = "",
+    use_current_env: bool = True,
+    sort_by: Optional[SortBy] = None,
+    compose_name: Optional[str] = None,
+    dotenv_grammar: bool = False,
+) -> tuple[EnvFile, ComposeFile]:
+    """Extracts the environment of compose YAML into .env entries, all in memory.
+
+    Args:
+        compose_text (str): The compose YAML.
+        env_text (str): The current .env entries the extracted ones are combined with.
+        dotenv_grammar (bool): Read env_text with the full dotenv grammar.
+
+    Returns:
+        tuple[EnvFile, ComposeFile]: Render them for the .env and rewritten compose text.
+    """
+    compose_file = ComposeFile.from_string(
+        compose_text,
+        combine=combine,
+        prefix=prefix,
+        postfix=postfix,
+        compose_name=compose_name,
+    )
+    env_file = EnvFile.from_string(
+        env_text,
+        use_current_env=use_current_env,
+        sort_by=sort_by,
+        dotenv_grammar=dotenv_grammar,
+    )
+    env_file.append(env=compose_file.envs, source="compose")
+    compose_file.update_yaml()
+    return env_file, compose_file
+
+
+def run_pipe(
+    compose_source: str,
+    env_out: str = STDIO,
+    compose_out: Optional[str] = None,
+    env_folder: Path | str = "./",
+    env_file_name: str = ".env",
+    **kwargs,
+) -> int:
+    """Reads one compose file, from stdin when compose_source is '-', and writes the
+    .env entries and optionally the rewritten compose file to env_out and compose_out.
+
+    The current .env file in env_folder is combined with the new entries when it
+    exists but it is never created or written.
+    """
+    compose_name = None
+    if compose_source != STDIO and not compose_source.startswith(FD_PREFIX):
+        if match := ComposeFile.regex_pattern().match(Path(compose_source).name):
+            compose_name = match.group("compose_name")
+    if compose_name:
+        env_file_name = f"{env_file_name}.{compose_name}"
+    env_path = Path(env_folder) / env_file_name
+    env_text = env_path.read_text() if env_path.is_file() else ""
+
+    env_file, compose_file = extract_text(
+        read_input(compose_source), env_text, compose_name=compose_name, **kwargs
+    )
+    with open_output(env_out) as stream:
+        stream.write(env_file.render())
+    if compose_out is not None:
+        with open_output(compose_out) as stream:
+            stream.write(compose_file.render())
+    return 0
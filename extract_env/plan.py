@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import difflib
+from contextlib import ExitStack
+from dataclasses import dataclass
+from dataclasses import field
+from itertools import chain
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+
+from extract_env.envlist import EnvList
+from extract_env.lint import lint_folder
+from extract_env.lock import FileLock
+from extract_env.transaction import Transaction
+from extract_env.utils import SortBy
+
+
+class StalePlanError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """The current and new text of a file, None when it does not exist or is removed."""
+
+    file_path: Path
+    old_text: Optional[str]
+    new_text: Optional[str]
+
+    @property
+    def changed(self) -> bool:
+        return self.old_text != self.new_text
+
+    def diff(self) -> str:
+        return "".join(
+            difflib.unified_diff(
+                (self.old_text or "").splitlines(keepends=True),
+                (self.new_text or "").splitlines(keepends=True),
+                fromfile=f"{self.file_path}",
+                tofile=f"{self.file_path}",
+            )
+        )
+
+
+@dataclass(frozen=True)
+class Plan:
+    """The outcome of an extraction, computed without writing anything.
+
+    Attributes:
+        changes (tuple[FileChange, ...]): The current and new text of every file.
+        orphans (Mapping[Path, tuple[str, ...]]): Per compose file, the .env keys
+            none of its services use.
+        conflicts (tuple[str, ...]): Keys given different values, as found by
+            the conflicts lint rule.
+    """
+
+    changes: tuple[FileChange, ...] = ()
+    orphans: Mapping[Path, tuple[str, ...]] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    conflicts: tuple[str, ...] = ()
+
+    @property
+    def changed(self) -> tuple[FileChange, ...]:
+        return tuple(x for x in self.changes if x.changed)
+
+    def diff(self) -> str:
+        return "".join(x.diff() for x in self.changed)
+
+    def __bool__(self) -> bool:
+        return bool(self.changed)
+
+
+def read_text(file_path: Path) -> Optional[str]:
+    if not file_path.is_file():
+        return None
+    return file_path.read_text()
+
+
+def plan(
+    compose_folder: Path | str = "./",
+    env_folder: Path | str = "./",
+    compose_file: Iterable[Path | str] = (),
+    combine: bool = True,
+    prefix: str = "",
+    postfix: str = "",
+    env_file_name: str = ".env",
+    use_current_env: bool = True,
+    update_compose: bool = True,
+    sort_by: Optional[SortBy] = None,
+    dotenv_grammar: bool = False,
+    **options: Any,
+) -> Plan:
+    """Works out what an extraction would write, reading files but never writing,
+    creating or locking them and without printing.
+
+    The extraction is an EnvList run in check mode, so env_file:, include:,
+    extends: and every other option are handled exactly as they are when writing.
+
+    Args:
+        **options: Passed on to EnvList, e.g. overlay or shard.
+
+    Raises:
+        FileNotFoundError: No compose files in compose_folder.
+        ValueError: Entries that can't be combined, as EnvList raises.
+    """
+    env_list = EnvList(
+        compose_file=tuple(compose_file) or None,
+        compose_folder=compose_folder,
+        env_folder=env_folder,
+        combine=combine,
+        prefix=prefix,
+        postfix=postfix,
+        env_file_name=env_file_name,
+        use_current_env=use_current_env,
+        update_compose=update_compose,
+        sort_by=sort_by,
+        dotenv_grammar=dotenv_grammar,
+        check=True,
+        quiet=True,
+        **options,
+    )
+    changes = tuple(
+        FileChange(path, old_text, new_text)
+        for path, (old_text, new_text) in env_list.renders.items()
+    )
+    orphans = {
+        files["compose"].file_path: tuple(env_list.keys_not_in_compose(compose_name))
+        for compose_name, files in env_list.envs.items()
+    }
+    findings = lint_folder(
+        compose_folder,
+        env_folder,
+        compose_file,
+        combine=combine,
+        prefix=prefix,
+        postfix=postfix,
+        env_file_name=env_file_name,
+        use_current_env=use_current_env,
+        rules=["conflicts"],
+        dotenv_grammar=dotenv_grammar,
+    )
+    conflicts = tuple(str(x) for x in chain.from_iterable(findings.values()))
+    return Plan(changes, MappingProxyType(orphans), conflicts)
+
+
+def apply(
+    plan: Plan,
+    workers: Optional[int] = None,
+    lock_timeout: Optional[float] = None,
+) -> list[Path]:
+    """Writes the changed files of a plan, staged in parallel and committed all or nothing.
+
+    Every file is first checked to still hold the text the plan was made from,
+    so a plan is never applied over changes made after it was computed.
+
+    Args:
+        lock_timeout (Optional[float]): Lock the files while checking and writing them.
+
+    Raises:
+        StalePlanError: A file changed since the plan was made, nothing is written.
+        TransactionError: Writing failed, every file was restored.
+
+    Returns:
+        list[Path]: The files written.
+    """
+    changes = plan.changed
+    with ExitStack() as stack:
+        if lock_timeout is not None:
+            for change in changes:
+                stack.enter_context(FileLock(change.file_path, timeout=lock_timeout))
+        stale = [x.file_path for x in changes if read_text(x.file_path) != x.old_text]
+        if stale:
+            raise StalePlanError(
+                f"File/s changed since the plan was made: {', '.join(map(str, stale))}"
+            )
+        transaction = Transaction(workers=workers)
+        for change in changes:
+            if change.new_text is None:
+                transaction.remove(change.file_path)
+            else:
+                transaction.add(change.file_path, change.new_text)
+        return transaction.run()
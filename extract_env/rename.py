@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Iterable
+from typing import Literal
+from typing import Mapping
+from typing import Optional
+
+from extract_env.compose import ComposeFile
+from extract_env.lint import NAME_PATTERN
+from extract_env.plan import FileChange
+from extract_env.plan import Plan
+from extract_env.plan import read_text
+from extract_env.resolver import REFERENCE_PATTERN
+
+DOT_ENV_KEY_PATTERN = re.compile(
+    r"^(?P<head>[ \t]*(?:export[ \t]+)?)(?P<key>[^\s=#]+)(?P<tail>[ \t]*=.*)$"
+)
+SERVICE_PATTERN = re.compile(r"^  (?P<service>[^\s#][^:]*):")
+ENVIRONMENT_PATTERN = re.compile(r"^(?P<indent>[ \t]+)environment:[ \t]*(?:#.*)?$")
+# An environment entry without a value, '- KEY' or 'KEY:', passes the variable through.
+PASS_THROUGH_PATTERN = re.compile(
+    r"^(?P<head>[ \t]+(?:-[ \t]+)?)(?P<quote>['\"]?)(?P<key>[A-Za-z_][A-Za-z0-9_]*)"
+    r"(?P=quote)(?P<colon>:?)(?P<tail>[ \t]*(?:#.*)?)$"
+)
+
+
+def read_mapping(file_path: Path | str) -> dict[str, str]:
+    """Reads 'OLD NEW' or 'OLD=NEW' lines, blank lines and # comments are skipped.
+
+    Raises:
+        ValueError: A line is not a pair of names.
+    """
+    mapping = {}
+    for idx, line in enumerate(Path(file_path).read_text().splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        names = line.replace("=", " ").split()
+        if len(names) != 2:
+            raise ValueError(f"{file_path}:{idx}: expected 'OLD NEW', got '{line}'")
+        mapping[names[0]] = names[1]
+    return mapping
+
+
+def rename_references(text: str, mapping: Mapping[str, str]) -> str:
+    """Renames $OLD, ${OLD} and ${OLD:-default} references, $$ stays escaped."""
+
+    def replace(match: re.Match[str]) -> str:
+        if match.group("escaped"):
+            return match.group(0)
+        if named := match.group("named"):
+            return f"${mapping.get(named, named)}"
+        braced = match.group("braced")
+        arg = match.group("arg")
+        if arg is not None:
+            arg = rename_references(arg, mapping)
+        return f"${{{mapping.get(braced, braced)}{match.group('op') or ''}{arg or ''}}}"
+
+    return REFERENCE_PATTERN.sub(replace, text)
+
+
+@dataclass
+class RenameFile:
+    """The lines of a compose or .env file, indexed by the keys they define and
+    the names they reference, so a rename only touches the lines it affects.
+
+    In compose files and the files services read through env_file: only
+    references are renamed, the names services see in their environment stay
+    the same. An entry that passes a variable through by name, '- OLD', is
+    given the renamed variable as its value, '- OLD=${NEW}'.
+    """
+
+    file_path: Path
+    kind: Literal["compose", "dot_env", "env_file"]
+    text: str
+    lines: list[str] = field(init=False)
+    defines: dict[str, list[int]] = field(init=False, default_factory=dict)
+    references: dict[str, list[int]] = field(init=False, default_factory=dict)
+    services: dict[int, str] = field(init=False, default_factory=dict)
+    pass_through: dict[int, re.Match[str]] = field(init=False, default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.lines = self.text.splitlines(keepends=True)
+        section = service = environment = None
+        for idx, line in enumerate(self.lines):
+            if self.kind == "compose":
+                body = line.rstrip("\r\n")
+                indent = len(body) - len(body.lstrip())
+                if line.strip() and not line[0].isspace() and line[0] != "#":
+                    section = line.partition(":")[0].strip()
+                    service = environment = None
+                elif section == "services" and (match := SERVICE_PATTERN.match(line)):
+                    service = match.group("service").strip("'\"")
+                    environment = None
+                elif service and (match := ENVIRONMENT_PATTERN.match(body)):
+                    environment = len(match.group("indent"))
+                elif environment is not None and body.strip():
+                    if indent <= environment:
+                        environment = None
+                    elif match := PASS_THROUGH_PATTERN.match(body):
+                        self.pass_through[idx] = match
+                        self.references.setdefault(match.group("key"), []).append(idx)
+                if service is not None:
+                    self.services[idx] = service
+            elif self.kind == "dot_env" and (
+                match := DOT_ENV_KEY_PATTERN.match(line.rstrip("\r\n"))
+            ):
+                self.defines.setdefault(match.group("key"), []).append(idx)
+            for name in self.referenced_names(line):
+                self.references.setdefault(name, []).append(idx)
+
+    @staticmethod
+    def referenced_names(line: str) -> list[str]:
+        names = []
+        for match in REFERENCE_PATTERN.finditer(line):
+            if name := match.group("braced") or match.group("named"):
+                names.append(name)
+            if arg := match.group("arg"):
+                names.extend(RenameFile.referenced_names(arg))
+        return names
+
+    def names(self) -> set[str]:
+        return {*self.defines, *self.references}
+
+    def location(self, idx: int) -> str:
+        service = f" ({self.services[idx]})" if idx in self.services else ""
+        return f"{self.file_path}:{idx + 1}{service}"
+
+    def locations(self, name: str) -> list[str]:
+        lines = sorted({*self.defines.get(name, []), *self.references.get(name, [])})
+        return [self.location(x) for x in lines]
+
+    def affected_lines(self, mapping: Mapping[str, str]) -> list[int]:
+        lines: set[int] = set()
+        for old in mapping:
+            lines.update(self.defines.get(old, []))
+            lines.update(self.references.get(old, []))
+        return sorted(lines)
+
+    def rename_line(self, line: str, mapping: Mapping[str, str]) -> str:
+        if self.kind == "dot_env":
+            body = line.rstrip("\r\n")
+            if match := DOT_ENV_KEY_PATTERN.match(body):
+                key = match.group("key")
+                renamed = (
+                    f"{match.group('head')}{mapping.get(key, key)}"
+                    f"{rename_references(match.group('tail'), mapping)}"
+                )
+                return renamed + line[len(body) :]
+        return rename_references(line, mapping)
+
+    def pass_through_line(self, idx: int, mapping: Mapping[str, str]) -> str:
+        """'- OLD' as '- OLD=${NEW}' and 'OLD:' as 'OLD: ${NEW}'."""
+        match = self.pass_through[idx]
+        key, quote = match.group("key"), match.group("quote")
+        value = f"${{{mapping.get(key, key)}}}"
+        if match.group("colon"):
+            entry = f"{quote}{key}{quote}: {value}"
+        else:
+            entry = f"{quote}{key}={value}{quote}"
+        line = self.lines[idx]
+        return match.group("head") + entry + match.group("tail") + line[match.end() :]
+
+    def rename(self, mapping: Mapping[str, str]) -> str:
+        """The text with every name in mapping renamed, in one pass over the affected lines."""
+        lines = [*self.lines]
+        for idx in self.affected_lines(mapping):
+            if idx in self.pass_through:
+                lines[idx] = self.pass_through_line(idx, mapping)
+            else:
+                lines[idx] = self.rename_line(lines[idx], mapping)
+        return "".join(lines)
+
+
+def mapping_errors(mapping: Mapping[str, str]) -> list[str]:
+    errors = []
+    targets: dict[str, list[str]] = {}
+    for old, new in mapping.items():
+        if not NAME_PATTERN.match(new):
+            errors.append(f"'{new}' is not a valid variable name")
+        targets.setdefault(new, []).append(old)
+    for new, olds in targets.items():
+        if len(olds) > 1:
+            errors.append(f"'{new}' is the new name of {', '.join(map(repr, olds))}")
+    return errors
+
+
+def find_rename_files(
+    compose_folder: Path | str = "./",
+    env_folder: Path | str = "./",
+    compose_file: Iterable[Path | str] = (),
+    env_file_name: str = ".env",
+) -> list[RenameFile]:
+    """The compose files, the .env files named after them and the files their
+    services read through env_file:.
+
+    Raises:
+        FileNotFoundError: No compose files in compose_folder.
+    """
+    if compose_file:
+        compose_paths = [Path(x) for x in compose_file]
+    else:
+        compose_paths = [x for x, _ in ComposeFile.find_paths(compose_folder).values()]
+
+    env_names = [env_file_name]
+    for compose_path in compose_paths:
+        if match := ComposeFile.regex_pattern().match(compose_path.name):
+            if compose_name := match.group("compose_name"):
+                env_names.append(f"{env_file_name}.{compose_name}")
+
+    files = []
+    env_file_paths: list[Path] = []
+    for compose_path in compose_paths:
+        text = compose_path.read_text()
+        files.append(RenameFile(compose_path, "compose", text))
+        compose_file = ComposeFile.from_string(text, compose_path)
+        env_file_paths.extend(x.path for x in compose_file.referenced_env_files)
+    seen = set()
+    for name in dict.fromkeys(env_names):
+        env_path = Path(env_folder) / name
+        if (text := read_text(env_path)) is not None:
+            files.append(RenameFile(env_path, "dot_env", text))
+            seen.add(env_path.resolve())
+    for env_path in env_file_paths:
+        if env_path.resolve() in seen:
+            continue
+        seen.add(env_path.resolve())
+        if (text := read_text(env_path)) is not None:
+            files.append(RenameFile(env_path, "env_file", text))
+    return files
+
+
+def plan_rename(
+    mapping: Mapping[str, str],
+    compose_folder: Path | str = "./",
+    env_folder: Path | str = "./",
+    compose_file: Iterable[Path | str] = (),
+    env_file_name: str = ".env",
+    files: Optional[list[RenameFile]] = None,
+) -> Plan:
+    """Works out a rename of keys across the compose and .env files without writing.
+
+    A new name that is already set or referenced, and is not renamed itself,
+    would merge two variables into one. Such collisions, and invalid or
+    duplicate new names, are returned in the conflicts of the plan.
+
+    Args:
+        mapping (Mapping[str, str]): Old name to new name, all renamed at once, so
+            names can be swapped.
+    """
+    mapping = {k: v for k, v in mapping.items() if k != v}
+    if files is None:
+        files = find_rename_files(
+            compose_folder, env_folder, compose_file, env_file_name
+        )
+
+    conflicts = mapping_errors(mapping)
+    for old, new in mapping.items():
+        if new in mapping:
+            continue
+        used = [x for file in files if new in file.names() for x in file.locations(new)]
+        if used and any(old in file.names() for file in files):
+            conflicts.append(
+                f"'{old}' -> '{new}': '{new}' is already used at {', '.join(used)}"
+            )
+
+    changes = [
+        FileChange(x.file_path, x.text, x.rename(mapping))
+        for x in files
+        if x.affected_lines(mapping)
+    ]
+    return Plan(tuple(changes), conflicts=tuple(conflicts))
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import TYPE_CHECKING
+from typing import Callable
+from typing import Mapping
+from typing import Optional
+
+from extract_env.environ import LayeredEnviron
+
+if TYPE_CHECKING:
+    from extract_env.envfile import EnvFile
+
+REFERENCE_PATTERN = re.compile(
+    r"(?P<escaped>\$\$)"
+    r"|\$\{(?P<braced>[A-Za-z_][A-Za-z0-9_]*)(?:(?P<op>:?[-?+])(?P<arg>[^}]*))?\}"
+    r"|\$(?P<named>[A-Za-z_][A-Za-z0-9_]*)"
+)
+
+
+class CyclicReferenceError(ValueError):
+    def __init__(self, cycles: list[list[str]]) -> None:
+        self.cycles = cycles
+        report = "\n".join(f"- {' -> '.join([*x, x[0]])}" for x in cycles)
+        super().__init__(
+            f"Found {len(cycles)} cyclic reference/s between environment variables:\n{report}"
+        )
+
+
+def find_references(value: str) -> list[str]:
+    """Names referenced by a value, including those used inside ${X:-default} arguments."""
+    names: list[str] = []
+    for match in REFERENCE_PATTERN.finditer(value):
+        if name := match.group("braced") or match.group("named"):
+            names.append(name)
+        if arg := match.group("arg"):
+            names.extend(find_references(arg))
+    return [*dict.fromkeys(names)]
+
+
+def substitute(value: str, lookup: Callable[[str], Optional[str]]) -> str:
+    """Interpolates a value the same way docker compose does.
+
+    Args:
+        value (str): The value containing $X, ${X} or ${X<op>arg} references.
+        lookup (Callable[[str], Optional[str]]): Returns the value of a name, None when unset.
+
+    Raises:
+        ValueError: A ${X:?error} or ${X?error} reference is not set.
+    """
+
+    def replace(match: re.Match[str]) -> str:
+        if match.group("escaped"):
+            return "$"
+        name = match.group("braced") or match.group("named")
+        current = lookup(name)
+        op = match.group("op")
+        if op is None:
+            return current or ""
+
+        arg = REFERENCE_PATTERN.sub(replace, match.group("arg"))
+        is_set = current is not None if op[0] != ":" else bool(current)
+        if op.endswith("-"):
+            return current if is_set else arg
+        elif op.endswith("+"):
+            return arg if is_set else ""
+        if not is_set:
+            raise ValueError(f"Required variable '{name}' is missing a value: {arg}")
+        return current
+
+    return REFERENCE_PATTERN.sub(replace, value)
+
+
+class EnvResolver:
+    """Resolves the references between the values of an EnvFile.
+
+    Values are evaluated depth first so that every key is evaluated after the
+    keys it references, and each result is memoized, so resolving one key only
+    evaluates its own dependencies. Names not defined in the file fall through
+    to the process environment when use_current_env is set.
+    """
+
+    def __init__(
+        self,
+        env_file: EnvFile,
+        use_current_env: Optional[bool] = None,
+        environ: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        if use_current_env is None:
+            use_current_env = env_file.use_current_env
+        if environ is None:
+            environ = os.environ if use_current_env else {}
+        self.layers = LayeredEnviron(env_file, environ)
+        self.environ = self.layers.environ
+        self.values: dict[str, str] = {
+            key: env.value for key, env in self.layers.file_envs.items()
+        }
+        self._references: dict[str, list[str]] = {}
+        self._resolved: dict[str, str] = {}
+
+    def references(self, key: str) -> list[str]:
+        """Keys of the file referenced by the value of key."""
+        if key not in self._references:
+            self._references[key] = [
+                x for x in find_references(self.values[key]) if x in self.values
+            ]
+        return self._references[key]
+
+    @property
+    def graph(self) -> dict[str, list[str]]:
+        return {key: self.references(key) for key in self.values}
+
+    def lookup(self, name: str) -> Optional[str]:
+        if name in self._resolved:
+            return self._resolved[name]
+        return self.environ.get(name)
+
+    def resolve(self, key: str) -> str:
+        """Resolves a single key, evaluating only the keys it depends on.
+
+        Raises:
+            KeyError: The key is in neither the file nor the environment.
+            CyclicReferenceError: The key depends on itself.
+        """
+        if key in self._resolved:
+            return self._resolved[key]
+        if key not in self.values:
+            if (value := self.environ.get(key)) is None:
+                raise KeyError(f"Key '{key}' not found")
+            return value
+
+        path = [key]
+        frames = [(key, iter(self.references(key)))]
+        while frames:
+            current, deps = frames[-1]
+            for dep in deps:
+                if dep in self._resolved:
+                    continue
+                if dep in path:
+                    raise CyclicReferenceError([path[path.index(dep) :]])
+                path.append(dep)
+                frames.append((dep, iter(self.references(dep))))
+                break
+            else:
+                frames.pop()
+                path.pop()
+                self._resolved[current] = substitute(self.values[current], self.lookup)
+        return self._resolved[key]
+
+    def resolve_all(self) -> dict[str, str]:
+        """Resolves every key of the file.
+
+        Raises:
+            CyclicReferenceError: Lists every cycle found, not just the first.
+        """
+        if cycles := self.find_cycles():
+            raise CyclicReferenceError(cycles)
+        return {key: self.resolve(key) for key in self.values}
+
+    def find_cycles(self) -> list[list[str]]:
+        """Finds every group of keys that reference each other (Tarjan's algorithm)."""
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        stack: list[str] = []
+        on_stack: set[str] = set()
+        cycles: list[list[str]] = []
+
+        for root in self.values:
+            if root in index:
+                continue
+            frames = [(root, iter(self.references(root)))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while frames:
+                current, deps = frames[-1]
+                for dep in deps:
+                    if dep not in index:
+                        index[dep] = low[dep] = len(index)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        frames.append((dep, iter(self.references(dep))))
+                        break
+                    elif dep in on_stack:
+                        low[current] = min(low[current], index[dep])
+                else:
+                    frames.pop()
+                    if frames:
+                        parent = frames[-1][0]
+                        low[parent] = min(low[parent], low[current])
+                    if low[current] != index[current]:
+                        continue
+                    component = []
+                    while True:
+                        key = stack.pop()
+                        on_stack.discard(key)
+                        component.append(key)
+                        if key == current:
+                            break
+                    if len(component) > 1 or current in self.references(current):
+                        cycles.append(component[::-1])
+        return cycles
@@ -0,0 +1,106 @@
+"""Bulk .env scanner, one compiled regex run over the whole buffer.
+
+Compared to reading line by line with Env.from_string it understands the
+common dotenv grammar: an optional 'export ' before the key, single and double
+quoted values, which may contain ' #' and span several lines, backslash escapes
+inside double quotes and comments after quoted values. Quoted values are kept
+as written, quotes and escapes included, so an EnvFile renders them unchanged.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterator
+from typing import Optional
+
+from extract_env.env import Env
+from extract_env.utils import Source
+
+ENTRY_PATTERN = re.compile(
+    r"""
+    ^[ \t]*
+    (?:
+        (?:export[ \t]+)?
+        (?P<key>[^\s=\#]+)
+        [ \t]*=[ \t]*
+        (?P<value>
+            "(?:[^"\\]|\\[\s\S])*"
+          | '[^']*'
+          | [^\n]*?
+        )
+        (?:[ \t]*(?<=[ \t])\#[ \#]*(?P<comment>[^\n]*?))?
+      | (?P<raw>[^\n]*?)
+    )
+    [ \t]*\r?$\n?
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+@dataclass(frozen=True)
+class ScanEntry:
+    """One entry found by scan(), comment and blank lines have raw set instead of key."""
+
+    line: int
+    span: tuple[int, int]
+    key: str = ""
+    value: str = ""
+    comment: str = ""
+    raw: Optional[str] = None
+
+
+def matches(text: str) -> Iterator[tuple[int, re.Match[str]]]:
+    """Every match of ENTRY_PATTERN in text with its first line, counted from 0."""
+    line = 0
+    last = 0
+    end = len(text)
+    for match in ENTRY_PATTERN.finditer(text):
+        start = match.start()
+        if start == end:
+            break
+        line += text.count("\n", last, start)
+        last = start
+        yield line, match
+
+
+def scan(text: str) -> Iterator[ScanEntry]:
+    """The entries of a .env buffer with their first line and span."""
+    for line, match in matches(text):
+        key, value, comment, _ = match.groups()
+        if key is not None:
+            yield ScanEntry(line, match.span(), key, value, comment or "")
+        else:
+            yield ScanEntry(line, match.span(), raw=match.group(0).rstrip("\r\n"))
+
+
+def scan_envs(
+    text: str,
+    prefix: str = "",
+    postfix: str = "",
+    source: Optional[Source] = "dot_env",
+) -> list[Env]:
+    """Env objects for every entry of a .env buffer, as EnvFile.read_file builds them."""
+    key_prefix = f"{prefix}_" if prefix else ""
+    key_postfix = f"_{postfix}" if postfix else ""
+    from_parsed = Env._from_parsed
+
+    envs = []
+    for line, match in matches(text):
+        key, value, comment, _ = match.groups()
+        if key is None:
+            # Comments, blank lines and lines that are not entries parse as before.
+            raw = match.group(0).rstrip("\r\n")
+            envs.append(Env.from_string(raw, prefix, postfix, line, source=source))
+        else:
+            envs.append(
+                from_parsed(
+                    f"{key_prefix}{key}{key_postfix}",
+                    value,
+                    comment or "",
+                    line,
+                    [],
+                    source,
+                )
+            )
+    return envs
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import socket
+import socketserver
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+import click
+
+from extract_env.cache import WarmCache
+
+COMMAND_ARGS = {
+    "extract": [],
+    "check": ["--check"],
+    "preview": ["--dry-run", "--no-update-compose", "--display"],
+}
+
+
+class ExtractRequestHandler(socketserver.StreamRequestHandler):
+    server: ExtractServer
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line.strip():
+            # A probe, or a client that disconnected before sending anything.
+            return
+        try:
+            response = self.server.run(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"exit_code": 2, "output": f"Invalid request: {e}\n"}
+        try:
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client is gone, there is nobody left to answer.
+            pass
+
+
+class ExtractServer(socketserver.UnixStreamServer):
+    """Answers extract, check and preview requests with warm ComposeFile and EnvFile state.
+
+    A request is a JSON line: {"argv": [...], "cwd": "...", "command": "extract"}.
+    argv holds the usual extract-env options and command adds the options for a
+    check or a preview. Requests are handled one at a time, as each one runs in
+    its own working directory.
+    """
+
+    def __init__(
+        self, socket_path: Path | str, cache: Optional[WarmCache] = None
+    ) -> None:
+        self.socket_path = Path(socket_path)
+        self.cache = cache if cache is not None else WarmCache()
+        self.remove_stale_socket()
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(str(self.socket_path), ExtractRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def remove_stale_socket(self) -> None:
+        if not self.socket_path.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self.socket_path))
+            except ConnectionRefusedError:
+                self.socket_path.unlink()
+                return
+        raise OSError(
+            f"An extract-env server is already listening on {self.socket_path}"
+        )
+
+    def run(self, request: dict[str, Any]) -> dict[str, Any]:
+        from extract_env.main import main
+
+        argv = [
+            *request.get("argv", []),
+            *COMMAND_ARGS[request.get("command", "extract")],
+        ]
+        output = io.StringIO()
+        cwd = os.getcwd()
+        try:
+            os.chdir(request.get("cwd", cwd))
+            with redirect_stdout(output), redirect_stderr(output):
+                try:
+                    main.main(
+                        args=argv,
+                        prog_name="extract-env",
+                        standalone_mode=False,
+                        obj={"cache": self.cache},
+                    )
+                    exit_code = 0
+                except SystemExit as e:
+                    exit_code = e.code if isinstance(e.code, int) else 1
+                except click.ClickException as e:
+                    e.show()
+                    exit_code = e.exit_code
+                except Exception as e:
+                    print(f"{type(e).__name__}: {e}")
+                    exit_code = 1
+        finally:
+            os.chdir(cwd)
+        return {"exit_code": exit_code, "output": output.getvalue()}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
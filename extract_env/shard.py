@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterable
+from typing import Self
+
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.utils import write_atomic
+
+# Compose service names start with a letter or digit, so this never collides.
+COMMON_SHARD = "_common"
+
+
+class Shard:
+    """One generated env_file, written as a whole and only when its contents change."""
+
+    def __init__(self, file_path: Path, envs: Iterable[Env] = ()) -> None:
+        self.file_path = file_path
+        self.envs: list[Env] = [*envs]
+
+    def render(self) -> str:
+        return "".join(str(env) for env in self.envs)
+
+    def has_changes(self) -> bool:
+        if not self.file_path.exists():
+            return True
+        with open(self.file_path, "r") as file:
+            return file.read() != self.render()
+
+    def write_file(self) -> Self:
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.file_path, self.render())
+        return self
+
+    def __len__(self) -> int:
+        return len(self.envs)
+
+    def __repr__(self) -> str:
+        return f"Shard('{self.file_path}', envs={len(self)})"
+
+
+class EnvShards:
+    """Splits a .env file into one env_file per service, e.g. .env.d/web.env and .env.d/db.env.
+
+    Each shard holds the entries of one service under the name the service
+    uses in its environment list. With common set, entries that several
+    services share with the same name and value go to a single
+    .env.d/_common.env shard instead of being repeated in each of them.
+    """
+
+    def __init__(self, env_file: EnvFile, common: bool = False) -> None:
+        self.env_file = env_file
+        self.common = common
+        self.shards: dict[str, Shard] = {}
+        self.common_services: set[str] = set()
+        self.split()
+
+    def path(self, name: str) -> Path:
+        file_path = self.env_file.file_path
+        return file_path.parent / f"{file_path.name}.d" / f"{name}.env"
+
+    def split(self) -> Self:
+        entries: dict[str, list[tuple[str, str]]] = {}
+        users: dict[tuple[str, str], list[str]] = {}
+        for env_service, envs in self.env_file.env_services_dict.items():
+            service = env_service.service
+            for env in envs.values():
+                entry = (env_service.key, env.value)
+                entries.setdefault(service, []).append(entry)
+                users.setdefault(entry, []).append(service)
+
+        common: list[tuple[str, str]] = []
+        if self.common:
+            common = [x for x, services in users.items() if len(services) > 1]
+            for entry in common:
+                self.common_services.update(users[entry])
+        shared = {*common}
+
+        self.shards = {}
+        for service, service_entries in entries.items():
+            envs = [
+                Env(k, v)
+                for k, v in dict.fromkeys(service_entries)
+                if (k, v) not in shared
+            ]
+            if envs:
+                self.shards[service] = Shard(self.path(service), envs)
+        if common:
+            self.shards[COMMON_SHARD] = Shard(
+                self.path(COMMON_SHARD), [Env(k, v) for k, v in common]
+            )
+        return self
+
+    def orphans(self) -> list[Path]:
+        """Shards left in the .env.d folder by earlier runs for services that are gone."""
+        folder = self.path(COMMON_SHARD).parent
+        if not folder.is_dir():
+            return []
+        current = {x.file_path for x in self.shards.values()}
+        return sorted(x for x in folder.glob("*.env") if x not in current)
+
+    def service_files(self, service: str) -> list[Path]:
+        """The shards a service loads, the common shard first so its own entries win."""
+        files = []
+        if service in self.common_services:
+            files.append(self.path(COMMON_SHARD))
+        if service in self.shards:
+            files.append(self.path(service))
+        return files
+
+    def generated_files(self, service: str) -> set[Path]:
+        """Every shard path that may have been generated for a service, used to
+        replace earlier shards without touching other env_file entries."""
+        return {self.path(COMMON_SHARD), self.path(service)}
+
+    def env_file_entries(
+        self, service: str, folder: Path
+    ) -> tuple[list[str], set[str]]:
+        """The env_file entries of a service, relative to the compose file folder.
+
+        Returns:
+            tuple[list[str], set[str]]: The entries to set and the generated ones to replace.
+        """
+
+        def relative(path: Path) -> str:
+            return os.path.relpath(path, folder)
+
+        return (
+            [relative(x) for x in self.service_files(service)],
+            {relative(x) for x in self.generated_files(service)},
+        )
+
+    def __iter__(self):
+        return iter(self.shards.values())
+
+    def __len__(self) -> int:
+        return len(self.shards)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from bisect import bisect_right
+from copy import deepcopy
+from dataclasses import dataclass
+from dataclasses import field
+from itertools import count
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Self
+
+from extract_env.env import Env
+from extract_env.utils import SortBy
+
+
+@dataclass
+class EnvBlock:
+    entry: Env
+    comments: list[Env] = field(default_factory=list)
+
+
+class SortedEnvs:
+    """Envs kept in sorted order with comment and blank lines attached to the entry they precede.
+
+    Entries are located by bisecting a parallel list of sort keys, so adding or
+    removing one entry is a binary search and a list insert or delete, not a
+    re-sort of the whole file. The insert and delete still shift the lists, so
+    an edit is linear, with a small constant, in the number of entries.
+    """
+
+    def __init__(self, by: SortBy = "key", envs: Iterable[Env] = ()) -> None:
+        if by not in ("key", "service", "source"):
+            raise ValueError(f"Expected 'key', 'service' or 'source', got '{by}'")
+        self.by = by
+        self._order = count()
+        self._keys: list[tuple[str, str, int]] = []
+        self._blocks: list[EnvBlock] = []
+        self._entry_keys: dict[int, tuple[str, str, int]] = {}
+        self._comment_owner: dict[int, Optional[Env]] = {}
+        self.trailing: list[Env] = []
+        self.sync(envs)
+
+    @staticmethod
+    def is_entry(env: Env) -> bool:
+        return bool(env.key)
+
+    def primary(self, env: Env) -> str:
+        if self.by == "service":
+            return ",".join(sorted(env.in_services))
+        elif self.by == "source":
+            return env.source or ""
+        return env.key
+
+    def _index(self, entry: Env) -> int:
+        key = self._entry_keys[id(entry)]
+        return bisect_left(self._keys, key)
+
+    def add(self, entry: Env, comments: Iterable[Env] = ()) -> Self:
+        key = (self.primary(entry), entry.key, next(self._order))
+        idx = bisect_right(self._keys, key)
+        block = EnvBlock(entry, [*comments])
+        self._keys.insert(idx, key)
+        self._blocks.insert(idx, block)
+        self._entry_keys[id(entry)] = key
+        for comment in block.comments:
+            self._comment_owner[id(comment)] = entry
+        return self
+
+    def remove(self, entry: Env) -> list[Env]:
+        """Removes the entry and returns the comment lines that were attached to it."""
+        idx = self._index(entry)
+        del self._keys[idx]
+        block = self._blocks.pop(idx)
+        del self._entry_keys[id(entry)]
+        for comment in block.comments:
+            del self._comment_owner[id(comment)]
+        return block.comments
+
+    def discard(self, env: Env) -> Self:
+        """Removes an entry or comment line, an entry's comments move to the next entry."""
+        if id(env) in self._comment_owner:
+            owner = self._comment_owner.pop(id(env))
+            comments = self.trailing if owner is None else self.block(owner).comments
+            comments[:] = [x for x in comments if x is not env]
+        elif id(env) in self._entry_keys:
+            idx = self._index(env)
+            comments = self.remove(env)
+            if idx < len(self._blocks):
+                self.attach(comments, self._blocks[idx].entry, first=True)
+            else:
+                self.attach(comments, None)
+        return self
+
+    def resort(self, entry: Env) -> Self:
+        return self.add(entry, self.remove(entry))
+
+    def block(self, entry: Env) -> EnvBlock:
+        return self._blocks[self._index(entry)]
+
+    def attach(
+        self, comments: list[Env], entry: Optional[Env], first: bool = False
+    ) -> Self:
+        target = self.trailing if entry is None else self.block(entry).comments
+        if first:
+            target[:0] = comments
+        else:
+            target.extend(comments)
+        for comment in comments:
+            self._comment_owner[id(comment)] = entry
+        return self
+
+    def __contains__(self, env: Env) -> bool:
+        return id(env) in self._entry_keys or id(env) in self._comment_owner
+
+    def sync(self, envs: Iterable[Env]) -> Self:
+        """Brings the structure in line with envs, given in positional order.
+
+        Envs no longer present are discarded, new entries are inserted at their
+        sorted position and new comment lines are attached to the entry that
+        follows them.
+        """
+        envs = [*envs]
+        current = {id(x) for x in envs}
+        for env in [*self]:
+            if id(env) not in current:
+                self.discard(env)
+
+        if self.by == "service":
+            stale = [
+                block.entry
+                for key, block in zip(self._keys, self._blocks)
+                if key[0] != self.primary(block.entry)
+            ]
+            for entry in stale:
+                self.resort(entry)
+
+        pending: list[Env] = []
+        for env in envs:
+            if env in self:
+                if pending and id(env) in self._entry_keys:
+                    self.attach(pending, env)
+                    pending = []
+            elif self.is_entry(env):
+                self.add(env, pending)
+                pending = []
+            else:
+                pending.append(env)
+        self.attach(pending, None)
+        return self
+
+    def __iter__(self) -> Iterator[Env]:
+        for block in self._blocks:
+            yield from block.comments
+            yield block.entry
+        yield from self.trailing
+
+    def __len__(self) -> int:
+        return len(self._comment_owner) + len(self._entry_keys)
+
+    def __repr__(self) -> str:
+        return f"SortedEnvs(by='{self.by}', entries={len(self._blocks)}, lines={len(self)})"
+
+    def __deepcopy__(self, memo: dict) -> SortedEnvs:
+        # The lookups are keyed by id(), so they are rebuilt for the copied Envs.
+        return SortedEnvs(self.by, deepcopy([*self], memo))
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+import secrets
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Self
+
+from extract_env.utils import file_mode
+
+
+class TransactionError(RuntimeError):
+    pass
+
+
+@dataclass
+class PendingWrite:
+    """One file of a Transaction.
+
+    Attributes:
+        tail (Optional[str]): Append only this to the file instead of replacing
+            it, a rollback truncates the file back to its old size.
+        on_commit (Optional[Callable[[str], Any]]): Called with text once every
+            file of the transaction is committed.
+        remove (bool): Remove the file instead of writing it, a rollback puts it
+            back.
+    """
+
+    file_path: Path
+    text: str
+    tail: Optional[str] = None
+    on_commit: Optional[Callable[[str], Any]] = None
+    remove: bool = False
+    staged: Optional[Path] = None
+    backup: Optional[Path] = None
+    size: Optional[int] = None
+    existed: bool = False
+    committed: bool = False
+    created_folder: Optional[Path] = None
+
+    def stage(self) -> None:
+        """Writes the new text to a temporary file next to the target."""
+        if self.tail is not None or self.remove:
+            return
+        if not self.file_path.parent.exists():
+            self.file_path.parent.mkdir(parents=True)
+            self.created_folder = self.file_path.parent
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.file_path.parent, prefix=f".{self.file_path.name}.", suffix=".tmp"
+        )
+        self.staged = Path(tmp_path)
+        with os.fdopen(fd, "wt") as file:
+            file.write(self.text)
+        # mkstemp creates 0600 files, keep the old mode or honour the umask.
+        os.chmod(tmp_path, file_mode(self.file_path))
+
+    def commit(self) -> None:
+        self.existed = self.file_path.exists()
+        if self.tail is not None:
+            self.size = self.file_path.stat().st_size
+            self.committed = True
+            with open(self.file_path, "at") as file:
+                file.write(self.tail)
+            return
+        if self.remove:
+            if self.existed:
+                self.backup = self.backup_path()
+                os.replace(self.file_path, self.backup)
+            self.committed = True
+            return
+
+        if self.existed:
+            # A hard link keeps the old file without copying it.
+            self.backup = self.backup_path()
+            try:
+                os.link(self.file_path, self.backup)
+            except OSError:
+                shutil.copy2(self.file_path, self.backup)
+        os.replace(self.staged, self.file_path)
+        self.staged = None
+        self.committed = True
+
+    def backup_path(self) -> Path:
+        return self.file_path.with_name(
+            f".{self.file_path.name}.{secrets.token_hex(4)}.bak"
+        )
+
+    def rollback(self) -> None:
+        if not self.committed:
+            return
+        if self.tail is not None:
+            with open(self.file_path, "r+b") as file:
+                file.truncate(self.size)
+        elif self.backup is not None:
+            os.replace(self.backup, self.file_path)
+            self.backup = None
+        elif not self.existed:
+            self.file_path.unlink(missing_ok=True)
+        self.committed = False
+
+    def cleanup(self) -> None:
+        for path in (self.staged, self.backup):
+            if path is not None:
+                path.unlink(missing_ok=True)
+        self.staged = self.backup = None
+        if self.created_folder is not None and not self.committed:
+            # Only removed while empty, another write may have used it.
+            try:
+                self.created_folder.rmdir()
+            except OSError:
+                pass
+
+
+class Transaction:
+    """Writes several files all or nothing.
+
+    Every new text is first staged, concurrently, into a temporary file next
+    to its target. Only once all of them are staged are they renamed over
+    their targets, keeping a hard linked backup of each old file, and when any
+    step fails the files already committed are restored from their backups.
+    """
+
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = workers
+        self.writes: dict[Path, PendingWrite] = {}
+
+    def add(
+        self,
+        file_path: Path,
+        text: str,
+        tail: Optional[str] = None,
+        on_commit: Optional[Callable[[str], Any]] = None,
+    ) -> Self:
+        self.writes[Path(file_path)] = PendingWrite(
+            Path(file_path), text, tail, on_commit
+        )
+        return self
+
+    def remove(self, file_path: Path) -> Self:
+        """Removes file_path when the transaction commits."""
+        self.writes[Path(file_path)] = PendingWrite(Path(file_path), "", remove=True)
+        return self
+
+    def add_file(self, file: Any) -> Self:
+        """Adds a ComposeFile, EnvFile, Shard or Output, using the append-only
+        write of an EnvFile whose new text just extends the file on disk."""
+        if check_on_disk := getattr(file, "check_on_disk", None):
+            check_on_disk()
+        text = file.render()
+        tail = None
+        if appended_text := getattr(file, "appended_text", None):
+            tail = appended_text(text)
+        return self.add(file.file_path, text, tail, getattr(file, "mark_written", None))
+
+    def stage(self) -> Self:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(x.stage): x for x in self.writes.values()}
+        for future, write in futures.items():
+            if error := future.exception():
+                raise TransactionError(
+                    f"Staging {write.file_path} failed, nothing was written: {error}"
+                ) from error
+        return self
+
+    def commit(self) -> Self:
+        for write in self.writes.values():
+            try:
+                write.commit()
+            except BaseException as e:
+                errors = self.rollback()
+                for error in errors:
+                    e.add_note(f"Restoring failed: {error}")
+                if not isinstance(e, Exception):
+                    raise
+                restored = "not every file was" if errors else "every file was"
+                raise TransactionError(
+                    f"Writing {write.file_path} failed, {restored} restored: {e}"
+                ) from e
+        return self
+
+    def rollback(self) -> list[Exception]:
+        """Restores every committed file, a file that cannot be restored does
+        not stop the others, and returns the errors of those that failed."""
+        errors = []
+        for write in reversed(self.writes.values()):
+            try:
+                write.rollback()
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def run(self) -> list[Path]:
+        """Stages and commits every file and returns the paths written."""
+        try:
+            self.stage()
+            self.commit()
+        finally:
+            for write in self.writes.values():
+                write.cleanup()
+        for write in self.writes.values():
+            if write.on_commit is not None:
+                write.on_commit(write.text)
+        return [*self.writes]
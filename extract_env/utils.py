@@ -1,7 +1,22 @@
+import os
+import sys
+import tempfile
 from pathlib import Path
 from typing import Literal
+from typing import Optional
 
-Source = Literal["compose"] | Literal["dot_env"]
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+Source = Literal["compose"] | Literal["dot_env"] | Literal["environ"]
+SortBy = Literal["key"] | Literal["service"] | Literal["source"]
+
+# The umask can only be read by setting it, which is not thread safe, so it is
+# read once at import.
+UMASK = os.umask(0)
+os.umask(UMASK)
 
 
 def print_file_to_terminal(
@@ -16,3 +31,46 @@ def print_file_to_terminal(
         print(line_info, line)
     end_line_info = f"{len(document_lines)+1:<{digits}} |" if display_line_num else ""
     print(f"{end_line_info}", "\n")
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, None where it cannot be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes everywhere else.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def file_signature(file_path: Path) -> Optional[tuple[int, int]]:
+    """(mtime_ns, size) of a file, None when it does not exist."""
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def file_mode(file_path: Path) -> int:
+    """The permissions of file_path, or those open() gives a new file when it is missing."""
+    try:
+        return file_path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def write_atomic(file_path: Path, text: str) -> None:
+    """Writes text to a temporary file next to file_path and renames it over
+    file_path, so readers never see a half written file."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wt") as file:
+            file.write(text)
+        # mkstemp creates the file as 0600.
+        os.chmod(tmp_path, file_mode(file_path))
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
@@ -1,19 +1,44 @@
 import io
+import threading
 from pathlib import Path
 from typing import TextIO
 
 from ruamel.yaml import YAML
 from ruamel.yaml.comments import Comment
 
-yaml = YAML(typ="rt")
-yaml.indent(offset=2)
+_local = threading.local()
+
+
+def new_yaml() -> YAML:
+    yaml = YAML(typ="rt")
+    yaml.indent(offset=2)
+    return yaml
+
+
+def get_yaml() -> YAML:
+    """
+    Get the YAML instance for the current thread, as ruamel YAML instances are not thread-safe.
+
+    Returns:
+        The round-trip YAML instance for this thread.
+    """
+    if not hasattr(_local, "yaml"):
+        _local.yaml = new_yaml()
+    return _local.yaml
+
+
+yaml = get_yaml()
 
 output = io.StringIO()
 
 
 def load_yaml(file: Path):
     with open(file, "r") as f:
-        return yaml.load(f)
+        return get_yaml().load(f)
+
+
+def load_yaml_from_string(text: str):
+    return get_yaml().load(text)
 
 
 def dump_yaml(data, stream: TextIO | Path) -> None:
@@ -24,7 +49,19 @@ def dump_yaml(data, stream: TextIO | Path) -> None:
         data: The YAML data to be dumped.
         stream: The stream to write the YAML data to. It can be a file-like object or a file path.
     """
-    yaml.dump(data, stream=stream)
+    get_yaml().dump(data, stream=stream)
+
+
+def dump_yaml_to_string(data) -> str:
+    """
+    Dump YAML data to a string, exactly as dump_yaml would write it.
+
+    Args:
+        data: The YAML data to be dumped.
+    """
+    stream = io.StringIO()
+    get_yaml().dump(data, stream=stream)
+    return stream.getvalue()
 
 
 def dump_yaml_to_string_lines(data) -> list[str]:
@@ -37,7 +74,7 @@ def dump_yaml_to_string_lines(data) -> list[str]:
     Returns:
         A list of strings representing the YAML data.
     """
-    yaml.dump(data, stream=output)
+    get_yaml().dump(data, stream=output)
     output.seek(0)
     return output.readlines()
 
@@ -0,0 +1,81 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from extract_env.envlist import EnvList
+
+COMPOSE = """\
+services:
+  web:
+    image: x
+    environment:
+      - MODE=dev
+      - DB_HOST=db
+  db:
+    image: x
+    environment:
+      - DB_HOST=localhost
+"""
+
+
+def snapshot(folder: Path) -> dict[str, bytes]:
+    """Every file below folder with its content, to compare a folder before and after a run."""
+    return {
+        str(x.relative_to(folder)): x.read_bytes()
+        for x in sorted(folder.rglob("*"))
+        if x.is_file()
+    }
+
+
+def make_project(
+    folder: Path, compose: str = COMPOSE, env: Optional[str] = None
+) -> Path:
+    """A folder with a compose.yaml and, when env is given, a .env file."""
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "compose.yaml").write_text(compose)
+    if env is not None:
+        (folder / ".env").write_text(env)
+    return folder
+
+
+def run(folder: Path, **kwargs) -> EnvList:
+    """Extracts folder into itself, without the process environment."""
+    return EnvList(
+        **{
+            "compose_folder": folder,
+            "env_folder": folder,
+            "use_current_env": False,
+            **kwargs,
+        }
+    )
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    return make_project(tmp_path)
+
+
+def git(folder: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", *args],
+        cwd=folder,
+        check=True,
+        capture_output=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "test",
+            "GIT_AUTHOR_EMAIL": "test@example.com",
+            "GIT_COMMITTER_NAME": "test",
+            "GIT_COMMITTER_EMAIL": "test@example.com",
+        },
+    )
+
+
+def commit_all(folder: Path) -> None:
+    if not (folder / ".git").exists():
+        git(folder, "init", "-q")
+    git(folder, "add", "-A")
+    git(folder, "commit", "-q", "-m", "snapshot")
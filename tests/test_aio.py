@@ -0,0 +1,58 @@
+import asyncio
+
+from extract_env.aio import extract_async
+from extract_env.aio import iter_extract_async
+
+from .conftest import make_project
+from .conftest import snapshot
+
+
+def make_projects(tmp_path, count: int):
+    return [make_project(tmp_path / f"p{i}") for i in range(count)]
+
+
+async def collect(*args, **kwargs):
+    return [x async for x in iter_extract_async(*args, **kwargs)]
+
+
+def test_extract_async_writes_the_plan(project):
+    result = asyncio.run(extract_async(project, use_current_env=False))
+    assert result.ok
+    assert {x.name for x in result.written} == {".env", "compose.yaml"}
+    assert "MODE=dev" in (project / ".env").read_text()
+
+
+def test_extract_async_without_write_only_plans(project):
+    before = snapshot(project)
+    result = asyncio.run(extract_async(project, write=False, use_current_env=False))
+    assert result.plan and result.written == ()
+    assert snapshot(project) == before
+
+
+def test_iter_extract_async_yields_every_project(tmp_path):
+    folders = make_projects(tmp_path, 5)
+    results = asyncio.run(collect(folders, max_concurrency=2, use_current_env=False))
+    assert sorted(x.project for x in results) == folders
+    assert all(x.ok and x.written for x in results)
+
+
+def test_a_failing_project_does_not_stop_the_others(tmp_path):
+    good, broken = make_projects(tmp_path, 2)
+    (broken / "compose.yaml").unlink()
+    results = asyncio.run(collect([good, broken], use_current_env=False))
+    by_project = {x.project: x for x in results}
+    assert by_project[good].ok
+    assert isinstance(by_project[broken].error, FileNotFoundError)
+
+
+def test_closing_the_iteration_cancels_the_remaining_projects(tmp_path):
+    folders = make_projects(tmp_path, 6)
+
+    async def first():
+        iterator = iter_extract_async(folders, max_concurrency=1, use_current_env=False)
+        result = await anext(iterator)
+        await iterator.aclose()
+        return result
+
+    assert asyncio.run(first()).ok
+    assert [x for x in folders if (x / ".env").exists()] == [folders[0]]
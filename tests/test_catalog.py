@@ -0,0 +1,69 @@
+import os
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from extract_env.catalog import Catalog
+from extract_env.main import main
+
+from .conftest import make_project
+
+
+def test_index_and_query(tmp_path):
+    make_project(tmp_path / "a", env="DB_HOST=db\n")
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        stats = catalog.index([tmp_path])
+        assert (stats.indexed, stats.unchanged, stats.removed) == (2, 0, 0)
+        assert [(x.service, x.source) for x in catalog.key("DB_HOST")] == [
+            (None, "dot_env"),
+            ("web", "compose"),
+            ("db", "compose"),
+        ]
+        assert {x.key for x in catalog.service("web")} == {"MODE", "DB_HOST"}
+        assert {x.key for x in catalog.key("DB_*")} == {"DB_HOST"}
+
+
+def test_index_again_skips_unchanged_files(tmp_path):
+    project = make_project(tmp_path / "a")
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.index([tmp_path])
+        assert catalog.index([tmp_path]).unchanged == 1
+
+        (project / "compose.yaml").unlink()
+        assert catalog.index([tmp_path]).removed == 1
+        assert catalog.key("MODE") == []
+
+
+def test_conflicts_within_a_project(tmp_path):
+    make_project(tmp_path / "a")
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.index([tmp_path])
+        conflicts = catalog.conflicts()
+    assert [*conflicts] == [f"DB_HOST in {(tmp_path / 'a').resolve()}"]
+    assert {x.service for x in conflicts[[*conflicts][0]]} == {"web", "db"}
+
+
+def test_unparseable_file_is_skipped(tmp_path):
+    project = make_project(tmp_path / "a")
+    make_project(tmp_path / "b")
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.index([tmp_path])
+        (project / "compose.yaml").write_text("services:\n  web: [\n")
+        stats = catalog.index([tmp_path])
+        assert stats.skipped == [(project / "compose.yaml").resolve()]
+        assert "skipped 1 unparseable" in str(stats)
+        # The broken file's stale entries are gone, the other project is kept.
+        assert {Path(x.file_path).parent.name for x in catalog.key("MODE")} == {"b"}
+
+
+def test_catalog_short_option_does_not_clash_with_compose_folder(tmp_path):
+    project = make_project(tmp_path / "a")
+    catalog_path = tmp_path / "catalog.sqlite"
+    runner = CliRunner()
+    result = runner.invoke(main, ["-c", str(project), "index", "-k", str(catalog_path)])
+    assert result.exit_code == 0, result.output
+    assert "Indexed 1 file/s" in result.output
+
+    result = runner.invoke(main, ["query", "-k", str(catalog_path), "key", "MODE"])
+    assert result.exit_code == 0, result.output
+    assert os.fspath((project / "compose.yaml").resolve()) in result.output
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from extract_env.emit import FORMATS
+from extract_env.emit import EmitCollisionError
+from extract_env.emit import Emitter
+from extract_env.emit import Format
+from extract_env.emit import emitter
+from extract_env.envfile import EnvFile
+
+from .conftest import COMPOSE
+from .conftest import run
+
+TEXT = '# database\nDB_HOST=db\nTOKEN="a b"\n'
+
+
+def render(*formats: str) -> dict[str, str]:
+    env_file = EnvFile.from_string(TEXT, ".env", use_current_env=False)
+    return Emitter(env_file, formats).render()
+
+
+def test_formats_render_every_entry():
+    texts = render("example", "export", "json", "configmap")
+    assert texts["example"] == "# database\nDB_HOST=\nTOKEN=\n"
+    assert "export TOKEN='a b'\n" in texts["export"]
+    assert json.loads(texts["json"]) == {"DB_HOST": "db", "TOKEN": "a b"}
+    assert '  TOKEN: "a b"\n' in texts["configmap"]
+
+
+def test_format_needs_add():
+    with pytest.raises(TypeError):
+        Format(EnvFile.from_string(""))
+
+    @emitter("keys", ".keys")
+    class Keys(Format):
+        def add(self, env):
+            if env.key:
+                self.parts.append(f"{env.key}\n")
+
+    try:
+        assert render("keys") == {"keys": "DB_HOST\nTOKEN\n"}
+    finally:
+        del FORMATS["keys"]
+
+
+def test_outputs_are_written_next_to_the_env_file(project):
+    run(project, emit=("example", "json"))
+    assert (project / ".env.example").read_text() == "MODE=\nDB_HOST=\n"
+    assert json.loads((project / ".env.json").read_text()) == {
+        "MODE": "dev",
+        "DB_HOST": "db",
+    }
+
+
+def test_output_colliding_with_an_env_file_is_rejected(project):
+    (project / "compose.example.yaml").write_text(COMPOSE)
+    with pytest.raises(EmitCollisionError, match=r"\.env\.example"):
+        run(project, emit=("example",))
+    # Nothing is written, the check runs before the transaction.
+    assert (project / "compose.yaml").read_text() == COMPOSE
+    assert (project / ".env.example").read_text() == ""
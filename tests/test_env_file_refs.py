@@ -0,0 +1,60 @@
+import pytest
+
+from extract_env.envfile import EnvFile
+
+from .conftest import run
+
+COMPOSE = """\
+services:
+  web:
+    image: x
+    env_file: web.env
+    environment:
+      - MODE=dev
+      - LEVEL=${LEVEL}
+      - DB_HOST=db
+"""
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "compose.yaml").write_text(COMPOSE)
+    (tmp_path / "web.env").write_text("MODE=dev\nLEVEL=3\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "options, expected",
+    [
+        ({}, ["DB_HOST"]),
+        ({"prefix": "APP"}, ["APP_DB_HOST"]),
+        ({"prefix": "APP", "postfix": "X"}, ["APP_DB_HOST_X"]),
+        ({"combine": False}, ["WEB_DB_HOST"]),
+        ({"combine": False, "prefix": "APP"}, ["APP_WEB_DB_HOST"]),
+    ],
+)
+def test_keys_supplied_by_env_file_are_not_extracted(project, options, expected):
+    run(project, update_compose=False, **options)
+    env_file = EnvFile.from_string((project / ".env").read_text())
+    assert env_file.keys() == expected
+    assert (project / "web.env").read_text() == "MODE=dev\nLEVEL=3\n"
+
+
+def test_env_file_keys_are_read_without_prefix(project):
+    env_list = run(project, update_compose=False, prefix="APP", write=False)
+    assert env_list.referenced_env_files[(project / "web.env").resolve()] == {
+        "MODE": "dev",
+        "LEVEL": "3",
+    }
+
+
+def test_env_file_keys_are_not_orphans(project):
+    (project / ".env").write_text("APP_MODE=dev\nAPP_GONE=1\n")
+    env_list = run(project, update_compose=False, prefix="APP", write=False)
+    assert env_list.keys_not_in_compose("compose.yaml") == ["APP_GONE"]
+
+
+def test_different_value_is_still_extracted(project):
+    (project / "web.env").write_text("MODE=prod\n")
+    run(project, update_compose=False, prefix="APP")
+    assert "APP_MODE" in EnvFile.from_string((project / ".env").read_text()).keys()
@@ -0,0 +1,46 @@
+import pytest
+
+from extract_env.env import Env
+from extract_env.fuzz import reference_from_string
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    Env.clear_parse_cache()
+    yield
+    Env.clear_parse_cache()
+
+
+@pytest.mark.parametrize(
+    "string",
+    ["A=1", " A = 1 # note", "A=", "=1", "# comment", "", "A=x #y #z", "A=${A}"],
+)
+@pytest.mark.parametrize("affixes", [("", ""), ("APP", ""), ("", "X")])
+def test_matches_the_uncached_parser(string, affixes):
+    args = (string, *affixes, 3, "web", "compose")
+    expected = reference_from_string(Env, *args)
+    for _ in range(2):
+        actual = Env.from_string(*args)
+        assert (str(actual), actual.comment, actual.line, actual.services) == (
+            str(expected),
+            expected.comment,
+            expected.line,
+            expected.services,
+        )
+
+
+def test_repeated_entries_hit_the_cache():
+    for _ in range(3):
+        Env.from_string("A=1")
+    stats = Env.parse_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+
+def test_cached_parses_build_independent_envs():
+    first = Env.from_string("A=1", line=1, service_name="web", source="compose")
+    second = Env.from_string("A=1", line=2, service_name="db", source="compose")
+    first.value = "changed"
+    assert second.value == "1"
+    assert second.line == 2
+    assert second.services[0].service == "db"
+    assert second.services[0].parent_env is second
@@ -0,0 +1,43 @@
+from extract_env.envfile import EnvFile
+
+
+def test_file_entries_shadow_the_process_environment(monkeypatch):
+    monkeypatch.setenv("EXTRACT_ENV_TEST_A", "from-environ")
+    monkeypatch.setenv("EXTRACT_ENV_TEST_B", "from-environ")
+    env_file = EnvFile.from_string("EXTRACT_ENV_TEST_A=from-file\n")
+    assert env_file.get("EXTRACT_ENV_TEST_A") == "from-file"
+    assert env_file.get("EXTRACT_ENV_TEST_B") == "from-environ"
+    assert env_file.environ.env("EXTRACT_ENV_TEST_B").source == "environ"
+
+
+def test_without_current_env_only_the_file_is_seen(monkeypatch):
+    monkeypatch.setenv("EXTRACT_ENV_TEST_B", "from-environ")
+    env_file = EnvFile.from_string("A=1\n", use_current_env=False)
+    assert env_file.get("EXTRACT_ENV_TEST_B") is None
+    assert dict(env_file.environ) == {"A": "1"}
+
+
+def test_view_is_cached_and_follows_edits():
+    env_file = EnvFile.from_string("A=1\n", use_current_env=False)
+    environ = env_file.environ
+    assert env_file.environ is environ
+    env_file["B"] = "2"
+    del env_file["A"]
+    assert env_file.environ is environ
+    assert dict(environ) == {"B": "2"}
+
+
+def test_view_follows_use_current_env(monkeypatch):
+    monkeypatch.setenv("EXTRACT_ENV_TEST_B", "from-environ")
+    env_file = EnvFile.from_string("A=1\n", use_current_env=False)
+    assert "EXTRACT_ENV_TEST_B" not in env_file.environ
+    env_file.use_current_env = True
+    assert env_file.get("EXTRACT_ENV_TEST_B") == "from-environ"
+
+
+def test_resolve_falls_back_on_the_environment(monkeypatch):
+    monkeypatch.setenv("EXTRACT_ENV_TEST_HOST", "db")
+    env_file = EnvFile.from_string(
+        "URL=http://${EXTRACT_ENV_TEST_HOST}:${PORT}\nPORT=5432\n"
+    )
+    assert env_file.resolve("URL") == "http://db:5432"
@@ -0,0 +1,78 @@
+from copy import deepcopy
+
+from extract_env.compose import ComposeFile
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.fingerprint import TrackedEnvs
+
+
+def test_fingerprint_follows_the_key_of_each_entry():
+    a, b = Env("A", "1"), Env("B", "2")
+    assert (
+        TrackedEnvs({0: a, 1: b}).fingerprint != TrackedEnvs({0: b, 1: a}).fingerprint
+    )
+    assert (
+        TrackedEnvs({0: a, 1: b}).fingerprint == TrackedEnvs({1: b, 0: a}).fingerprint
+    )
+
+
+def test_reordering_an_env_file_modifies_it():
+    env_file = EnvFile.from_string("B=1\nA=2\n", use_current_env=False)
+    assert not env_file.modified
+    env_file.sort()
+    assert env_file.modified
+    env_file.move_to_end(0)
+    assert not env_file.modified
+
+
+def test_reset_counts_an_env_held_twice_once_per_entry():
+    env = Env("A", "1")
+    envs = TrackedEnvs({0: env})
+    once = envs.fingerprint.value
+    envs.reset([(0, env), (1, env)])
+    assert envs.fingerprint == TrackedEnvs({0: env, 1: env}).fingerprint
+    envs.reset([(0, env)])
+    assert envs.fingerprint.value == once
+    envs.reset([])
+    assert envs.fingerprint.value == TrackedEnvs().fingerprint.value
+
+
+def test_env_edits_are_seen_at_the_edit_points():
+    env_file = EnvFile.from_string("A=1\nB=2\n", use_current_env=False)
+    assert not env_file.modified
+    env_file["C"] = "3"
+    assert env_file.modified
+    del env_file["C"]
+    assert not env_file.modified
+    env_file[0] = Env("A", "changed")
+    assert env_file.modified
+
+
+def test_edits_made_in_place_are_modified():
+    env_file = EnvFile.from_string("A=1\n", use_current_env=False)
+    env_file["A"].comment = "note"
+    assert env_file.modified
+    envs = TrackedEnvs({0: env_file["A"]})
+    envs.touch(env_file["A"])
+    assert envs.fingerprint == TrackedEnvs({0: Env("A", "1", "note")}).fingerprint
+
+
+def test_combined_services_are_part_of_the_fingerprint(project):
+    compose_file = ComposeFile(project / "compose.yaml")
+    rebuilt = TrackedEnvs(deepcopy(compose_file.envs))
+    assert compose_file.envs.fingerprint == rebuilt.fingerprint
+    assert not compose_file.modified
+    assert len(compose_file.envs["DB_HOST"].services) == 2
+
+
+def test_yaml_rewrites_modify_a_compose_file(project):
+    compose_file = ComposeFile(project / "compose.yaml")
+    before = compose_file.fingerprint
+    compose_file.update_env_file_entries("web", [".env"], {".env"})
+    assert compose_file.modified
+    assert compose_file.fingerprint != before
+    compose_file.write_file()
+    assert not compose_file.modified
+    compose_file.envs["MODE"].value = "${MODE}"
+    compose_file.update_yaml()
+    assert compose_file.modified
@@ -0,0 +1,62 @@
+import pytest
+from click.testing import CliRunner
+
+from extract_env.envfile import EnvFile
+from extract_env.fuzz import PATHS
+from extract_env.fuzz import fuzz
+from extract_env.fuzz import generate_case
+from extract_env.fuzz import main
+from extract_env.fuzz import reference_mode
+from extract_env.fuzz import run_path
+
+
+def test_cases_are_reproducible():
+    assert generate_case(7) == generate_case(7)
+    assert generate_case(7) != generate_case(8)
+
+
+def test_every_path_matches_the_reference():
+    report = fuzz(cases=15, seed=0)
+    assert report.mismatches == []
+    assert {*PATHS} <= {*report.timings}
+
+
+def test_a_differing_path_is_reported(monkeypatch, tmp_path):
+    def broken(folder, case):
+        (folder / "extra").write_text("x")
+
+    monkeypatch.setitem(PATHS, "plan", broken)
+    result = CliRunner().invoke(
+        main, ["-n", "2", "-p", "plan", "--keep", str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert "case 0: plan differs" in result.output
+    assert (tmp_path / "case-0" / "options.txt").is_file()
+
+
+def test_errors_are_compared_without_the_temporary_folder():
+    case = generate_case(0)
+    case.files["compose.yaml"] = "services:\n  web: [\n"
+    outcome, _ = run_path(PATHS["reference"], case)
+    assert outcome[0] == "ParserError"
+    assert '"<tmp>/compose.yaml"' in outcome[1]
+
+
+def test_cases_reference_other_files():
+    compose = "".join(
+        text
+        for seed in range(30)
+        for name, text in generate_case(seed).files.items()
+        if name.startswith("compose")
+    )
+    for reference in ("env_file: web.env", "file: base.yaml", "- common.yaml"):
+        assert reference in compose
+
+
+@pytest.mark.parametrize(
+    "text", ["A=1\n# c\nA=2\nB=1\nA=\n", "# a\nB=1\n\nB=1 # b\nC=2\n"]
+)
+def test_reference_duplicates_are_removed_as_by_envfile(text):
+    expected = EnvFile.from_string(text, use_current_env=False).render()
+    with reference_mode():
+        assert EnvFile.from_string(text, use_current_env=False).render() == expected
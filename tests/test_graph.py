@@ -0,0 +1,108 @@
+import pytest
+
+from extract_env import yaml_io
+from extract_env.compose import ComposeFile
+from extract_env.envfile import EnvFile
+from extract_env.graph import ComposeCycleError
+from extract_env.graph import ComposeGraph
+from extract_env.graph import GraphNode
+
+from .conftest import run
+
+ROOT = """\
+include:
+  - shared/db.yaml
+services:
+  web:
+    image: x
+    extends:
+      file: base.yaml
+      service: app
+    environment:
+      - MODE=dev
+"""
+BASE = """\
+services:
+  app:
+    image: x
+    environment:
+      - MODE=base
+      - TIMEOUT=30
+"""
+DB = """\
+services:
+  db:
+    image: x
+    environment:
+      POSTGRES_DB: app
+      POSTGRES_USER: admin
+"""
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "shared").mkdir()
+    (tmp_path / "compose.yaml").write_text(ROOT)
+    (tmp_path / "base.yaml").write_text(BASE)
+    (tmp_path / "shared" / "db.yaml").write_text(DB)
+    return tmp_path
+
+
+def test_extends_and_include_are_extracted(project):
+    run(project)
+    env_file = EnvFile.from_string((project / ".env").read_text())
+    assert sorted(env_file.keys()) == [
+        "MODE",
+        "POSTGRES_DB",
+        "POSTGRES_USER",
+        "TIMEOUT",
+    ]
+    assert env_file.get("MODE") == "dev"
+    # Only the lines of the compose file itself are rewritten.
+    assert (project / "base.yaml").read_text() == BASE
+    assert (project / "shared" / "db.yaml").read_text() == DB
+
+
+def test_every_file_is_parsed_once(project, monkeypatch):
+    parsed = []
+    load_yaml = yaml_io.load_yaml_from_string
+
+    def counted(text):
+        parsed.append(text)
+        return load_yaml(text)
+
+    monkeypatch.setattr("extract_env.compose.load_yaml_from_string", counted)
+    env_list = run(project, write=False, update_compose=False)
+    assert sorted(parsed) == sorted([BASE, DB])
+    assert {type(x) for x in env_list.graph.memo.values()} == {GraphNode}
+    assert len(env_list.graph.memo) == 3
+
+
+def test_include_cycle_is_reported(tmp_path):
+    (tmp_path / "compose.yaml").write_text("include:\n  - other.yaml\nservices: {}\n")
+    (tmp_path / "other.yaml").write_text("include:\n  - compose.yaml\n")
+    graph = ComposeGraph()
+    with pytest.raises(ComposeCycleError, match="compose.yaml -> other.yaml"):
+        graph.apply(ComposeFile(tmp_path / "compose.yaml"))
+
+
+def test_extends_cycle_is_reported(tmp_path):
+    (tmp_path / "compose.yaml").write_text(
+        "services:\n  a:\n    extends: b\n  b:\n    extends: a\n"
+    )
+    with pytest.raises(ComposeCycleError):
+        ComposeGraph().apply(ComposeFile(tmp_path / "compose.yaml"))
+
+
+def test_included_environment_merges_extends(project):
+    (project / "shared" / "db.yaml").write_text(
+        DB + "  replica:\n    extends: db\n    environment:\n      - ROLE=replica\n"
+    )
+    graph = ComposeGraph()
+    graph.apply(ComposeFile(project / "compose.yaml"))
+    included = graph.included_environment(project / "compose.yaml")
+    assert included["replica"] == [
+        "POSTGRES_DB=app",
+        "POSTGRES_USER=admin",
+        "ROLE=replica",
+    ]
@@ -0,0 +1,68 @@
+from click.testing import CliRunner
+
+from extract_env.envfile import EnvFile
+from extract_env.lint import lint
+from extract_env.lint import lint_folder
+from extract_env.main import main
+
+from .conftest import make_project
+from .conftest import snapshot
+
+
+def rules(findings) -> set[str]:
+    return {x.rule for x in findings}
+
+
+def test_lint_folder_leaves_the_folder_unchanged(project):
+    before = snapshot(project)
+    findings = lint_folder(project, project, use_current_env=False)
+    assert snapshot(project) == before
+    assert not (project / ".env").exists()
+    assert [*findings] == [project / ".env"]
+
+
+def test_lint_cli_leaves_the_folder_unchanged(project):
+    (project / ".env").write_text("MODE=dev\nUNUSED=1\n")
+    before = snapshot(project)
+    result = CliRunner().invoke(main, ["-c", str(project), "-e", str(project), "lint"])
+    assert snapshot(project) == before
+    assert "unused-key" in result.output
+
+
+def test_conflicting_values_are_errors(project):
+    findings = lint_folder(project, project, use_current_env=False)[project / ".env"]
+    assert "conflicts" in rules(findings)
+    assert findings[0].severity == "error"
+
+
+def test_unresolved_reference():
+    env_file = EnvFile.from_string("URL=http://${HOST}\n", use_current_env=False)
+    findings = lint(env_file, [], ["unresolved-reference"], environ={})
+    assert [x.rule for x in findings] == ["unresolved-reference"]
+    assert "HOST" in findings[0].message
+
+
+def test_invalid_name_and_shadowed_key():
+    env_file = EnvFile.from_string("1BAD=x\nA=1\n", use_current_env=False)
+    findings = lint(env_file, [], ["invalid-name", "shadowed-key"], environ={"A": "2"})
+    assert rules(findings) == {"invalid-name", "shadowed-key"}
+
+
+def test_lint_reads_the_env_file_like_the_extraction(tmp_path):
+    make_project(
+        tmp_path,
+        "services:\n  web:\n    image: x\n    environment:\n      - TOKEN=${TOKEN}\n",
+        'export TOKEN="a # b"\n',
+    )
+    findings = lint_folder(tmp_path, tmp_path, use_current_env=False)
+    assert "invalid-name" in rules(findings[tmp_path / ".env"])
+
+    findings = lint_folder(
+        tmp_path, tmp_path, use_current_env=False, dotenv_grammar=True
+    )
+    assert findings[tmp_path / ".env"] == []
+
+    result = CliRunner().invoke(
+        main, ["-c", str(tmp_path), "-e", str(tmp_path), "--dotenv-grammar", "lint"]
+    )
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from extract_env.compose import ComposeFile
+from extract_env.envfile import EnvFile
+from extract_env.lock import FileLock
+from extract_env.lock import LockTimeoutError
+
+from .conftest import run
+
+
+def test_release_removes_sidecar(tmp_path):
+    lock = FileLock(tmp_path / ".env").acquire()
+    assert lock.lock_path.exists()
+    lock.release()
+    assert not lock.lock_path.exists()
+
+
+def test_sidecar_names_do_not_collide(tmp_path):
+    names = [".env", "env", "compose.lock.yaml", ".compose.lock.yaml", ".lock"]
+    lock_paths = [FileLock.lock_path_for(tmp_path / x) for x in names]
+    assert len({*lock_paths}) == len(names)
+    assert not {x.name for x in lock_paths} & {*names}
+
+
+def test_dot_env_and_env_lock_independently(tmp_path):
+    with FileLock(tmp_path / ".env"):
+        with FileLock(tmp_path / "env", timeout=0.1):
+            pass
+
+
+def test_locked_file_times_out(tmp_path):
+    with FileLock(tmp_path / ".env"):
+        with pytest.raises(LockTimeoutError):
+            FileLock(tmp_path / ".env", timeout=0.1).acquire()
+
+
+def test_waiting_run_locks_new_sidecar(tmp_path):
+    first = FileLock(tmp_path / ".env").acquire()
+    second = FileLock(tmp_path / ".env", timeout=5)
+    waiter = threading.Thread(target=second.acquire)
+    waiter.start()
+    first.release()
+    waiter.join()
+    assert second.is_current(second._fd)
+    with pytest.raises(LockTimeoutError):
+        FileLock(tmp_path / ".env", timeout=0.1).acquire()
+    second.release()
+
+
+def test_run_leaves_no_lock_files(project):
+    run(project)
+    assert not [*project.glob("*.lock")]
+    assert (project / ".env").exists()
+
+
+def test_failed_parse_releases_lock(project):
+    (project / "compose.broken.yaml").write_text("services:\n  web: [\n")
+    with pytest.raises(Exception):
+        ComposeFile.find_files(project, lock_timeout=1)
+    assert not [*project.glob("*.lock")]
+    compose_file = ComposeFile(project / "compose.yaml", lock_timeout=0.1)
+    compose_file.unlock()
+
+
+def test_failed_env_file_releases_lock(tmp_path):
+    with pytest.raises(TypeError):
+        EnvFile(tmp_path / ".env", envs={}, lock_timeout=1)
+    assert not [*tmp_path.glob("*.lock")]
@@ -0,0 +1,78 @@
+import pytest
+
+from extract_env.envfile import EnvFile
+
+from .conftest import commit_all
+from .conftest import run
+
+BASE = """\
+services:
+  web:
+    image: x
+    environment:
+      - MODE={mode}
+      - DB_HOST=db
+"""
+OVERLAY = """\
+services:
+  web:
+    environment:
+      - MODE=dev
+      - LEVEL=1
+"""
+
+
+def keys(file_path) -> list[str]:
+    return EnvFile.from_string(file_path.read_text()).keys()
+
+
+@pytest.fixture
+def overlays(tmp_path):
+    (tmp_path / "compose.yaml").write_text(BASE.format(mode="dev"))
+    (tmp_path / "compose.prod.yaml").write_text(OVERLAY)
+    return tmp_path
+
+
+def test_overlay_env_only_holds_the_difference(overlays):
+    run(overlays, overlay=True)
+    assert keys(overlays / ".env") == ["MODE", "DB_HOST"]
+    assert keys(overlays / ".env.prod") == ["LEVEL"]
+
+
+def test_merged_view_is_the_base_with_the_overlay_applied(overlays):
+    (overlays / "compose.prod.yaml").write_text(
+        OVERLAY.replace("MODE=dev", "MODE=prod")
+    )
+    env_list = run(overlays, overlay=True, write=False, update_compose=False)
+    overlay = env_list.overlays["compose.prod.yaml"]
+    assert [*overlay.delta()] == ["MODE", "LEVEL"]
+    merged = {k: v.value for k, v in overlay.merged_envs.items()}
+    assert merged == {"MODE": "prod", "DB_HOST": "db", "LEVEL": "1"}
+    assert [*overlay.merged_service_envs["web"]] == ["MODE", "DB_HOST", "LEVEL"]
+
+
+def test_more_than_one_base_is_rejected(overlays):
+    (overlays / "docker-compose.yml").write_text(BASE.format(mode="dev"))
+    with pytest.raises(ValueError, match="exactly one base"):
+        run(overlays, overlay=True)
+
+
+def test_since_reselects_overlays_of_a_changed_base(overlays):
+    run(overlays, overlay=True, update_compose=False)
+    commit_all(overlays)
+    (overlays / "compose.yaml").write_text(BASE.format(mode="prod"))
+
+    env_list = run(overlays, overlay=True, update_compose=False, since="HEAD")
+    assert [*env_list.compose_files] == ["compose.yaml", "compose.prod.yaml"]
+    assert keys(overlays / ".env.prod") == ["LEVEL", "MODE"]
+
+
+def test_since_skips_overlays_when_nothing_changed(overlays):
+    (overlays / "compose.staging.yaml").write_text(OVERLAY)
+    run(overlays, overlay=True)
+    commit_all(overlays)
+    (overlays / "compose.prod.yaml").write_text(OVERLAY + "      - EXTRA=1\n")
+
+    env_list = run(overlays, overlay=True, since="HEAD")
+    assert "compose.staging.yaml" not in env_list.compose_files
+    assert "compose.prod.yaml" in env_list.compose_files
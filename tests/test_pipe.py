@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from extract_env.abstract import File
+from extract_env.compose import ComposeFile
+from extract_env.envfile import EnvFile
+from extract_env.main import main
+from extract_env.pipe import extract_text
+
+from .conftest import COMPOSE
+from .conftest import snapshot
+
+
+def test_extract_text_runs_in_memory():
+    env_file, compose_file = extract_text(COMPOSE, "EXTRA=1\n", use_current_env=False)
+    assert env_file.keys() == ["EXTRA", "MODE", "DB_HOST"]
+    assert "MODE=${MODE}" in compose_file.render()
+
+
+def test_stdin_to_stdout_writes_nothing(project):
+    before = snapshot(project)
+    result = CliRunner().invoke(main, ["-e", str(project), "-f", "-"], input=COMPOSE)
+    assert result.exit_code == 0, result.output
+    assert "MODE=dev" in result.output
+    assert snapshot(project) == before
+
+
+def test_compose_file_from_a_file_descriptor(project):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, COMPOSE.encode())
+    os.close(write_fd)
+    try:
+        result = CliRunner().invoke(
+            main, ["-e", str(project), "-f", f"fd:{read_fd}", "--env-out", "-"]
+        )
+    finally:
+        os.close(read_fd)
+    assert result.exit_code == 0, result.output
+    assert "DB_HOST=db" in result.output
+
+
+def test_invalid_file_descriptor_is_a_usage_error():
+    result = CliRunner().invoke(main, ["-f", "fd:x"])
+    assert result.exit_code == 2
+    assert "expected fd:N" in result.output
+
+
+def test_original_text_is_abstract():
+    assert "original_text" in File.__abstractmethods__
+    assert EnvFile.from_string("A=1\n").original_text == "A=1\n"
+    assert ComposeFile.from_string(COMPOSE).original_text == COMPOSE
+
+    class Incomplete(File):
+        read_file = update_file = write_file = render = lambda self: self
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_pipe_reads_the_env_file_with_the_dotenv_grammar(project):
+    (project / ".env").write_text('MODE="x # y"\n')
+    args = ["-e", str(project), "-f", "-", "--no-use-current-env", "--dotenv-grammar"]
+    result = CliRunner().invoke(main, args, input=COMPOSE)
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[0] == "MODE=dev"
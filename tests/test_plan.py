@@ -0,0 +1,80 @@
+import pytest
+
+from extract_env.plan import StalePlanError
+from extract_env.plan import apply
+from extract_env.plan import plan
+
+from .conftest import COMPOSE
+from .conftest import make_project
+from .conftest import run
+from .conftest import snapshot
+
+PROJECTS = {
+    "env_file": {
+        "compose.yaml": "services:\n  web:\n    image: x\n    env_file: web.env\n"
+        "    environment:\n      - MODE=dev\n      - DB_HOST=db\n",
+        "web.env": "MODE=dev\n",
+    },
+    "extends": {
+        "compose.yaml": "include:\n  - db.yaml\nservices:\n  web:\n    image: x\n"
+        "    extends:\n      file: base.yaml\n      service: app\n"
+        "    environment:\n      - MODE=dev\n",
+        "base.yaml": "services:\n  app:\n    image: x\n    environment:\n"
+        "      - TIMEOUT=30\n",
+        "db.yaml": "services:\n  db:\n    image: x\n    environment:\n"
+        "      POSTGRES_DB: app\n",
+    },
+    "dotenv_grammar": {
+        "compose.yaml": COMPOSE,
+        ".env": 'NOTE="a # b"\n',
+    },
+}
+
+
+def test_plan_writes_creates_and_locks_nothing(project):
+    before = snapshot(project)
+    extraction = plan(project, project, use_current_env=False)
+    assert snapshot(project) == before
+    assert {x.file_path.name for x in extraction.changed} == {".env", "compose.yaml"}
+    assert "+MODE=dev" in extraction.diff()
+    assert extraction
+
+
+def test_apply_writes_what_envlist_writes(project, tmp_path_factory):
+    other = run(make_project(tmp_path_factory.mktemp("envlist"))).compose_folder
+
+    written = apply(plan(project, project, use_current_env=False))
+    assert {x.name for x in written} == {".env", "compose.yaml"}
+    assert snapshot(project) == snapshot(other)
+    assert not plan(project, project, use_current_env=False)
+
+
+def test_plan_reports_conflicts_and_orphans(project):
+    (project / ".env").write_text("UNUSED=1\n")
+    extraction = plan(project, project, use_current_env=False)
+    assert any("DB_HOST" in x for x in extraction.conflicts)
+    assert extraction.orphans[project / "compose.yaml"] == ("UNUSED",)
+
+
+def test_stale_plan_is_not_applied(project):
+    extraction = plan(project, project, use_current_env=False)
+    (project / "compose.yaml").write_text(COMPOSE + "# edited\n")
+    before = snapshot(project)
+    with pytest.raises(StalePlanError, match="compose.yaml"):
+        apply(extraction)
+    assert snapshot(project) == before
+
+
+@pytest.mark.parametrize("name", [*PROJECTS])
+def test_apply_matches_envlist(name, tmp_path):
+    options = {"dotenv_grammar": name == "dotenv_grammar"}
+    for folder in (tmp_path / "plan", tmp_path / "envlist"):
+        folder.mkdir()
+        for file_name, text in PROJECTS[name].items():
+            (folder / file_name).write_text(text)
+
+    assert apply(
+        plan(tmp_path / "plan", tmp_path / "plan", use_current_env=False, **options)
+    )
+    run(tmp_path / "envlist", **options)
+    assert snapshot(tmp_path / "plan") == snapshot(tmp_path / "envlist")
@@ -0,0 +1,119 @@
+from click.testing import CliRunner
+
+from extract_env.main import main
+from extract_env.plan import apply
+from extract_env.rename import plan_rename
+from extract_env.rename import read_mapping
+from extract_env.rename import rename_references
+
+from .conftest import make_project
+from .conftest import snapshot
+
+COMPOSE = """\
+services:
+  web:
+    image: x
+    environment:
+      - DB_HOST=${DB_HOST}
+      - URL=http://${DB_HOST:-$MODE}/$$DB_HOST
+      - MODE=${MODE}
+"""
+
+DOT_ENV = """\
+# database
+export DB_HOST=db
+MODE=dev
+URL_HOST=${DB_HOST}
+"""
+
+
+def test_rename_references_keeps_escapes_and_renames_defaults():
+    mapping = {"A": "B", "C": "D"}
+    assert rename_references("$A ${A} ${X:-$C} $$A ${AB}", mapping) == (
+        "$B ${B} ${X:-$D} $$A ${AB}"
+    )
+
+
+def test_read_mapping(tmp_path):
+    (tmp_path / "mapping").write_text("# old new\nA B\nC=D  # swapped\n\n")
+    assert read_mapping(tmp_path / "mapping") == {"A": "B", "C": "D"}
+
+
+def test_rename_renames_keys_and_references_only(tmp_path):
+    folder = make_project(tmp_path, COMPOSE, DOT_ENV)
+    apply(plan_rename({"DB_HOST": "DATABASE_HOST"}, folder, folder))
+    compose = (folder / "compose.yaml").read_text()
+    # The name the service sees stays, only the reference changes.
+    assert "- DB_HOST=${DATABASE_HOST}" in compose
+    assert "http://${DATABASE_HOST:-$MODE}/$$DB_HOST" in compose
+    assert (folder / ".env").read_text() == DOT_ENV.replace("DB_HOST", "DATABASE_HOST")
+
+
+def test_rename_swaps_names(tmp_path):
+    folder = make_project(tmp_path, COMPOSE, DOT_ENV)
+    apply(plan_rename({"DB_HOST": "MODE", "MODE": "DB_HOST"}, folder, folder))
+    assert (folder / ".env").read_text() == (
+        "# database\nexport MODE=db\nDB_HOST=dev\nURL_HOST=${MODE}\n"
+    )
+
+
+def test_rename_reports_collisions(tmp_path):
+    folder = make_project(tmp_path, COMPOSE, DOT_ENV)
+    rename_plan = plan_rename({"DB_HOST": "MODE", "URL_HOST": "1X"}, folder, folder)
+    assert "'1X' is not a valid variable name" in rename_plan.conflicts
+    assert any(
+        x.startswith("'DB_HOST' -> 'MODE': 'MODE' is already used at")
+        for x in rename_plan.conflicts
+    )
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    folder = make_project(tmp_path, COMPOSE, DOT_ENV)
+    before = snapshot(folder)
+    result = CliRunner().invoke(
+        main,
+        ["-c", str(folder), "-e", str(folder), "rename", "-d", "DB_HOST", "DB"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "+export DB=db" in result.output
+    assert snapshot(folder) == before
+
+
+def test_collision_exits_without_writing(tmp_path):
+    folder = make_project(tmp_path, COMPOSE, DOT_ENV)
+    before = snapshot(folder)
+    result = CliRunner().invoke(
+        main, ["-c", str(folder), "-e", str(folder), "rename", "DB_HOST", "MODE"]
+    )
+    assert result.exit_code == 1
+    assert "nothing was written" in result.output
+    assert snapshot(folder) == before
+
+
+def test_rename_gives_pass_through_entries_the_renamed_value(tmp_path):
+    compose = (
+        "services:\n  web:\n    image: x\n    environment:\n"
+        '      - DB_HOST\n      - "MODE"  # kept\n      - OTHER\n'
+        "  db:\n    image: x\n    environment:\n      DB_HOST:\n    command: DB_HOST\n"
+    )
+    folder = make_project(tmp_path, compose, DOT_ENV)
+    apply(plan_rename({"DB_HOST": "DATABASE_HOST", "MODE": "APP_MODE"}, folder, folder))
+    assert (folder / "compose.yaml").read_text() == (
+        "services:\n  web:\n    image: x\n    environment:\n"
+        '      - DB_HOST=${DATABASE_HOST}\n      - "MODE=${APP_MODE}"  # kept\n'
+        "      - OTHER\n  db:\n    image: x\n    environment:\n"
+        "      DB_HOST: ${DATABASE_HOST}\n    command: DB_HOST\n"
+    )
+
+
+def test_rename_follows_env_file(tmp_path):
+    compose = COMPOSE.replace("    image: x\n", "    image: x\n    env_file: web.env\n")
+    folder = make_project(tmp_path, compose, DOT_ENV)
+    (folder / "web.env").write_text("DB_HOST=db\nURL=http://${DB_HOST}\n")
+    rename_plan = plan_rename({"DB_HOST": "DATABASE_HOST"}, folder, folder)
+    assert folder / "web.env" in {x.file_path for x in rename_plan.changed}
+    apply(rename_plan)
+    # The names the service sees stay, as in the compose file.
+    assert (folder / "web.env").read_text() == (
+        "DB_HOST=db\nURL=http://${DATABASE_HOST}\n"
+    )
@@ -0,0 +1,75 @@
+import pytest
+
+from extract_env.envfile import EnvFile
+from extract_env.resolver import CyclicReferenceError
+from extract_env.resolver import EnvResolver
+from extract_env.resolver import find_references
+from extract_env.resolver import substitute
+
+
+def resolver(text: str, **environ: str) -> EnvResolver:
+    return EnvResolver(
+        EnvFile.from_string(text, use_current_env=False), environ=environ
+    )
+
+
+def test_find_references():
+    assert find_references("$A ${B} ${C:-$D} $$E $A") == ["A", "B", "C", "D"]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("${SET:-x}", "1"),
+        ("${EMPTY:-x}", "x"),
+        ("${EMPTY-x}", ""),
+        ("${UNSET-x}", "x"),
+        ("${SET:+x}", "x"),
+        ("${EMPTY+x}", "x"),
+        ("${UNSET+x}", ""),
+        ("$$SET", "$SET"),
+        ("${UNSET:-$SET}", "1"),
+    ],
+)
+def test_substitute_follows_compose(value, expected):
+    values = {"SET": "1", "EMPTY": ""}
+    assert substitute(value, values.get) == expected
+
+
+def test_substitute_required_variable():
+    with pytest.raises(ValueError, match="'UNSET' is missing a value: needed"):
+        substitute("${UNSET:?needed}", {}.get)
+
+
+def test_resolves_chains_in_any_order():
+    env_resolver = resolver("URL=http://${HOST}:${PORT}\nHOST=$NAME.local\nNAME=db\n")
+    assert env_resolver.resolve("URL") == "http://db.local:"
+    assert env_resolver.resolve_all() == {
+        "URL": "http://db.local:",
+        "HOST": "db.local",
+        "NAME": "db",
+    }
+
+
+def test_resolve_one_key_only_evaluates_its_dependencies():
+    env_resolver = resolver("A=$B\nB=1\nC=$D\nD=2\n")
+    env_resolver.resolve("A")
+    assert {*env_resolver._resolved} == {"A", "B"}
+
+
+def test_names_not_in_the_file_fall_through_to_the_environment():
+    env_resolver = resolver("URL=${HOST}:${PORT}\nHOST=db\n", PORT="5432", HOST="x")
+    assert env_resolver.resolve("URL") == "db:5432"
+    assert env_resolver.resolve("PORT") == "5432"
+    with pytest.raises(KeyError):
+        env_resolver.resolve("MISSING")
+
+
+def test_cycles_are_all_reported():
+    env_resolver = resolver("A=$B\nB=$A\nC=$C\nD=$A\n")
+    assert env_resolver.find_cycles() == [["A", "B"], ["C"]]
+    with pytest.raises(CyclicReferenceError) as info:
+        env_resolver.resolve_all()
+    assert info.value.cycles == [["A", "B"], ["C"]]
+    with pytest.raises(CyclicReferenceError, match="D -> A -> B -> A|A -> B -> A"):
+        env_resolver.resolve("D")
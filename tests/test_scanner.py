@@ -0,0 +1,62 @@
+import pytest
+
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.scanner import ScanEntry
+from extract_env.scanner import scan
+from extract_env.scanner import scan_envs
+
+
+def test_scan_entries_and_raw_lines():
+    text = "# head\n\nA=1\nexport B = two # note\n"
+    assert [*scan(text)] == [
+        ScanEntry(0, (0, 7), raw="# head"),
+        ScanEntry(1, (7, 8), raw=""),
+        ScanEntry(2, (8, 12), "A", "1"),
+        ScanEntry(3, (12, 34), "B", "two", "note"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "line, value, comment",
+    [
+        ('A="x # not a comment"', '"x # not a comment"', ""),
+        ("A='single # quoted'  # note", "'single # quoted'", "note"),
+        (r'A="escaped \" quote"', r'"escaped \" quote"', ""),
+        ("A=x#y", "x#y", ""),
+        ("A=", "", ""),
+    ],
+)
+def test_quoted_values_are_kept_as_written(line, value, comment):
+    (entry,) = scan(line + "\n")
+    assert (entry.key, entry.value, entry.comment) == ("A", value, comment)
+
+
+def test_multiline_values_count_their_lines():
+    text = 'A="one\ntwo"\nB=3\r\n'
+    entries = [*scan(text)]
+    assert [(x.line, x.key, x.value) for x in entries] == [
+        (0, "A", '"one\ntwo"'),
+        (2, "B", "3"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text", ["A=1\n# c\n\nB=2 # x\n", "A=1", "A=1 # x\nnot an entry\n"]
+)
+def test_plain_files_scan_like_from_string(text):
+    expected = [
+        Env.from_string(x, "APP", "", i, source="dot_env")
+        for i, x in enumerate(text.splitlines())
+    ]
+    actual = scan_envs(text, "APP")
+    assert [(str(x), x.comment, x.line) for x in actual] == [
+        (str(x), x.comment, x.line) for x in expected
+    ]
+
+
+def test_env_file_round_trips_quoted_values():
+    text = "A=\"x # y\"\nB='multi\nline'\n"
+    env_file = EnvFile.from_string(text, use_current_env=False, dotenv_grammar=True)
+    assert env_file["A"].value == '"x # y"'
+    assert env_file.render() == text
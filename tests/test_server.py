@@ -0,0 +1,112 @@
+import socket
+import threading
+
+import pytest
+
+from extract_env.cache import WarmCache
+from extract_env.client import send_request
+from extract_env.compose import ComposeFile
+from extract_env.envfile import EnvFile
+from extract_env.server import ExtractServer
+
+from .conftest import snapshot
+
+
+def test_warm_cache_parses_a_file_once_until_it_changes(project):
+    cache = WarmCache()
+    compose_path = project / "compose.yaml"
+    first = cache.get(ComposeFile, compose_path)
+    second = cache.get(ComposeFile, compose_path)
+    assert cache.stats == {"hits": 1, "misses": 1, "files": 1}
+    assert first is not second
+
+    compose_path.write_text(compose_path.read_text() + "# changed\n")
+    cache.get(ComposeFile, compose_path)
+    assert cache.stats["misses"] == 2
+
+
+def test_warm_cache_copies_do_not_leak_edits(tmp_path):
+    (tmp_path / ".env").write_text("A=1\n")
+    cache = WarmCache()
+    env_file = cache.get(EnvFile, tmp_path / ".env", use_current_env=False)
+    env_file["A"] = "2"
+    copy = cache.get(EnvFile, tmp_path / ".env", use_current_env=False)
+    assert copy["A"].value == "1"
+
+
+def test_warm_cache_is_bounded(tmp_path):
+    cache = WarmCache(max_size=2)
+    for name in ("a", "b", "c"):
+        (tmp_path / name).write_text("A=1\n")
+        cache.get(EnvFile, tmp_path / name, use_current_env=False)
+    assert cache.stats["files"] == 2
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ExtractServer(tmp_path / "s.sock")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_preview_and_check_leave_the_folder_unchanged(server, project):
+    (project / ".env").touch()
+    before = snapshot(project)
+    request = {"argv": ["--no-use-current-env"], "cwd": str(project)}
+    response = send_request(server.socket_path, {**request, "command": "preview"})
+    assert response["exit_code"] == 0, response["output"]
+    assert "MODE=dev" in response["output"]
+
+    response = send_request(server.socket_path, {**request, "command": "check"})
+    assert response["exit_code"] == 1, response["output"]
+    assert snapshot(project) == before
+
+
+def test_extract_writes_and_reuses_warm_state(server, project):
+    request = {"argv": ["--no-use-current-env"], "cwd": str(project)}
+    assert send_request(server.socket_path, request)["exit_code"] == 0
+    assert "MODE=dev" in (project / ".env").read_text()
+
+    # The files written by the extraction are parsed again once, then reused.
+    for _ in range(2):
+        response = send_request(server.socket_path, {**request, "command": "check"})
+        assert response["exit_code"] == 0, response["output"]
+    assert server.cache.hits > 0
+
+
+def test_invalid_request(server):
+    response = send_request(server.socket_path, {"command": "unknown"})
+    assert response["exit_code"] == 2
+    assert response["output"].startswith("Invalid request")
+
+
+def test_a_live_socket_is_not_replaced(server):
+    with pytest.raises(OSError, match="already listening"):
+        ExtractServer(server.socket_path)
+
+
+def test_a_stale_socket_is_replaced(tmp_path):
+    socket_path = tmp_path / "s.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(socket_path))
+    server = ExtractServer(socket_path)
+    server.server_close()
+    assert not socket_path.exists()
+
+
+def test_clients_that_disconnect_early_are_not_errors(server, project):
+    errors = []
+    server.handle_error = lambda request, address: errors.append(address)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.connect(str(server.socket_path))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(server.socket_path))
+        client.sendall(b'{"command": "preview", "cwd": "%s"}\n' % bytes(project))
+    # The next request is only answered once the earlier ones are handled.
+    response = send_request(server.socket_path, {"command": "unknown"})
+    assert response["exit_code"] == 2
+    assert errors == []
@@ -0,0 +1,53 @@
+from extract_env.shard import Shard
+
+from .conftest import COMPOSE
+from .conftest import run
+
+
+def shard_names(folder) -> list[str]:
+    return sorted(x.name for x in (folder / ".env.d").iterdir())
+
+
+def test_one_shard_per_service(project):
+    run(project, shard=True)
+    assert shard_names(project) == ["db.env", "web.env"]
+    assert (project / ".env.d" / "web.env").read_text() == "MODE=dev\nDB_HOST=db\n"
+    assert ".env.d/web.env" in (project / "compose.yaml").read_text()
+
+
+def test_common_entries_share_one_shard(project):
+    (project / "compose.yaml").write_text(
+        COMPOSE.replace("DB_HOST=localhost", "DB_HOST=db")
+    )
+    run(project, shard=True, shard_common=True)
+    assert shard_names(project) == ["_common.env", "web.env"]
+    assert (project / ".env.d" / "_common.env").read_text() == "DB_HOST=db\n"
+
+
+def test_orphaned_shards_are_removed(project):
+    run(project, shard=True)
+    (project / "compose.yaml").write_text(COMPOSE.split("  db:")[0])
+    (project / ".env.d" / "notes.txt").write_text("kept")
+    run(project, shard=True)
+    assert shard_names(project) == ["notes.txt", "web.env"]
+
+
+def test_check_reports_orphans_without_removing_them(project):
+    run(project, shard=True)
+    (project / ".env.d" / "gone.env").write_text("A=1\n")
+    env_list = run(project, shard=True, check=True)
+    assert env_list.changed == [project / ".env.d" / "gone.env"]
+    assert (project / ".env.d" / "gone.env").exists()
+
+
+def test_changes_are_checked_once_per_shard(project, monkeypatch):
+    calls = []
+    has_changes = Shard.has_changes
+
+    def counted(self):
+        calls.append(self.file_path)
+        return has_changes(self)
+
+    monkeypatch.setattr(Shard, "has_changes", counted)
+    run(project, shard=True, check=True)
+    assert sorted(calls) == sorted({*calls})
@@ -0,0 +1,59 @@
+import pytest
+
+from extract_env.git import GitError
+from extract_env.git import changed_files
+
+from .conftest import COMPOSE
+from .conftest import commit_all
+from .conftest import git
+from .conftest import run
+
+
+@pytest.fixture
+def repo(project):
+    (project / "compose.a.yaml").write_text(COMPOSE.replace("MODE", "LEVEL"))
+    commit_all(project)
+    return project
+
+
+def test_changed_files_sees_modified_staged_untracked_and_renamed(repo):
+    (repo / "compose.yaml").write_text(COMPOSE + "# changed\n")
+    (repo / "new.txt").write_text("x")
+    git(repo, "mv", "compose.a.yaml", "compose.b.yaml")
+    assert changed_files("HEAD", cwd=repo) == {
+        (repo / x).resolve()
+        for x in ("compose.yaml", "new.txt", "compose.a.yaml", "compose.b.yaml")
+    }
+
+
+def test_since_only_processes_changed_compose_files(repo):
+    (repo / "compose.a.yaml").write_text(COMPOSE.replace("MODE", "OTHER"))
+    assert [
+        *run(repo, write=False, update_compose=False, since="HEAD").compose_files
+    ] == ["compose.a.yaml"]
+
+
+def test_since_processes_a_compose_file_whose_env_file_changed(repo):
+    (repo / ".env").write_text("MODE=prod\n")
+    assert [
+        *run(repo, write=False, update_compose=False, since="HEAD").compose_files
+    ] == ["compose.yaml"]
+
+
+def test_since_with_nothing_changed(repo, capsys):
+    assert (
+        run(repo, write=False, update_compose=False, since="HEAD").compose_files == {}
+    )
+    assert (
+        "No compose files or .env files changed since HEAD" in capsys.readouterr().out
+    )
+
+
+def test_since_unknown_ref(repo):
+    with pytest.raises(GitError, match="failed"):
+        run(repo, write=False, update_compose=False, since="no-such-ref")
+
+
+def test_since_outside_a_repository(project):
+    with pytest.raises(GitError):
+        changed_files("HEAD", cwd=project)
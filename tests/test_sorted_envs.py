@@ -0,0 +1,74 @@
+import pytest
+
+from extract_env.env import Env
+from extract_env.envfile import EnvFile
+from extract_env.sorted_envs import SortedEnvs
+
+TEXT = """\
+# web
+ZED=1
+ALPHA=2
+
+MIDDLE=3
+# trailing
+"""
+
+
+def sorted_file(by="key") -> EnvFile:
+    return EnvFile.from_string(TEXT, use_current_env=False, sort_by=by)
+
+
+def entries(env_file: EnvFile) -> list[str]:
+    return [x.key for x in env_file.envs.values() if x.key]
+
+
+def test_keep_sorted_keeps_comments_with_their_entry():
+    env_file = sorted_file()
+    assert entries(env_file) == ["ALPHA", "MIDDLE", "ZED"]
+    assert env_file.render().index("# web") < env_file.render().index("ZED=1")
+
+
+@pytest.mark.parametrize("by", ["key", "source"])
+def test_edits_match_a_full_sort(by):
+    env_file = sorted_file(by)
+    env_file.append(Env("BETA", "4", source="compose"))
+    env_file["NEW"] = "5"
+    env_file.insert(0, Env("AAA", "6"))
+    del env_file["MIDDLE"]
+    env_file[0] = Env("OMEGA", "7")
+
+    assert [*env_file.envs] == [*range(len(env_file))]
+    # The entries left and their sources, sorted independently of SortedEnvs.
+    left = [
+        ("ZED", "dot_env"),
+        ("ALPHA", "dot_env"),
+        ("BETA", "compose"),
+        ("NEW", None),
+        ("OMEGA", None),
+    ]
+    if by == "source":
+        expected = [k for _, k in sorted((s or "", k) for k, s in left)]
+    else:
+        expected = sorted(k for k, _ in left)
+    assert entries(env_file) == expected
+    lines = env_file.render().splitlines()
+    assert lines[lines.index("ZED=1") - 1] == "# web"
+
+
+def test_edits_skip_full_sync(monkeypatch):
+    env_file = sorted_file()
+
+    def sync(self, envs):
+        raise AssertionError("single edits must not sync every env")
+
+    monkeypatch.setattr(SortedEnvs, "sync", sync)
+    env_file["NEW"] = "5"
+    del env_file["ZED"]
+    env_file.insert(0, Env("AAA", "6"))
+    assert entries(env_file) == ["AAA", "ALPHA", "MIDDLE", "NEW"]
+
+
+def test_duplicate_append_is_merged():
+    env_file = sorted_file()
+    env_file.append(Env("ALPHA", "2", source="compose"))
+    assert entries(env_file).count("ALPHA") == 1
@@ -0,0 +1,93 @@
+import gc
+import time
+import weakref
+
+import pytest
+from ruamel.yaml.error import YAMLError
+
+from extract_env.compose import ComposeFile
+from extract_env.envlist import EnvList
+from extract_env.graph import GraphNode
+
+from .conftest import COMPOSE
+from .conftest import run
+from .conftest import snapshot
+
+
+@pytest.fixture
+def groups(project):
+    (project / "compose.a.yaml").write_text(COMPOSE)
+    (project / "compose.b.yaml").write_text(COMPOSE.replace("MODE", "LEVEL"))
+    return project
+
+
+def test_stream_writes_the_same_files(groups, tmp_path_factory):
+    batch = tmp_path_factory.mktemp("batch")
+    for name, text in snapshot(groups).items():
+        (batch / name).write_bytes(text)
+    run(groups, stream=True, read_ahead=2)
+    run(batch)
+    assert snapshot(groups) == snapshot(batch)
+
+
+@pytest.mark.parametrize("broken", ["compose.yaml", "compose.a.yaml", "compose.b.yaml"])
+def test_stream_failure_keeps_error_and_releases_locks(groups, broken):
+    (groups / broken).write_text("services:\n  web: [\n")
+    with pytest.raises(YAMLError):
+        run(groups, stream=True, read_ahead=2)
+    assert not [*groups.glob("*.lock")]
+
+
+def test_stream_error_is_not_replaced_by_read_ahead_errors(groups, monkeypatch):
+    first, second, _ = ComposeFile.find_paths(groups)
+    (groups / second).write_text("services:\n  web: [\n")
+
+    def combine_files(self):
+        raise RuntimeError(f"combining {[*self.compose_files]} failed")
+
+    monkeypatch.setattr(EnvList, "combine_files", combine_files)
+    with pytest.raises(RuntimeError, match=first):
+        run(groups, stream=True, read_ahead=2)
+    assert not [*groups.glob("*.lock")]
+
+
+@pytest.mark.parametrize("read_ahead", [0, 1, 2])
+def test_read_ahead_bounds_the_groups_read_before_processing(
+    groups, monkeypatch, read_ahead
+):
+    loaded: list[list[str]] = []
+    loaded_while_combining: list[int] = []
+    load_group = EnvList.load_group
+    combine_files = EnvList.combine_files
+
+    def counting_load_group(self, paths):
+        loaded.append([*paths])
+        return load_group(self, paths)
+
+    def counting_combine_files(self):
+        # Gives groups read ahead in the background time to start.
+        time.sleep(0.05)
+        loaded_while_combining.append(len(loaded))
+        return combine_files(self)
+
+    monkeypatch.setattr(EnvList, "load_group", counting_load_group)
+    monkeypatch.setattr(EnvList, "combine_files", counting_combine_files)
+    run(groups, stream=True, read_ahead=read_ahead)
+    assert loaded_while_combining == [min(x + read_ahead, 3) for x in (1, 2, 3)]
+
+
+def test_stream_does_not_keep_processed_files(groups, monkeypatch):
+    loaded: list[weakref.ref] = []
+    load_group = EnvList.load_group
+
+    def tracking_load_group(self, paths):
+        compose_files = load_group(self, paths)
+        loaded.extend(weakref.ref(x) for x in compose_files.values())
+        return compose_files
+
+    monkeypatch.setattr(EnvList, "load_group", tracking_load_group)
+    env_list = run(groups, stream=True)
+    gc.collect()
+    assert len(loaded) == 3
+    assert [x for x in loaded if x() is not None] == []
+    assert {type(x) for x in env_list.graph.memo.values()} == {GraphNode}
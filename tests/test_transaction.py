@@ -0,0 +1,82 @@
+import os
+import stat
+
+import pytest
+
+from extract_env.transaction import PendingWrite
+from extract_env.transaction import Transaction
+from extract_env.transaction import TransactionError
+from extract_env.utils import UMASK
+
+from .conftest import snapshot
+
+
+def mode(path) -> int:
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+def test_run_writes_every_file(tmp_path):
+    (tmp_path / "a").write_text("old")
+    written = Transaction().add(tmp_path / "a", "new").add(tmp_path / "b", "b").run()
+    assert written == [tmp_path / "a", tmp_path / "b"]
+    assert snapshot(tmp_path) == {"a": b"new", "b": b"b"}
+
+
+def test_new_file_honours_umask(tmp_path):
+    Transaction().add(tmp_path / "new", "x").run()
+    assert mode(tmp_path / "new") == 0o666 & ~UMASK
+
+
+def test_existing_file_keeps_its_mode(tmp_path):
+    (tmp_path / "a").write_text("old")
+    os.chmod(tmp_path / "a", 0o640)
+    Transaction().add(tmp_path / "a", "new").run()
+    assert mode(tmp_path / "a") == 0o640
+
+
+def test_failed_commit_restores_every_file(tmp_path, monkeypatch):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+    (tmp_path / "c").write_text("c")
+    before = snapshot(tmp_path)
+
+    commit = PendingWrite.commit
+
+    def failing_commit(self):
+        if self.file_path.name == "b":
+            raise OSError("disk full")
+        commit(self)
+
+    monkeypatch.setattr(PendingWrite, "commit", failing_commit)
+    transaction = Transaction().add(tmp_path / "a", "A", tail="A")
+    transaction.add(tmp_path / "new", "new").remove(tmp_path / "c")
+    transaction.add(tmp_path / "b", "B")
+    with pytest.raises(TransactionError, match="every file was restored"):
+        transaction.run()
+    assert snapshot(tmp_path) == before
+
+
+def test_rollback_error_keeps_the_original_error(tmp_path, monkeypatch):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+    commit = PendingWrite.commit
+    rollback = PendingWrite.rollback
+
+    def failing_commit(self):
+        if self.file_path.name == "b":
+            raise OSError("disk full")
+        commit(self)
+
+    def failing_rollback(self):
+        if self.committed:
+            raise OSError("backup gone")
+        rollback(self)
+
+    monkeypatch.setattr(PendingWrite, "commit", failing_commit)
+    monkeypatch.setattr(PendingWrite, "rollback", failing_rollback)
+    transaction = Transaction().add(tmp_path / "a", "A").add(tmp_path / "b", "B")
+    with pytest.raises(TransactionError, match="not every file was restored") as info:
+        transaction.run()
+    cause = info.value.__cause__
+    assert str(cause) == "disk full"
+    assert cause.__notes__ == ["Restoring failed: backup gone"]
@@ -0,0 +1,26 @@
+import os
+
+from extract_env.utils import UMASK
+from extract_env.utils import write_atomic
+
+
+def test_write_atomic_keeps_the_mode_of_the_file(tmp_path):
+    file_path = tmp_path / ".env"
+    file_path.write_text("A=1\n")
+    file_path.chmod(0o640)
+    write_atomic(file_path, "A=2\n")
+    assert file_path.read_text() == "A=2\n"
+    assert file_path.stat().st_mode & 0o7777 == 0o640
+
+
+def test_write_atomic_new_file_follows_the_umask(tmp_path):
+    file_path = tmp_path / ".env"
+    write_atomic(file_path, "A=1\n")
+    assert file_path.stat().st_mode & 0o7777 == 0o666 & ~UMASK
+    assert [x.name for x in tmp_path.iterdir()] == [".env"]
+
+
+def test_umask_is_left_unchanged():
+    current = os.umask(0)
+    os.umask(current)
+    assert current == UMASK
@@ -0,0 +1,41 @@
+import pytest
+
+from .conftest import COMPOSE
+from .conftest import make_project
+from .conftest import run
+from .conftest import snapshot
+
+
+@pytest.fixture
+def projects(tmp_path_factory):
+    """The same compose files in two folders, so two runs can be compared."""
+    folders = []
+    for name in ("one", "many"):
+        folder = make_project(tmp_path_factory.mktemp(name))
+        (folder / "compose.a.yaml").write_text(COMPOSE.replace("MODE", "LEVEL"))
+        (folder / "compose.b.yaml").write_text(COMPOSE.replace("dev", "prod"))
+        (folder / ".env.a").write_text("LEVEL=1\n")
+        folders.append(folder)
+    return folders
+
+
+def test_target_groups_follow_the_env_files(projects):
+    env_list = run(projects[0], write=False, update_compose=False)
+    assert env_list.target_groups() == {
+        ".env": ["compose.yaml"],
+        ".env.a": ["compose.a.yaml"],
+        ".env.b": ["compose.b.yaml"],
+    }
+
+
+def test_workers_write_the_same_files_as_one_thread(projects):
+    one, many = projects
+    run(one, workers=1)
+    run(many, workers=4)
+    assert snapshot(one) == snapshot(many)
+    assert {".env", ".env.a", ".env.b"} <= {*snapshot(many)}
+
+
+def test_run_parallel_keeps_the_order_of_the_tasks(projects):
+    env_list = run(projects[0], write=False, update_compose=False, workers=4)
+    assert env_list.run_parallel([lambda x=x: x for x in range(20)]) == [*range(20)]